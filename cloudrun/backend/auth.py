@@ -7,10 +7,11 @@ from pathlib import Path
 from urllib.parse import urljoin
 
 import firebase_admin
-import httpx
 from dotenv import load_dotenv
 from fastapi import HTTPException, Request
 from firebase_admin import auth, credentials, firestore, storage
+from services.speckle_client import get_http_client
+from services.token_cache import token_cache
 from starlette.responses import JSONResponse, RedirectResponse
 
 load_dotenv()
@@ -158,145 +159,145 @@ async def exchange_token(request: Request):
             status_code=400, detail="Missing access code or challenge ID"
         )
 
-    async with httpx.AsyncClient() as client:
-        # Exchange code for token
-        print("Exchanging code for token...")
-        token_response = await client.post(
-            urljoin(server_url, "/auth/token"),
-            json={
-                "accessCode": access_code,
-                "appId": os.getenv("SPECKLE_APP_ID"),
-                "appSecret": os.getenv("SPECKLE_APP_SECRET"),
-                "challenge": challenge_id,
-            },
+    client = get_http_client()
+    # Exchange code for token
+    print("Exchanging code for token...")
+    token_response = await client.post(
+        urljoin(server_url, "/auth/token"),
+        json={
+            "accessCode": access_code,
+            "appId": os.getenv("SPECKLE_APP_ID"),
+            "appSecret": os.getenv("SPECKLE_APP_SECRET"),
+            "challenge": challenge_id,
+        },
+    )
+
+    print(f"Token response status: {token_response.status_code}")
+    if token_response.status_code != 200:
+        print(f"Error response from token exchange: {token_response.text}")
+        raise HTTPException(
+            status_code=token_response.status_code,
+            detail="Failed to exchange token",
         )
 
-        print(f"Token response status: {token_response.status_code}")
-        if token_response.status_code != 200:
-            print(f"Error response from token exchange: {token_response.text}")
-            raise HTTPException(
-                status_code=token_response.status_code,
-                detail="Failed to exchange token",
-            )
+    data = token_response.json()
+    speckle_token = data["token"]
+    refresh_token = data.get("refreshToken", "")
+    print("Successfully obtained Speckle token")
+
+    # Get user profile
+    print("Fetching user profile...")
+    profile_response = await client.post(
+        urljoin(server_url, "/graphql"),
+        headers={"Authorization": f"Bearer {speckle_token}"},
+        json={"query": "query { activeUser { id name email avatar } }"},
+    )
 
-        data = token_response.json()
-        speckle_token = data["token"]
-        refresh_token = data.get("refreshToken", "")
-        print("Successfully obtained Speckle token")
-
-        # Get user profile
-        print("Fetching user profile...")
-        profile_response = await client.post(
-            urljoin(server_url, "/graphql"),
-            headers={"Authorization": f"Bearer {speckle_token}"},
-            json={"query": "query { activeUser { id name email avatar } }"},
-        )
+    print(f"Profile response status: {profile_response.status_code}")
+    if profile_response.status_code != 200:
+        print(f"Error response from profile fetch: {profile_response.text}")
+        raise HTTPException(status_code=500, detail="Failed to get user profile")
 
-        print(f"Profile response status: {profile_response.status_code}")
-        if profile_response.status_code != 200:
-            print(f"Error response from profile fetch: {profile_response.text}")
-            raise HTTPException(status_code=500, detail="Failed to get user profile")
+    user_data = profile_response.json()["data"]["activeUser"]
+    print(f"User data received: {json.dumps(user_data, indent=2)}")
 
-        user_data = profile_response.json()["data"]["activeUser"]
-        print(f"User data received: {json.dumps(user_data, indent=2)}")
+    # Create/update Firebase user
+    try:
+        print(f"Attempting to get Firebase user by email: {user_data['email']}")
+        firebase_user = auth.get_user_by_email(user_data["email"])
+        print(f"Found existing Firebase user: {firebase_user.uid}")
 
-        # Create/update Firebase user
-        try:
-            print(f"Attempting to get Firebase user by email: {user_data['email']}")
-            firebase_user = auth.get_user_by_email(user_data["email"])
-            print(f"Found existing Firebase user: {firebase_user.uid}")
+        # Handle avatar URL and update custom claims
+        photo_url, storage_path = await handle_avatar_url(
+            user_data.get("avatar"), bucket
+        )
+        if photo_url:
+            # Update user profile with new photo URL
+            auth.update_user(firebase_user.uid, photo_url=photo_url)
+
+            # Update custom claims with storage path
+            current_claims = firebase_user.custom_claims or {}
+            current_claims["avatarStoragePath"] = storage_path
+            auth.set_custom_user_claims(firebase_user.uid, current_claims)
+            print("Updated user profile and claims with new avatar")
 
-            # Handle avatar URL and update custom claims
+    except Exception as e:
+        print(f"User not found in Firebase, creating new user. Error: {str(e)}")
+        try:
+            # Handle avatar URL
             photo_url, storage_path = await handle_avatar_url(
                 user_data.get("avatar"), bucket
             )
-            if photo_url:
-                # Update user profile with new photo URL
-                auth.update_user(firebase_user.uid, photo_url=photo_url)
-
-                # Update custom claims with storage path
-                current_claims = firebase_user.custom_claims or {}
-                current_claims["avatarStoragePath"] = storage_path
-                auth.set_custom_user_claims(firebase_user.uid, current_claims)
-                print("Updated user profile and claims with new avatar")
-
-        except Exception as e:
-            print(f"User not found in Firebase, creating new user. Error: {str(e)}")
-            try:
-                # Handle avatar URL
-                photo_url, storage_path = await handle_avatar_url(
-                    user_data.get("avatar"), bucket
-                )
-
-                # Create user with initial custom claims
-                custom_claims = (
-                    {"avatarStoragePath": storage_path} if storage_path else {}
-                )
-
-                firebase_user = auth.create_user(
-                    email=user_data["email"],
-                    display_name=user_data["name"],
-                    photo_url=photo_url,
-                    uid=user_data["id"],
-                )
-
-                # Set custom claims after user creation
-                if custom_claims:
-                    auth.set_custom_user_claims(firebase_user.uid, custom_claims)
-
-                print(f"Created new Firebase user: {firebase_user.uid}")
-            except Exception as create_error:
-                print(f"Error creating Firebase user: {str(create_error)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Failed to create Firebase user: {str(create_error)}",
-                )
-
-        # Store tokens in session
-        print("Storing tokens in session...")
-        request.session["speckle_id"] = user_data["id"]
-        request.session["speckle_token"] = speckle_token
-        request.session["firebase_uid"] = firebase_user.uid
-        request.session["user"] = {
-            "id": firebase_user.uid,
-            "name": firebase_user.display_name,
-            "email": firebase_user.email,
-            "avatar": firebase_user.photo_url,
-        }
 
-        # Store token in Firestore
-        print("Storing token in Firestore...")
-        try:
-            db.collection("userTokens").document(firebase_user.uid).set(
-                {
-                    "speckleId": user_data["id"],
-                    "speckleToken": speckle_token,
-                    "speckleRefreshToken": refresh_token,
-                    "updatedAt": firestore.SERVER_TIMESTAMP,
-                }
-            )
-            print("Successfully stored token in Firestore")
-        except Exception as e:
-            print(f"Error storing token in Firestore: {str(e)}")
-            raise HTTPException(
-                status_code=500, detail=f"Failed to store token in Firestore: {str(e)}"
+            # Create user with initial custom claims
+            custom_claims = {"avatarStoragePath": storage_path} if storage_path else {}
+
+            firebase_user = auth.create_user(
+                email=user_data["email"],
+                display_name=user_data["name"],
+                photo_url=photo_url,
+                uid=user_data["id"],
             )
 
-        # Create custom token for client-side Firebase auth
-        print("Creating custom token for client-side auth...")
-        try:
-            custom_token = auth.create_custom_token(firebase_user.uid)
-            print("Successfully created custom token")
-        except Exception as e:
-            print(f"Error creating custom token: {str(e)}")
+            # Set custom claims after user creation
+            if custom_claims:
+                auth.set_custom_user_claims(firebase_user.uid, custom_claims)
+
+            print(f"Created new Firebase user: {firebase_user.uid}")
+        except Exception as create_error:
+            print(f"Error creating Firebase user: {str(create_error)}")
             raise HTTPException(
-                status_code=500, detail=f"Failed to create custom token: {str(e)}"
+                status_code=500,
+                detail=f"Failed to create Firebase user: {str(create_error)}",
             )
 
-        print("=== Completed exchange_token function successfully ===")
-        return RedirectResponse(
-            url=f"/?authenticated=True&ft={custom_token.decode()}", status_code=303
+    # Store tokens in session
+    print("Storing tokens in session...")
+    request.session["speckle_id"] = user_data["id"]
+    request.session["speckle_token"] = speckle_token
+    request.session["firebase_uid"] = firebase_user.uid
+    request.session["user"] = {
+        "id": firebase_user.uid,
+        "name": firebase_user.display_name,
+        "email": firebase_user.email,
+        "avatar": firebase_user.photo_url,
+    }
+
+    # Store token in Firestore
+    print("Storing token in Firestore...")
+    try:
+        db.collection("userTokens").document(firebase_user.uid).set(
+            {
+                "speckleId": user_data["id"],
+                "speckleToken": speckle_token,
+                "speckleRefreshToken": refresh_token,
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            }
         )
+        # Write through so the next request does not read it back from Firestore
+        token_cache.set(firebase_user.uid, speckle_token)
+        print("Successfully stored token in Firestore")
+    except Exception as e:
+        print(f"Error storing token in Firestore: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to store token in Firestore: {str(e)}"
+        )
+
+    # Create custom token for client-side Firebase auth
+    print("Creating custom token for client-side auth...")
+    try:
+        custom_token = auth.create_custom_token(firebase_user.uid)
+        print("Successfully created custom token")
+    except Exception as e:
+        print(f"Error creating custom token: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to create custom token: {str(e)}"
+        )
+
+    print("=== Completed exchange_token function successfully ===")
+    return RedirectResponse(
+        url=f"/?authenticated=True&ft={custom_token.decode()}", status_code=303
+    )
 
 
 async def get_current_user(request: Request):
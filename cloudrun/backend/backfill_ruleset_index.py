@@ -0,0 +1,15 @@
+"""Backfill the public hash -> ruleset index for rulesets created before it existed.
+
+Shared links of unindexed rulesets still resolve, as the first lookup indexes
+them, but each such lookup scans every ruleset until the backfill has run.
+
+Usage (from cloudrun/backend, with the service account key in place):
+    python backfill_ruleset_index.py
+"""
+
+from auth import db
+from services.ruleset_index_service import backfill_ruleset_index
+
+if __name__ == "__main__":
+    count = backfill_ruleset_index(db)
+    print(f"Indexed {count} rulesets")
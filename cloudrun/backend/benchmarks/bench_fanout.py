@@ -0,0 +1,81 @@
+"""Benchmark the edit ruleset page with sequential vs. fanned-out lookups.
+
+The page needs the Speckle project, the ruleset and its rules. None depends
+on the others, so with fan_out() page latency approaches the slowest lookup
+instead of their sum. The Speckle call is simulated with a sleep.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_fanout
+"""
+
+import asyncio
+import time
+
+from benchmarks.memory_firestore import MemoryFirestore
+from services.fanout import ServerTiming, fan_out
+from services.firestore_repository import FirestoreRepository
+
+FIRESTORE_LATENCY = 0.03  # seconds per round trip
+SPECKLE_LATENCIES = [0.05, 0.15, 0.3]
+REQUESTS = 10
+
+
+def populate(db):
+    ruleset_ref = db.collection("rulesets").document("ruleset-1")
+    ruleset_ref.set({"user_id": "user-1", "project_id": "project-1"})
+    for i in range(20):
+        ruleset_ref.collection("rules").document(f"rule-{i}").set({"order": i + 1})
+
+
+async def speckle_project(latency):
+    await asyncio.sleep(latency)
+    return {"id": "project-1"}
+
+
+async def sequential(repo, latency):
+    await speckle_project(latency)
+    await repo.get_ruleset("ruleset-1")
+    await repo.list_rules("ruleset-1")
+
+
+async def concurrent(repo, latency, timing=None):
+    await fan_out(
+        timing,
+        speckle=speckle_project(latency),
+        ruleset=repo.get_ruleset("ruleset-1"),
+        rules=repo.list_rules("ruleset-1"),
+    )
+
+
+async def measure(page, latency):
+    db = MemoryFirestore()
+    populate(db)
+    db.latency = FIRESTORE_LATENCY
+    repo = FirestoreRepository(db)
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await page(repo, latency)
+    elapsed = (time.perf_counter() - start) / REQUESTS
+    repo.shutdown()
+    return elapsed * 1000
+
+
+async def main():
+    print(f"Firestore {FIRESTORE_LATENCY * 1000:.0f} ms per round trip")
+    print(f"{'speckle ms':>11} {'sequential ms':>14} {'fan-out ms':>11}")
+    for latency in SPECKLE_LATENCIES:
+        before = await measure(sequential, latency)
+        after = await measure(concurrent, latency)
+        print(f"{latency * 1000:>11.0f} {before:>14.1f} {after:>11.1f}")
+
+    db = MemoryFirestore(latency=FIRESTORE_LATENCY)
+    populate(db)
+    repo = FirestoreRepository(db)
+    timing = ServerTiming()
+    await concurrent(repo, SPECKLE_LATENCIES[1], timing)
+    repo.shutdown()
+    print(f"Server-Timing: {timing.header()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
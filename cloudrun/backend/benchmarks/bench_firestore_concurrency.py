@@ -0,0 +1,74 @@
+"""Benchmark request throughput with blocking Firestore calls vs. the repository.
+
+Each simulated request reads one ruleset and its rules from an in-memory
+Firestore stand-in that sleeps to emulate network latency. Blocking calls made
+directly from coroutines serialize on the event loop; awaiting the repository
+lets throughput scale with the number of requests in flight.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_firestore_concurrency
+"""
+
+import asyncio
+import time
+
+from benchmarks.memory_firestore import MemoryFirestore
+from services.firestore_repository import FirestoreRepository
+
+LATENCY = 0.01  # seconds per Firestore round trip
+REQUESTS = 128
+IN_FLIGHT = [1, 2, 4, 8, 16, 32]
+
+
+def populate(db):
+    db.collection("rulesets").document("ruleset-1").set({"name": "Walls"})
+    rules = db.collection("rulesets").document("ruleset-1").collection("rules")
+    for i in range(10):
+        rules.document(f"rule-{i}").set({"order": i + 1, "message": f"Rule {i}"})
+
+
+async def blocking_request(db, repo):
+    db.collection("rulesets").document("ruleset-1").get()
+    list(
+        db.collection("rulesets")
+        .document("ruleset-1")
+        .collection("rules")
+        .order_by("order")
+        .stream()
+    )
+
+
+async def repository_request(db, repo):
+    await repo.get_ruleset("ruleset-1")
+    await repo.list_rules("ruleset-1")
+
+
+async def measure(request, in_flight):
+    db = MemoryFirestore()
+    populate(db)
+    db.latency = LATENCY
+    repo = FirestoreRepository(db, max_workers=32)
+    semaphore = asyncio.Semaphore(in_flight)
+
+    async def limited():
+        async with semaphore:
+            await request(db, repo)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(limited() for _ in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    repo.shutdown()
+    return REQUESTS / elapsed
+
+
+async def main():
+    print(f"{REQUESTS} requests, {LATENCY * 1000:.0f} ms per Firestore round trip")
+    print(f"{'in flight':>10} {'blocking (req/s)':>18} {'repository (req/s)':>20}")
+    for in_flight in IN_FLIGHT:
+        blocking = await measure(blocking_request, in_flight)
+        repository = await measure(repository_request, in_flight)
+        print(f"{in_flight:>10} {blocking:>18.1f} {repository:>20.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""Benchmark the Firestore work behind the project details page.
+
+The page lists a project's rulesets with the number of rules in each. The old
+handler streamed every ruleset's rules subcollection one after another; the
+new one reads the denormalized ``rule_count`` from the ruleset documents.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_project_details
+"""
+
+import asyncio
+import time
+
+from benchmarks.memory_firestore import MemoryFirestore
+from services.firestore_repository import FirestoreRepository
+
+LATENCY = 0.01  # seconds per Firestore round trip
+RULESETS = [1, 10, 50]
+RULES_PER_RULESET = 20
+
+
+def populate(db, rulesets, with_counts=True):
+    for i in range(rulesets):
+        ruleset = {"user_id": "user-1", "project_id": "project-1"}
+        if with_counts:
+            ruleset["rule_count"] = RULES_PER_RULESET
+        ruleset_ref = db.collection("rulesets").document(f"ruleset-{i}")
+        ruleset_ref.set(ruleset)
+        for j in range(RULES_PER_RULESET):
+            ruleset_ref.collection("rules").document(f"rule-{j}").set({"order": j})
+
+
+async def serial_rules(repo):
+    rulesets = await repo.list_rulesets("user-1", "project-1")
+    for ruleset in rulesets:
+        ruleset["rules"] = await repo.list_rules(ruleset["id"])
+
+
+async def rule_counts(repo):
+    rulesets = await repo.list_rulesets("user-1", "project-1")
+    await repo.ensure_rule_counts(rulesets)
+
+
+async def measure(page, rulesets, with_counts=True):
+    db = MemoryFirestore()
+    populate(db, rulesets, with_counts)
+    db.reset_counters()
+    db.latency = LATENCY
+    repo = FirestoreRepository(db, max_workers=16)
+    start = time.perf_counter()
+    await page(repo)
+    elapsed = time.perf_counter() - start
+    repo.shutdown()
+    return db.reads, elapsed
+
+
+async def main():
+    print(
+        f"{RULES_PER_RULESET} rules per ruleset, {LATENCY * 1000:.0f} ms per round trip"
+    )
+    print(
+        f"{'rulesets':>9} {'serial reads':>13} {'serial ms':>10} "
+        f"{'count reads':>12} {'count ms':>9} {'backfill ms':>12}"
+    )
+    for rulesets in RULESETS:
+        serial_reads, serial_time = await measure(serial_rules, rulesets)
+        count_reads, count_time = await measure(rule_counts, rulesets)
+        _, backfill_time = await measure(rule_counts, rulesets, with_counts=False)
+        print(
+            f"{rulesets:>9} {serial_reads:>13} {serial_time * 1000:>10.0f} "
+            f"{count_reads:>12} {count_time * 1000:>9.0f} {backfill_time * 1000:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
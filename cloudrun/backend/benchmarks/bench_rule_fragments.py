@@ -0,0 +1,92 @@
+"""Benchmark HTML bytes sent back after editing, moving and deleting a rule.
+
+Before: every rule mutation re-rendered the whole rules section. After: with
+?swap=oob only the changed rows and the renumbered "Rule #" cells are sent.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_rule_fragments
+"""
+
+from jinja2 import Environment, FileSystemLoader
+
+from services import rule_fragments
+
+SIZES = [10, 100, 1000]
+
+env = Environment(loader=FileSystemLoader("../frontend/templates"))
+
+
+def make_rules(size):
+    return [
+        {
+            "id": f"rule-{i}",
+            "message": f"Walls on level {i} must have a fire rating",
+            "severity": "Error",
+            "conditions": [
+                {
+                    "logic": "WHERE",
+                    "propertyName": "category",
+                    "predicate": "equal to",
+                    "value": "Walls",
+                },
+                {
+                    "logic": "CHECK",
+                    "propertyName": "fire_rating",
+                    "predicate": "exists",
+                    "value": "",
+                },
+            ],
+        }
+        for i in range(size)
+    ]
+
+
+def render(template, rules, **context):
+    return len(
+        env.get_template(template)
+        .render(ruleset={"id": "ruleset-1"}, rules=rules, **context)
+        .encode()
+    )
+
+
+def full(rules):
+    return render("partials/ruleset_rules.html", rules)
+
+
+def main():
+    print("Response bytes per rule mutation (rule in the middle of the ruleset)")
+    print(f"{'rules':>6} {'full':>9} {'update':>8} {'move':>8} {'delete':>8}")
+    for size in SIZES:
+        rules = make_rules(size)
+        middle = size // 2
+
+        update = render(
+            "partials/rule_fragments.html",
+            rules,
+            include_form=True,
+            **rule_fragments.rule_updated(rules, rules[middle]["id"]),
+        )
+
+        moved = (
+            rules[: middle - 1]
+            + [rules[middle], rules[middle - 1]]
+            + rules[middle + 1 :]
+        )
+        move = render(
+            "partials/rule_fragments.html",
+            moved,
+            **rule_fragments.rule_moved(moved, middle, middle - 1),
+        )
+
+        remaining = rules[:middle] + rules[middle + 1 :]
+        delete = render(
+            "partials/rule_fragments.html",
+            remaining,
+            **rule_fragments.rule_deleted(remaining, rules[middle]["id"], middle),
+        )
+
+        print(f"{size:>6} {full(rules):>9} {update:>8} {move:>8} {delete:>8}")
+
+
+if __name__ == "__main__":
+    main()
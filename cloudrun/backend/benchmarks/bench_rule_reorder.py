@@ -0,0 +1,98 @@
+"""Benchmark Firestore document writes per rule move and delete.
+
+Before: every move or delete renumbered the whole ruleset. After: a move
+writes only the moved rule with an order value between its new neighbours,
+and a delete writes only the deleted rule.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_rule_reorder
+"""
+
+import asyncio
+
+from benchmarks.memory_firestore import MemoryFirestore
+from services.firestore_repository import FirestoreRepository
+from services.rule_ordering import moved_order
+
+SIZES = [10, 100, 1000]
+MOVES = 20
+
+
+def populate(db, rules):
+    ruleset_ref = db.collection("rulesets").document("ruleset-1")
+    ruleset_ref.set({"rule_count": rules})
+    for i in range(rules):
+        ruleset_ref.collection("rules").document(f"rule-{i}").set({"order": i + 1})
+
+
+async def move_renumber(repo, rules, current_index, target_index):
+    rules.insert(target_index, rules.pop(current_index))
+    await repo.set_rule_order("ruleset-1", [rule["id"] for rule in rules])
+
+
+async def move_fractional(repo, rules, current_index, target_index):
+    new_order = moved_order(
+        [rule["order"] for rule in rules], current_index, target_index
+    )
+    rule = rules.pop(current_index)
+    rules.insert(target_index, rule)
+    if new_order is None:
+        await repo.set_rule_order("ruleset-1", [rule["id"] for rule in rules])
+    else:
+        await repo.update_rule("ruleset-1", rule["id"], {"order": new_order})
+        rule["order"] = new_order
+
+
+async def delete_renumber(repo, rule_id):
+    await repo.delete_rule("ruleset-1", rule_id)
+    rules = await repo.list_rules("ruleset-1")
+    await repo.set_rule_order("ruleset-1", [rule["id"] for rule in rules])
+
+
+async def delete_only(repo, rule_id):
+    await repo.delete_rule("ruleset-1", rule_id)
+
+
+async def writes_per_move(move, size):
+    db = MemoryFirestore()
+    populate(db, size)
+    repo = FirestoreRepository(db)
+    rules = await repo.list_rules("ruleset-1")
+    db.reset_counters()
+    for i in range(MOVES):
+        # Alternate moving a rule from the middle up and down
+        index = size // 2
+        await move(repo, rules, index, index - 1 if i % 2 else index + 1)
+    repo.shutdown()
+    return db.document_writes / MOVES
+
+
+async def writes_per_delete(delete, size):
+    db = MemoryFirestore()
+    populate(db, size)
+    repo = FirestoreRepository(db)
+    db.reset_counters()
+    await delete(repo, f"rule-{size // 2}")
+    repo.shutdown()
+    return db.document_writes
+
+
+async def main():
+    print("Firestore document writes per operation")
+    print(
+        f"{'rules':>6} {'move before':>12} {'move after':>11} "
+        f"{'delete before':>14} {'delete after':>13}"
+    )
+    for size in SIZES:
+        move_before = await writes_per_move(move_renumber, size)
+        move_after = await writes_per_move(move_fractional, size)
+        delete_before = await writes_per_delete(delete_renumber, size)
+        delete_after = await writes_per_delete(delete_only, size)
+        print(
+            f"{size:>6} {move_before:>12.0f} {move_after:>11.0f} "
+            f"{delete_before:>14} {delete_after:>13}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""Benchmark resolving a public ruleset hash: full scan vs. hash index.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_ruleset_hash_lookup
+"""
+
+import statistics
+import time
+
+from benchmarks.memory_firestore import MemoryFirestore
+from services.ruleset_index_service import (
+    generate_ruleset_hash,
+    index_ruleset,
+    resolve_ruleset_hash,
+)
+
+SIZES = [10, 100, 1_000, 10_000, 100_000]
+LOOKUPS = 20
+
+
+def scan_lookup(db, ruleset_hash):
+    """The previous implementation: hash every ruleset until one matches."""
+    for ruleset in db.collection("rulesets").stream():
+        ruleset_data = ruleset.to_dict()
+        if generate_ruleset_hash(ruleset_data.get("project_id", ""), ruleset.id) == (
+            ruleset_hash
+        ):
+            return ruleset.id
+    return None
+
+
+def populate(db, count):
+    hashes = []
+    for i in range(count):
+        project_id = f"project-{i % 50}"
+        ruleset_id = f"ruleset-{i:06d}"
+        db.collection("rulesets").document(ruleset_id).set(
+            {"name": f"Ruleset {i}", "project_id": project_id}
+        )
+        hashes.append(index_ruleset(db, project_id, ruleset_id))
+    return hashes
+
+
+def time_lookups(lookup, db, hashes, lookups):
+    # Look up the most recently created rulesets - the worst case for a scan
+    targets = hashes[-lookups:]
+    samples = []
+    for ruleset_hash in targets:
+        start = time.perf_counter()
+        assert lookup(db, ruleset_hash) is not None
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    print(f"{'rulesets':>10} {'scan (ms)':>12} {'index (ms)':>12}")
+    for size in SIZES:
+        db = MemoryFirestore()
+        hashes = populate(db, size)
+        scan_lookups = LOOKUPS if size <= 10_000 else 3
+        scan_ms = time_lookups(scan_lookup, db, hashes, scan_lookups)
+        index_ms = time_lookups(resolve_ruleset_hash, db, hashes, LOOKUPS)
+        print(f"{size:>10} {scan_ms:>12.3f} {index_ms:>12.4f}")
+
+
+if __name__ == "__main__":
+    main()
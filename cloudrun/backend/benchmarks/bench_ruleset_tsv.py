@@ -0,0 +1,168 @@
+"""Benchmark repeated automation fetches of a 1,000 rule ruleset's TSV.
+
+Before: every fetch resolved the hash, read the ruleset and all of its rules
+(or the rules cache on a warm instance) and regenerated the TSV. After: the
+TSV is materialized when the ruleset changes and its ETag kept on the hash
+index entry, so a fetch reads that one document, and a client sending the
+ETag back in If-None-Match gets an empty 304.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_ruleset_tsv
+"""
+
+import asyncio
+import time
+
+from benchmarks.memory_firestore import MemoryFirestore
+from services import tsv_service
+from services.firestore_repository import FirestoreRepository
+from services.rules_cache import RulesCache
+from services.ruleset_index_service import generate_ruleset_hash, index_ruleset
+from services.tsv_service import (
+    etag_matches,
+    generate_ruleset_tsv,
+    load_tsv_artifact,
+    store_tsv_artifact,
+)
+
+RULES = 1000
+FETCHES = 20
+# Simulated network round trip to Firestore and Cloud Storage, in seconds
+LATENCY = 0.002
+
+
+class MemoryBlob:
+    def __init__(self, bucket, path):
+        self._bucket = bucket
+        self._path = path
+
+    def upload_from_string(self, data, content_type=None):
+        time.sleep(LATENCY)
+        self._bucket.objects[self._path] = data.encode("utf-8")
+
+    def download_as_bytes(self):
+        time.sleep(LATENCY)
+        self._bucket.downloads += 1
+        return self._bucket.objects[self._path]
+
+
+class MemoryBucket:
+    def __init__(self):
+        self.objects = {}
+        self.downloads = 0
+
+    def blob(self, path):
+        return MemoryBlob(self, path)
+
+
+def populate(db):
+    ruleset_ref = db.collection("rulesets").document("ruleset-1")
+    ruleset_ref.set(
+        {"name": "Fire safety", "project_id": "project-1", "rules_version": 1}
+    )
+    index_ruleset(db, "project-1", "ruleset-1")
+    batch = db.batch()
+    for i in range(RULES):
+        batch.set(
+            ruleset_ref.collection("rules").document(f"rule-{i}"),
+            {
+                "order": i,
+                "message": f"Walls on level {i} must have a fire rating",
+                "severity": "Error",
+                "conditions": [
+                    {
+                        "logic": "WHERE",
+                        "propertyName": "category",
+                        "predicate": "equal to",
+                        "value": "Walls",
+                    },
+                    {
+                        "logic": "CHECK",
+                        "propertyName": "fire_rating",
+                        "predicate": "exists",
+                        "value": "",
+                    },
+                ],
+            },
+        )
+        if i % 500 == 499:
+            batch.commit()
+            batch = db.batch()
+
+
+async def regenerate(repo, bucket, ruleset_hash, if_none_match):
+    ruleset_id = await repo.resolve_ruleset_hash(ruleset_hash)
+    ruleset = await repo.get_ruleset(ruleset_id)
+    rules = await repo.list_rules(ruleset_id, version=ruleset["rules_version"])
+    content, _ = generate_ruleset_tsv(ruleset, rules)
+    return len(content.encode())
+
+
+async def materialized(repo, bucket, ruleset_hash, if_none_match):
+    index_entry = await repo.get_ruleset_index_entry(ruleset_hash)
+    etag = index_entry["tsv_etag"]
+    if etag_matches(if_none_match, etag):
+        return 0
+    content = await repo.run(load_tsv_artifact, bucket, index_entry["ruleset_id"], etag)
+    return len(content.encode())
+
+
+async def publish(db, bucket):
+    repo = FirestoreRepository(db, rules_cache=RulesCache())
+    ruleset = await repo.get_ruleset("ruleset-1")
+    rules = await repo.list_rules("ruleset-1")
+    content, filename = generate_ruleset_tsv(ruleset, rules)
+    etag = store_tsv_artifact(bucket, "ruleset-1", content)
+    await repo.set_ruleset_tsv("ruleset-1", "project-1", etag, filename)
+    repo.shutdown()
+    return etag
+
+
+async def run(name, fetch, warm, conditional):
+    db = MemoryFirestore()
+    populate(db)
+    bucket = MemoryBucket()
+    etag = await publish(db, bucket)
+    ruleset_hash = generate_ruleset_hash("project-1", "ruleset-1")
+    if_none_match = f'"{etag}"' if conditional else None
+
+    repo = FirestoreRepository(db, rules_cache=RulesCache())
+    if warm:
+        await fetch(repo, bucket, ruleset_hash, if_none_match)
+    db.latency = LATENCY
+    db.reset_counters()
+    bucket.downloads = 0
+    response_bytes = 0
+
+    start = time.perf_counter()
+    for _ in range(FETCHES):
+        if not warm:
+            # Empty in-process caches simulate a fetch served by a new instance
+            tsv_service._tsv_artifacts.clear()
+            repo.rules_cache = RulesCache()
+        response_bytes += await fetch(repo, bucket, ruleset_hash, if_none_match)
+    elapsed = time.perf_counter() - start
+    repo.shutdown()
+
+    print(
+        f"{name:<26} {elapsed / FETCHES * 1000:>8.1f} "
+        f"{db.document_reads / FETCHES:>11.0f} "
+        f"{bucket.downloads / FETCHES:>10.1f} {response_bytes // FETCHES:>9}"
+    )
+
+
+async def main():
+    print(
+        f"Fetching the TSV of a ruleset with {RULES} rules "
+        f"({LATENCY * 1000:.0f} ms per round trip), per fetch"
+    )
+    print(f"{'':<26} {'ms':>8} {'doc reads':>11} {'downloads':>10} {'bytes':>9}")
+    await run("regenerate, cold (before)", regenerate, warm=False, conditional=False)
+    await run("regenerate, warm (before)", regenerate, warm=True, conditional=False)
+    await run("materialized, cold", materialized, warm=False, conditional=False)
+    await run("materialized, warm", materialized, warm=True, conditional=False)
+    await run("If-None-Match -> 304", materialized, warm=True, conditional=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+"""Benchmark project-list latency and Speckle load with the response cache.
+
+Simulates users moving back and forth between the project list and project
+pages: every list view re-runs PROJECTS_QUERY. The upstream call is replaced
+by a coroutine that sleeps for a typical response time of the nested query.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_speckle_cache
+"""
+
+import asyncio
+import random
+import statistics
+import time
+
+import httpx
+from services.speckle_cache import SpeckleResponseCache
+
+UPSTREAM_LATENCY = (0.2, 0.6)  # seconds, uniform
+USERS = 10
+VIEWS_PER_USER = 20
+THINK_TIME = 0.02  # seconds between navigations
+
+
+async def run(cache, rng):
+    upstream_calls = 0
+    latencies = []
+
+    async def upstream():
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(rng.uniform(*UPSTREAM_LATENCY))
+        return httpx.Response(200, json={"data": {"activeUser": {}}})
+
+    async def user_session(user_id):
+        for view in range(VIEWS_PER_USER):
+            # Mostly the first page, sometimes "load more"
+            cursor = None if rng.random() < 0.8 else "page-2"
+            start = time.perf_counter()
+            if cache is None:
+                await upstream()
+            else:
+                key = SpeckleResponseCache.make_key(
+                    user_id, "PROJECTS_QUERY", {"projectsCursor": cursor}
+                )
+                await cache.fetch(key, upstream)
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(THINK_TIME)
+
+    await asyncio.gather(*(user_session(f"user-{i}") for i in range(USERS)))
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return upstream_calls, statistics.median(latencies), p95
+
+
+async def main():
+    print(f"{USERS} users x {VIEWS_PER_USER} project list views")
+    print(f"{'':>10} {'upstream':>9} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    for name, cache in [("uncached", None), ("cached", SpeckleResponseCache())]:
+        calls, p50, p95 = await run(cache, random.Random(0))
+        print(f"{name:>10} {calls:>9} {p50 * 1000:>9.1f} {p95 * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""Benchmark Speckle GraphQL calls: a new AsyncClient per call vs. the shared pool.
+
+Starts a local mock GraphQL server that counts accepted connections (each one
+is a TCP handshake; against app.speckle.systems each would also be a TLS
+handshake) and simulates handshake cost with a fixed delay per connection.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_speckle_client
+"""
+
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+from services import speckle_client
+
+REQUESTS = 300
+CONCURRENCY = 10
+HANDSHAKE_DELAY = 0.03  # seconds, roughly one TCP + TLS round trip set
+RESPONSE = json.dumps(
+    {"data": {"activeUser": {"projects": {"items": [], "cursor": None}}}}
+).encode()
+
+
+class MockGraphQLServer:
+    def __init__(self):
+        self.connections = 0
+        self.server = None
+        self.url = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        await asyncio.sleep(HANDSHAKE_DELAY)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                content_length = 0
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode().partition(":")
+                    if name.lower() == "content-length":
+                        content_length = int(value.strip())
+                await reader.readexactly(content_length)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Connection: keep-alive\r\n"
+                    + f"Content-Length: {len(RESPONSE)}\r\n\r\n".encode()
+                    + RESPONSE
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+
+async def per_call_client(url):
+    async with httpx.AsyncClient() as client:
+        response = await client.post(f"{url}/graphql", json={"query": "{}"})
+        response.raise_for_status()
+
+
+async def shared_client(url):
+    response = await speckle_client.get_http_client().post(
+        f"{url}/graphql", json={"query": "{}"}
+    )
+    response.raise_for_status()
+
+
+async def run(call):
+    server = MockGraphQLServer()
+    await server.start()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    samples = []
+
+    async def timed():
+        async with semaphore:
+            start = time.perf_counter()
+            await call(server.url)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(timed() for _ in range(REQUESTS)))
+    await speckle_client.close_http_client()
+    await server.stop()
+
+    samples.sort()
+    p50 = statistics.median(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    return server.connections, p50, p95
+
+
+async def main():
+    print(f"{REQUESTS} requests, concurrency {CONCURRENCY}")
+    print(f"{'mode':<18} {'handshakes':>10} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    for name, call in (
+        ("client per call", per_call_client),
+        ("shared pool", shared_client),
+    ):
+        connections, p50, p95 = await run(call)
+        print(f"{name:<18} {connections:>10} {p50:>10.2f} {p95:>10.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""Benchmark first-render latency and per-render CPU of the rules list.
+
+Before: Jinja2Templates parsed and compiled each template from source on its
+first use in a new instance, and with auto_reload on, checked the file's
+modification time on every later render. After: templates are precompiled
+into modules when the image is built, sources loaded otherwise go through a
+bytecode cache, and auto_reload is off.
+
+Each first render runs in a fresh interpreter, like a cold instance.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_templates
+"""
+
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_rule_fragments import make_rules
+from services.template_env import create_template_env, precompile_templates
+
+TEMPLATE_DIR = "../frontend/templates"
+TEMPLATE = "partials/ruleset_rules.html"
+RULES = 100
+COLD_RUNS = 5
+RENDERS = 500
+
+# Runs in a fresh interpreter and prints the seconds to the first render
+FIRST_RENDER = """
+import json, sys, time
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from benchmarks.bench_rule_fragments import make_rules
+from services.template_env import create_template_env
+template_dir, compiled_dir, mode = sys.argv[1:4]
+if mode == "source":
+    env = Environment(loader=FileSystemLoader(template_dir), autoescape=True)
+elif mode == "bytecode":
+    env = Environment(
+        loader=FileSystemLoader(template_dir),
+        autoescape=True,
+        bytecode_cache=FileSystemBytecodeCache(compiled_dir),
+    )
+else:
+    env = create_template_env(template_dir, compiled_dir)
+rules = make_rules(%d)
+setup = time.perf_counter()
+env.get_template("%s").render(ruleset={"id": "ruleset-1"}, rules=rules)
+print(json.dumps(time.perf_counter() - setup))
+""" % (
+    RULES,
+    TEMPLATE,
+)
+
+
+def first_render(compiled_dir, mode):
+    timings = []
+    for _ in range(COLD_RUNS):
+        output = subprocess.run(
+            [sys.executable, "-c", FIRST_RENDER, TEMPLATE_DIR, compiled_dir, mode],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        timings.append(json.loads(output))
+    return sorted(timings)[len(timings) // 2] * 1000
+
+
+def render_cpu(env):
+    rules = make_rules(RULES)
+    env.get_template(TEMPLATE).render(ruleset={"id": "ruleset-1"}, rules=rules)
+    start = time.process_time()
+    for _ in range(RENDERS):
+        env.get_template(TEMPLATE).render(ruleset={"id": "ruleset-1"}, rules=rules)
+    return (time.process_time() - start) / RENDERS * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as bytecode_dir, tempfile.TemporaryDirectory() as compiled_dir:
+        precompile_templates(TEMPLATE_DIR, compiled_dir)
+        # Fill the bytecode cache, as an earlier process on the machine would
+        first_render(bytecode_dir, "bytecode")
+
+        print(f"Rendering {TEMPLATE} with {RULES} rules")
+        print(f"{'':<28} {'first render ms':>16} {'CPU ms/render':>14}")
+        rows = [
+            (
+                "source, auto_reload (before)",
+                first_render(compiled_dir, "source"),
+                render_cpu(
+                    create_template_env(TEMPLATE_DIR, compiled_dir, auto_reload=True)
+                ),
+            ),
+            ("bytecode cache", first_render(bytecode_dir, "bytecode"), None),
+            (
+                "precompiled, no auto_reload",
+                first_render(compiled_dir, "compiled"),
+                render_cpu(create_template_env(TEMPLATE_DIR, compiled_dir)),
+            ),
+        ]
+        for name, first_ms, cpu_ms in rows:
+            cpu = f"{cpu_ms:>14.3f}" if cpu_ms is not None else f"{'':>14}"
+            print(f"{name:<28} {first_ms:>16.2f} {cpu}")
+
+
+if __name__ == "__main__":
+    main()
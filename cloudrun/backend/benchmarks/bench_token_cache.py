@@ -0,0 +1,60 @@
+"""Benchmark userTokens reads with and without the token cache.
+
+Simulates a session of page loads and HTMX fragment requests from a handful of
+users. Every request needs the user's Speckle token; without the cache each
+one costs a Firestore document read.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_token_cache
+"""
+
+import asyncio
+import random
+import time
+
+from benchmarks.memory_firestore import MemoryFirestore
+from services.firestore_repository import FirestoreRepository
+from services.token_cache import TokenCache
+
+LATENCY = 0.005  # seconds per Firestore round trip
+USERS = 20
+REQUESTS = 1000
+
+
+def populate(db):
+    for i in range(USERS):
+        db.collection("userTokens").document(f"user-{i}").set(
+            {"speckleToken": f"token-{i}"}
+        )
+
+
+async def measure(token_cache):
+    db = MemoryFirestore()
+    populate(db)
+    db.reset_counters()
+    db.latency = LATENCY
+    repo = FirestoreRepository(db, token_cache=token_cache)
+    rng = random.Random(0)
+
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        await repo.get_speckle_token(f"user-{rng.randrange(USERS)}")
+    elapsed = time.perf_counter() - start
+    repo.shutdown()
+    return db.reads, elapsed
+
+
+async def main():
+    print(f"{REQUESTS} requests from {USERS} users, {LATENCY * 1000:.0f} ms per read")
+    # A zero-size cache never stores anything, i.e. the old behaviour
+    uncached_reads, uncached_time = await measure(TokenCache(maxsize=0))
+    cache = TokenCache()
+    cached_reads, cached_time = await measure(cache)
+    print(f"{'':>10} {'reads':>8} {'time (s)':>10}")
+    print(f"{'uncached':>10} {uncached_reads:>8} {uncached_time:>10.2f}")
+    print(f"{'cached':>10} {cached_reads:>8} {cached_time:>10.2f}")
+    print(f"cache stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
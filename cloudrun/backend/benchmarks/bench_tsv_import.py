@@ -0,0 +1,81 @@
+"""Benchmark TSV import throughput: one write per rule vs. batched import.
+
+Builds a synthetic 10k-row TSV (two rows per rule), parses it and stores it
+in an in-memory Firestore stand-in with simulated round-trip latency.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_tsv_import
+"""
+
+import asyncio
+import time
+from io import StringIO
+
+from benchmarks.memory_firestore import MemoryFirestore
+from services.firestore_repository import FirestoreRepository
+from services.tsv_service import parse_ruleset_tsv
+
+LATENCY = 0.002  # seconds per Firestore round trip
+ROWS = 10_000
+HEADER = (
+    "Rule Number\tLogic\tProperty Name\tPredicate\tValue\tReport Severity\tMessage\n"
+)
+
+
+def synthetic_tsv(rows):
+    lines = [HEADER]
+    for i in range(rows // 2):
+        lines.append(f"{i + 1}\tWHERE\tcategory\tequal to\tWalls\t\t\n")
+        lines.append(f"\tCHECK\theight\tgreater than\t{i}\tWarning\tRule {i}\n")
+    return "".join(lines)
+
+
+def parse(tsv_text):
+    return [
+        {
+            "conditions": rule["conditions"],
+            "message": rule["message"],
+            "severity": rule["severity"],
+            "order": order,
+        }
+        for order, rule in enumerate(parse_ruleset_tsv(StringIO(tsv_text)), start=1)
+    ]
+
+
+async def per_rule(repo, rules):
+    ruleset_id = await repo.create_ruleset({"project_id": "project-1"})
+    for index, rule_data in enumerate(rules):
+        await repo.create_rule(ruleset_id, f"rule-{index}", rule_data)
+
+
+async def batched(repo, rules):
+    await repo.import_ruleset({"project_id": "project-1"}, rules)
+
+
+async def measure(importer, rules):
+    db = MemoryFirestore(latency=LATENCY)
+    repo = FirestoreRepository(db)
+    start = time.perf_counter()
+    await importer(repo, rules)
+    elapsed = time.perf_counter() - start
+    repo.shutdown()
+    return elapsed, db.writes
+
+
+async def main():
+    tsv_text = synthetic_tsv(ROWS)
+    start = time.perf_counter()
+    rules = parse(tsv_text)
+    parse_time = time.perf_counter() - start
+    print(
+        f"{ROWS} rows -> {len(rules)} rules, parsed in {parse_time * 1000:.0f} ms, "
+        f"{LATENCY * 1000:.0f} ms per round trip"
+    )
+    print(f"{'':>10} {'commits':>8} {'time (s)':>9} {'rules/s':>9}")
+    for name, importer in [("per rule", per_rule), ("batched", batched)]:
+        elapsed, writes = await measure(importer, rules)
+        print(f"{name:>10} {writes:>8} {elapsed:>9.2f} {len(rules) / elapsed:>9.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
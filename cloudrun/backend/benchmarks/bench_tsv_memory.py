@@ -0,0 +1,120 @@
+"""Benchmark peak memory of importing a 50 MB TSV upload.
+
+Compares the old approach (read the whole upload, decode it, wrap it in
+StringIO and build every rule before writing) with parsing the upload in
+chunks while rules are written in batches. Firestore is replaced by a null
+client that discards writes, so only the import path itself is measured.
+
+Run from cloudrun/backend:
+    python -m benchmarks.bench_tsv_memory
+"""
+
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from io import StringIO
+
+from services.firestore_repository import FirestoreRepository
+from services.tsv_service import open_tsv_upload, parse_ruleset_tsv
+
+TARGET_BYTES = 50 * 1024 * 1024
+HEADER = (
+    "Rule Number\tLogic\tProperty Name\tPredicate\tValue\tReport Severity\tMessage\n"
+)
+
+
+class NullRef:
+    def __init__(self, id="doc"):
+        self.id = id
+
+    def collection(self, name):
+        return NullCollection()
+
+
+class NullCollection:
+    def document(self, document_id=None):
+        return NullRef(document_id or "doc")
+
+
+class NullBatch:
+    def set(self, ref, data, merge=False):
+        pass
+
+    def delete(self, ref):
+        pass
+
+    def commit(self):
+        pass
+
+
+class NullFirestore:
+    def collection(self, name):
+        return NullCollection()
+
+    def batch(self):
+        return NullBatch()
+
+
+def write_upload(file):
+    file.write(HEADER.encode())
+    i = 0
+    while file.tell() < TARGET_BYTES:
+        i += 1
+        file.write(f"{i}\tWHERE\tcategory\tequal to\tWalls\t\t\n".encode())
+        file.write(
+            f"\tCHECK\theight\tgreater than\t{i}\tWarning\tWall {i} too low\n".encode()
+        )
+    file.seek(0)
+
+
+def to_rule(parsed_rule, order):
+    return {
+        "conditions": parsed_rule["conditions"],
+        "message": parsed_rule["message"],
+        "severity": parsed_rule["severity"],
+        "order": order,
+    }
+
+
+async def whole_file(repo, upload):
+    tsv_text = upload.read().decode("utf-8")
+    rules = [
+        to_rule(rule, order)
+        for order, rule in enumerate(parse_ruleset_tsv(StringIO(tsv_text)), start=1)
+    ]
+    await repo.import_ruleset({"tsv_content": tsv_text}, rules)
+
+
+async def streaming(repo, upload):
+    parsed = parse_ruleset_tsv(open_tsv_upload(upload))
+    rules = (to_rule(rule, order) for order, rule in enumerate(parsed, start=1))
+    await repo.import_ruleset({"tsv_path": "rulesets/user/project/upload.tsv"}, rules)
+
+
+async def measure(importer, upload):
+    upload.seek(0)
+    repo = FirestoreRepository(NullFirestore())
+    tracemalloc.start()
+    start = time.perf_counter()
+    await importer(repo, upload)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    repo.shutdown()
+    return peak, elapsed
+
+
+async def main():
+    with tempfile.TemporaryFile() as upload:
+        write_upload(upload)
+        size = upload.seek(0, 2)
+        print(f"TSV upload: {size / 1024 / 1024:.1f} MB")
+        print(f"{'':>11} {'peak MB':>9} {'time (s)':>9}")
+        for name, importer in [("whole file", whole_file), ("streaming", streaming)]:
+            peak, elapsed = await measure(importer, upload)
+            print(f"{name:>11} {peak / 1024 / 1024:>9.1f} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,333 @@
+"""Minimal in-memory stand-in for the synchronous Firestore client.
+
+Implements just enough of the ``google.cloud.firestore`` surface used by the
+backend (collections, documents, subcollections, where/order_by/limit
+queries, count aggregations, ``list_documents``, ``get_all``, batches,
+transactions and ``Increment``) to
+benchmark access patterns without a network. Every round trip is counted in
+``MemoryFirestore.reads`` / ``MemoryFirestore.writes`` (a batch commit is one
+write round trip; ``document_reads`` and ``document_writes`` count every
+document read or written, which is what Firestore bills) and can optionally sleep for ``latency`` seconds to
+simulate the network.
+"""
+
+import secrets
+import string
+import threading
+import time
+from types import SimpleNamespace
+
+from google.cloud.firestore_v1.transforms import Increment
+
+_ID_ALPHABET = string.ascii_letters + string.digits
+
+
+def _new_id():
+    return "".join(secrets.choice(_ID_ALPHABET) for _ in range(20))
+
+
+class MemorySnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return (self._data or {}).get(field)
+
+
+class MemoryDocument:
+    def __init__(self, store, path):
+        self._store = store
+        self.path = path
+        self.id = path[-1]
+
+    def collection(self, name):
+        return MemoryCollection(self._store, self.path + (name,))
+
+    def get(self, transaction=None):
+        self._store._round_trip(reads=1, document_reads=1)
+        return MemorySnapshot(self, self._store._docs.get(self.path))
+
+    def set(self, data, merge=False):
+        self._store._round_trip(writes=1, document_writes=1)
+        self._store._apply_set(self.path, data, merge)
+
+    def update(self, data):
+        self._store._round_trip(writes=1, document_writes=1)
+        self._store._apply_update(self.path, data)
+
+    def delete(self):
+        self._store._round_trip(writes=1, document_writes=1)
+        self._store._docs.pop(self.path, None)
+
+
+class MemoryQuery:
+    def __init__(
+        self, store, path, filters=(), order=None, limit=None, descending=False
+    ):
+        self._store = store
+        self._path = path
+        self._filters = filters
+        self._order = order
+        self._limit = limit
+        self._descending = descending
+
+    def where(self, field, op, value):
+        if op not in ("==", "in"):
+            raise NotImplementedError(op)
+        return MemoryQuery(
+            self._store,
+            self._path,
+            self._filters + ((field, op, value),),
+            self._order,
+            self._limit,
+            self._descending,
+        )
+
+    def order_by(self, field, direction=None):
+        return MemoryQuery(
+            self._store,
+            self._path,
+            self._filters,
+            field,
+            self._limit,
+            direction == "DESCENDING",
+        )
+
+    def limit(self, count):
+        return MemoryQuery(
+            self._store,
+            self._path,
+            self._filters,
+            self._order,
+            count,
+            self._descending,
+        )
+
+    def _matches(self, data):
+        for field, op, value in self._filters:
+            if op == "==" and data.get(field) != value:
+                return False
+            if op == "in" and data.get(field) not in value:
+                return False
+        return True
+
+    def _snapshots(self):
+        depth = len(self._path) + 1
+        with self._store._lock:
+            items = [
+                (path, data)
+                for path, data in self._store._docs.items()
+                if len(path) == depth
+                and path[:-1] == self._path
+                and self._matches(data)
+            ]
+        if self._order:
+            items.sort(
+                key=lambda item: item[1].get(self._order, 0),
+                reverse=self._descending,
+            )
+        if self._limit is not None:
+            items = items[: self._limit]
+        return [
+            MemorySnapshot(MemoryDocument(self._store, path), dict(data))
+            for path, data in items
+        ]
+
+    def stream(self):
+        snapshots = self._snapshots()
+        # Queries are billed at least one document read, even when empty
+        self._store._round_trip(reads=1, document_reads=max(len(snapshots), 1))
+        return iter(snapshots)
+
+    def count(self):
+        return MemoryCountQuery(self)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+class MemoryCountQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def get(self):
+        self._query._store._round_trip(reads=1, document_reads=1)
+        result = SimpleNamespace(alias="count", value=len(self._query._snapshots()))
+        return [[result]]
+
+
+class MemoryCollection(MemoryQuery):
+    def __init__(self, store, path):
+        super().__init__(store, path)
+        self.id = path[-1]
+
+    def document(self, document_id=None):
+        return MemoryDocument(self._store, self._path + (document_id or _new_id(),))
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return time.time(), ref
+
+    def list_documents(self, page_size=None):
+        """Yield every document reference, one read round trip per page.
+
+        Like Firestore, this includes missing documents that only have
+        subcollections.
+        """
+        depth = len(self._path)
+        last_id = None
+        while True:
+            self._store._round_trip(reads=1)
+            with self._store._lock:
+                ids = sorted(
+                    {
+                        path[depth]
+                        for path in self._store._docs
+                        if len(path) > depth
+                        and path[:depth] == self._path
+                        and (last_id is None or path[depth] > last_id)
+                    }
+                )
+            page = ids[:page_size] if page_size else ids
+            for document_id in page:
+                yield self.document(document_id)
+            if not page_size or len(page) < page_size:
+                return
+            last_id = page[-1]
+
+
+class MemoryBatch:
+    def __init__(self, store):
+        self._store = store
+        self._ops = []
+
+    def set(self, ref, data, merge=False):
+        self._ops.append(("set", ref.path, data, merge))
+
+    def update(self, ref, data):
+        self._ops.append(("update", ref.path, data, False))
+
+    def delete(self, ref):
+        self._ops.append(("delete", ref.path, None, False))
+
+    def commit(self):
+        if len(self._ops) > 500:
+            raise ValueError("A batch can contain at most 500 writes")
+        self._store._round_trip(writes=1, document_writes=len(self._ops))
+        for op, path, data, merge in self._ops:
+            if op == "set":
+                self._store._apply_set(path, data, merge)
+            elif op == "update":
+                self._store._apply_update(path, data)
+            else:
+                self._store._docs.pop(path, None)
+        self._ops = []
+
+
+class MemoryTransaction(MemoryBatch):
+    """Transaction usable with ``firestore.transactional``.
+
+    Transactions are serialized with a store-wide lock instead of optimistic
+    retries, which is enough for counting reads and writes.
+    """
+
+    _read_only = False
+    _max_attempts = 1
+
+    def __init__(self, store):
+        super().__init__(store)
+        self._id = None
+
+    def _clean_up(self):
+        self._ops = []
+        self._id = None
+
+    def _begin(self, retry_id=None):
+        self._store._transaction_lock.acquire()
+        self._id = b"transaction"
+
+    def _commit(self):
+        try:
+            self.commit()
+        finally:
+            self._release()
+
+    def _rollback(self):
+        self._ops = []
+        self._release()
+
+    def _release(self):
+        if self._id is not None:
+            self._id = None
+            self._store._transaction_lock.release()
+
+
+class MemoryFirestore:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.reads = 0
+        self.writes = 0
+        self.document_reads = 0
+        self.document_writes = 0
+        self._docs = {}
+        self._lock = threading.Lock()
+        self._transaction_lock = threading.Lock()
+
+    def collection(self, name):
+        return MemoryCollection(self, (name,))
+
+    def batch(self):
+        return MemoryBatch(self)
+
+    def transaction(self):
+        return MemoryTransaction(self)
+
+    def get_all(self, references, transaction=None):
+        self._round_trip(reads=1, document_reads=len(references))
+        return [MemorySnapshot(ref, self._docs.get(ref.path)) for ref in references]
+
+    def reset_counters(self):
+        self.reads = 0
+        self.writes = 0
+        self.document_reads = 0
+        self.document_writes = 0
+
+    def _round_trip(self, reads=0, writes=0, document_reads=0, document_writes=0):
+        with self._lock:
+            self.reads += reads
+            self.writes += writes
+            self.document_reads += document_reads
+            self.document_writes += document_writes
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _apply_set(self, path, data, merge):
+        with self._lock:
+            current = self._docs.get(path, {}) if merge else {}
+            self._docs[path] = _apply_transforms(current, data)
+
+    def _apply_update(self, path, data):
+        with self._lock:
+            if path not in self._docs:
+                raise KeyError(f"No document to update: {'/'.join(path)}")
+            self._docs[path] = _apply_transforms(self._docs[path], data)
+
+
+def _apply_transforms(current, data):
+    merged = dict(current)
+    for field, value in data.items():
+        if isinstance(value, Increment):
+            merged[field] = merged.get(field, 0) + value.value
+        else:
+            merged[field] = value
+    return merged
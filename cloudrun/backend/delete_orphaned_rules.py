@@ -0,0 +1,17 @@
+"""Delete rules left behind by rulesets that no longer exist.
+
+Large rulesets have their rules deleted in a background task after the
+ruleset itself is gone. If the instance stops before that finishes, or the
+ruleset was deleted before rules were removed with it, the rules stay behind.
+Run this occasionally (e.g. from a scheduled job) to remove them.
+
+Usage (from cloudrun/backend, with the service account key in place):
+    python delete_orphaned_rules.py
+"""
+
+from auth import db
+from services.ruleset_deletion import delete_orphaned_rules
+
+if __name__ == "__main__":
+    count = delete_orphaned_rules(db)
+    print(f"Deleted {count} orphaned rules")
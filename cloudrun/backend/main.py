@@ -1,28 +1,56 @@
-import base64
-import hashlib
+import csv
 import json
 import os
 import secrets
 import string
+from contextlib import asynccontextmanager
 from datetime import datetime
-from urllib.parse import urljoin
+from typing import Optional
 
-import httpx
-from auth import exchange_token, get_current_user, init_auth
+from auth import bucket, exchange_token, get_current_user, init_auth
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from firebase_admin import firestore
-from services.tsv_service import generate_ruleset_tsv
+from services import rule_fragments
+from services.fanout import ServerTiming, fan_out
+from services.firestore_repository import FirestoreRepository
+from services.rule_compiler import (
+    RuleCompileError,
+    compile_rule,
+    rule_plans,
+    validate_rules,
+)
+from services.rule_ordering import moved_order
+from services.ruleset_index_service import MAX_BATCH_SIZE, generate_ruleset_hash
+from services.speckle_cache import cached_speckle_graphql, speckle_cache
+from services.speckle_client import lifespan as speckle_client_lifespan
+from services.speckle_client import speckle_graphql
+from services.template_env import create_template_env
+from services.token_cache import token_cache
+from services.tsv_service import (
+    TSV_IMPORT_MAX_BYTES,
+    TsvTooLargeError,
+    delete_tsv_artifact,
+    etag_matches,
+    generate_ruleset_tsv,
+    load_tsv_artifact,
+    open_tsv_upload,
+    parse_ruleset_tsv,
+    store_tsv_artifact,
+    tsv_cache_headers,
+    tsv_etag,
+    upload_raw_tsv,
+)
 from starlette.middleware.sessions import SessionMiddleware
 
 # Load environment variables
 load_dotenv()
 
 # Constants for Speckle API
-SPECKLE_SERVER_URL = os.getenv("SPECKLE_SERVER_URL", "https://app.speckle.systems")
 PROJECTS_PER_PAGE = 5
 MODELS_PER_PROJECT = 20
 VERSIONS_PER_MODEL = 1
@@ -87,10 +115,29 @@ query($filter: UserProjectsFilter, $modelsLimit: Int!, $versionsLimit: Int!) {
 }
 """
 
+PROJECT_QUERY = """
+query($projectId: String!) {
+  project(id: $projectId) {
+    id
+    name
+    description
+  }
+}
+"""
+
 # Initialize Firebase Admin and get Firestore client
 db = firestore.client()
+repo = FirestoreRepository(db)
+
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    async with speckle_client_lifespan(app):
+        yield
+    repo.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add session middleware
 app.add_middleware(
@@ -98,7 +145,7 @@ app.add_middleware(
 )
 
 # Templates
-templates = Jinja2Templates(directory="./frontend/templates")
+templates = Jinja2Templates(env=create_template_env())
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="./frontend/static"), name="static")
@@ -120,6 +167,10 @@ async def auth_callback(request: Request):
 @app.get("/logout")
 async def logout(request: Request):
     """Clear the session and redirect to home"""
+    user = request.session.get("user")
+    if user:
+        token_cache.invalidate(user["id"])
+        speckle_cache.invalidate_user(user["id"])
     request.session.clear()
     return HTMLResponse(
         """
@@ -158,124 +209,118 @@ async def home(request: Request):
     # print(f"User found: {user['id']}")
 
     # Get user's Speckle token
-    user_token = db.collection("userTokens").document(user["id"]).get()
-    if not user_token.exists:
+    speckle_token = await repo.get_speckle_token(user["id"])
+    if not speckle_token:
         # print("No user token found, showing login page")
         return templates.TemplateResponse(
             "login.html", {"request": request, "title": "Model Checker", "user": None}
         )
 
-    speckle_token = user_token.to_dict().get("speckleToken")
     # print("Got Speckle token")
 
     # Fetch projects from Speckle
-    async with httpx.AsyncClient() as client:
-        try:
-            # print("=== Making request to Speckle ===")
-            variables = {
-                "projectsLimit": PROJECTS_PER_PAGE,
-                "modelsLimit": MODELS_PER_PROJECT,
-                "versionsLimit": VERSIONS_PER_MODEL,
-                "projectsCursor": None,
-                "modelsCursor": None,
-            }
-            # print(
-            #     "Making request to Speckle with variables:",
-            #     json.dumps(variables, indent=2),
-            # )
-            # print("Query:", PROJECTS_QUERY)
-
-            response = await client.post(
-                urljoin(SPECKLE_SERVER_URL, "/graphql"),
-                headers={"Authorization": f"Bearer {speckle_token}"},
-                json={"query": PROJECTS_QUERY, "variables": variables},
-            )
-
-            # print("=== Got response from Speckle ===")
-            # print(f"Response status: {response.status_code}")
-            # print(f"Response headers: {dict(response.headers)}")
-            # print("Raw response:", response.text)
-
-            if response.status_code != 200:
-                error_content = response.text
-                # print(f"Error response from Speckle: {error_content}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Failed to fetch projects from Speckle: {error_content}",
-                )
+    try:
+        # print("=== Making request to Speckle ===")
+        variables = {
+            "projectsLimit": PROJECTS_PER_PAGE,
+            "modelsLimit": MODELS_PER_PROJECT,
+            "versionsLimit": VERSIONS_PER_MODEL,
+            "projectsCursor": None,
+            "modelsCursor": None,
+        }
+        # print(
+        #     "Making request to Speckle with variables:",
+        #     json.dumps(variables, indent=2),
+        # )
+        # print("Query:", PROJECTS_QUERY)
+
+        response = await cached_speckle_graphql(
+            user["id"], speckle_token, PROJECTS_QUERY, variables
+        )
 
-            try:
-                data = response.json()
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse JSON response: {e}")
-                print("Raw response was:", response.text)
-                raise HTTPException(
-                    status_code=500, detail="Invalid JSON response from Speckle"
-                )
+        # print("=== Got response from Speckle ===")
+        # print(f"Response status: {response.status_code}")
+        # print(f"Response headers: {dict(response.headers)}")
+        # print("Raw response:", response.text)
+
+        if response.status_code != 200:
+            error_content = response.text
+            # print(f"Error response from Speckle: {error_content}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"Failed to fetch projects from Speckle: {error_content}",
+            )
 
-            # print(f"Response data keys: {data.keys()}")
-            if "errors" in data:
-                print(f"GraphQL errors: {json.dumps(data['errors'], indent=2)}")
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"GraphQL errors: {json.dumps(data['errors'])}",
-                )
+        try:
+            data = response.json()
+        except json.JSONDecodeError as e:
+            print(f"Failed to parse JSON response: {e}")
+            print("Raw response was:", response.text)
+            raise HTTPException(
+                status_code=500, detail="Invalid JSON response from Speckle"
+            )
 
-            if "data" not in data or "activeUser" not in data["data"]:
-                print(f"Unexpected response structure: {json.dumps(data, indent=2)}")
-                raise HTTPException(
-                    status_code=500, detail="Unexpected response structure from Speckle"
-                )
+        # print(f"Response data keys: {data.keys()}")
+        if "errors" in data:
+            print(f"GraphQL errors: {json.dumps(data['errors'], indent=2)}")
+            raise HTTPException(
+                status_code=500,
+                detail=f"GraphQL errors: {json.dumps(data['errors'])}",
+            )
 
-            projects = data["data"]["activeUser"]["projects"]["items"]
-            has_more_projects = (
-                data["data"]["activeUser"]["projects"]["cursor"] is not None
+        if "data" not in data or "activeUser" not in data["data"]:
+            print(f"Unexpected response structure: {json.dumps(data, indent=2)}")
+            raise HTTPException(
+                status_code=500, detail="Unexpected response structure from Speckle"
             )
-            next_projects_cursor = data["data"]["activeUser"]["projects"]["cursor"]
 
-            # print("=== Successfully processed response ===")
+        projects = data["data"]["activeUser"]["projects"]["items"]
+        has_more_projects = data["data"]["activeUser"]["projects"]["cursor"] is not None
+        next_projects_cursor = data["data"]["activeUser"]["projects"]["cursor"]
 
-            total_count = (
-                data.get("data", {})
-                .get("activeUser", {})
-                .get("projects", {})
-                .get("totalCount", 0)
-            )
+        # print("=== Successfully processed response ===")
 
-            # print(f"Total projects available: {total_count}")
+        total_count = (
+            data.get("data", {})
+            .get("activeUser", {})
+            .get("projects", {})
+            .get("totalCount", 0)
+        )
 
-            return templates.TemplateResponse(
-                "project_list.html",
-                {
-                    "request": request,
-                    "title": "Model Checker",
-                    "user": user,
-                    "projects": projects,
-                    "has_more_projects": has_more_projects,
-                    "next_projects_cursor": next_projects_cursor,
-                },
-            )
+        # print(f"Total projects available: {total_count}")
 
-        except Exception as e:
-            import traceback
+        return templates.TemplateResponse(
+            "project_list.html",
+            {
+                "request": request,
+                "title": "Model Checker",
+                "user": user,
+                "projects": projects,
+                "has_more_projects": has_more_projects,
+                "next_projects_cursor": next_projects_cursor,
+            },
+        )
 
-            print("=== Error in home function ===")
-            print("Error type:", type(e).__name__)
-            print("Error message:", str(e))
-            print("Full traceback:")
-            print(traceback.format_exc())
+    except Exception as e:
+        import traceback
 
-            return templates.TemplateResponse(
-                "project_list.html",
-                {
-                    "request": request,
-                    "title": "Model Checker",
-                    "user": user,
-                    "projects": [],
-                    "has_more_projects": False,
-                    "next_projects_cursor": None,
-                },
-            )
+        print("=== Error in home function ===")
+        print("Error type:", type(e).__name__)
+        print("Error message:", str(e))
+        print("Full traceback:")
+        print(traceback.format_exc())
+
+        return templates.TemplateResponse(
+            "project_list.html",
+            {
+                "request": request,
+                "title": "Model Checker",
+                "user": user,
+                "projects": [],
+                "has_more_projects": False,
+                "next_projects_cursor": None,
+            },
+        )
 
 
 @app.get("/rulesets", response_class=HTMLResponse)
@@ -284,12 +329,7 @@ async def list_rulesets(request: Request):
     if not user:
         return HTMLResponse(status_code=401)
 
-    rulesets = db.collection("rulesets").where("user_id", "==", user["id"]).stream()
-    ruleset_list = []
-    for doc in rulesets:
-        data = doc.to_dict()
-        data["id"] = doc.id
-        ruleset_list.append(data)
+    ruleset_list = await repo.list_rulesets(user["id"])
     return templates.TemplateResponse(
         "rulesets.html", {"request": request, "rulesets": ruleset_list, "user": user}
     )
@@ -312,17 +352,15 @@ async def edit_ruleset(request: Request, ruleset_id: str):
     if not user:
         return HTMLResponse(status_code=401)
 
-    doc = db.collection("rulesets").document(ruleset_id).get()
-    if not doc.exists:
+    ruleset = await repo.get_ruleset(ruleset_id)
+    if not ruleset:
         raise HTTPException(status_code=404, detail="Ruleset not found")
 
-    ruleset = doc.to_dict()
     if ruleset.get("user_id") != user["id"]:
         raise HTTPException(
             status_code=403, detail="Not authorized to edit this ruleset"
         )
 
-    ruleset["id"] = doc.id
     return templates.TemplateResponse(
         "ruleset_form.html", {"request": request, "ruleset": ruleset, "user": user}
     )
@@ -351,8 +389,7 @@ async def create_ruleset(request: Request):
     }
 
     # Create the ruleset and get its ID
-    ruleset_ref = db.collection("rulesets").add(ruleset_data)
-    ruleset_id = ruleset_ref[1].id
+    ruleset_id = await repo.create_ruleset(ruleset_data)
 
     # If it's an HTMX request, return the rules list partial
     if request.headers.get("HX-Request"):
@@ -377,11 +414,10 @@ async def update_ruleset(request: Request, ruleset_id: str):
     if not user:
         return HTMLResponse(status_code=401)
 
-    doc = db.collection("rulesets").document(ruleset_id).get()
-    if not doc.exists:
+    ruleset = await repo.get_ruleset(ruleset_id)
+    if not ruleset:
         raise HTTPException(status_code=404, detail="Ruleset not found")
 
-    ruleset = doc.to_dict()
     if ruleset.get("user_id") != user["id"]:
         raise HTTPException(
             status_code=403, detail="Not authorized to edit this ruleset"
@@ -392,6 +428,10 @@ async def update_ruleset(request: Request, ruleset_id: str):
         rules = json.loads(form_data.get("rules"))
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid JSON in rules field")
+    try:
+        validate_rules(rules)
+    except RuleCompileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     ruleset_data = {
         "name": form_data.get("name"),
@@ -400,7 +440,15 @@ async def update_ruleset(request: Request, ruleset_id: str):
         "updated_at": datetime.utcnow(),
     }
 
-    db.collection("rulesets").document(ruleset_id).update(ruleset_data)
+    await repo.update_ruleset(ruleset_id, ruleset_data)
+
+    # The TSV filename follows the ruleset name
+    version = ruleset.get("rules_version", 0)
+    await _publish_ruleset_tsv(
+        ruleset | ruleset_data,
+        await repo.list_rules(ruleset_id, version=version),
+        version,
+    )
     return HTMLResponse(
         """
         <script>
@@ -424,140 +472,129 @@ async def get_projects(
         return HTMLResponse(status_code=401)
 
     # Get user's Speckle token
-    user_token = db.collection("userTokens").document(user["id"]).get()
-    if not user_token.exists:
+    speckle_token = await repo.get_speckle_token(user["id"])
+    if not speckle_token:
         return HTMLResponse(status_code=401)
 
-    speckle_token = user_token.to_dict().get("speckleToken")
-
     # Fetch projects from Speckle
-    async with httpx.AsyncClient() as client:
-        try:
-            # Log the request details
-            variables = {
-                "projectsLimit": PROJECTS_PER_PAGE,
-                "modelsLimit": MODELS_PER_PROJECT,
-                "versionsLimit": VERSIONS_PER_MODEL,
-                "projectsCursor": projects_cursor,
-                "modelsCursor": models_cursor,
-            }
-            # print(
-            #     "Making request to Speckle with variables:",
-            #     json.dumps(variables, indent=2),
-            # )
-
-            response = await client.post(
-                urljoin(SPECKLE_SERVER_URL, "/graphql"),
-                headers={"Authorization": f"Bearer {speckle_token}"},
-                json={"query": PROJECTS_QUERY, "variables": variables},
-            )
+    try:
+        # Log the request details
+        variables = {
+            "projectsLimit": PROJECTS_PER_PAGE,
+            "modelsLimit": MODELS_PER_PROJECT,
+            "versionsLimit": VERSIONS_PER_MODEL,
+            "projectsCursor": projects_cursor,
+            "modelsCursor": models_cursor,
+        }
+        # print(
+        #     "Making request to Speckle with variables:",
+        #     json.dumps(variables, indent=2),
+        # )
+
+        response = await cached_speckle_graphql(
+            user["id"], speckle_token, PROJECTS_QUERY, variables
+        )
 
-            # Log the raw response for debugging
-            # print("Raw response from Speckle:", response.text)
+        # Log the raw response for debugging
+        # print("Raw response from Speckle:", response.text)
 
-            response.raise_for_status()
-            data = response.json()
+        response.raise_for_status()
+        data = response.json()
 
-            # Check for GraphQL errors
-            if "errors" in data:
-                print("GraphQL errors:", json.dumps(data["errors"], indent=2))
-                if request.headers.get("HX-Request"):
-                    return templates.TemplateResponse(
-                        "partials/project_list_content.html",
-                        {
-                            "request": request,
-                            "projects": [],
-                            "has_more_projects": False,
-                            "next_projects_cursor": None,
-                        },
-                    )
+        # Check for GraphQL errors
+        if "errors" in data:
+            print("GraphQL errors:", json.dumps(data["errors"], indent=2))
+            if request.headers.get("HX-Request"):
                 return templates.TemplateResponse(
-                    "project_list.html",
+                    "partials/project_list_content.html",
                     {
                         "request": request,
-                        "user": user,
                         "projects": [],
                         "has_more_projects": False,
                         "next_projects_cursor": None,
                     },
                 )
-
-            # Extract projects from response
-            projects = (
-                data.get("data", {})
-                .get("activeUser", {})
-                .get("projects", {})
-                .get("items", [])
-            )
-            has_more_projects = bool(
-                data.get("data", {})
-                .get("activeUser", {})
-                .get("projects", {})
-                .get("cursor")
-            )
-            next_projects_cursor = (
-                data.get("data", {})
-                .get("activeUser", {})
-                .get("projects", {})
-                .get("cursor")
+            return templates.TemplateResponse(
+                "project_list.html",
+                {
+                    "request": request,
+                    "user": user,
+                    "projects": [],
+                    "has_more_projects": False,
+                    "next_projects_cursor": None,
+                },
             )
 
-            # print(f"Next projects cursor: {next_projects_cursor}")
+        # Extract projects from response
+        projects = (
+            data.get("data", {})
+            .get("activeUser", {})
+            .get("projects", {})
+            .get("items", [])
+        )
+        has_more_projects = bool(
+            data.get("data", {}).get("activeUser", {}).get("projects", {}).get("cursor")
+        )
+        next_projects_cursor = (
+            data.get("data", {}).get("activeUser", {}).get("projects", {}).get("cursor")
+        )
 
-            # Return appropriate template based on request type
-            if request.headers.get("HX-Request"):
-                content = templates.get_template(
-                    "partials/project_list_content.html"
-                ).render(
-                    {
-                        "request": request,
-                        "projects": projects,
-                        "has_more_projects": has_more_projects,
-                        "next_projects_cursor": next_projects_cursor,
-                    }
-                )
+        # print(f"Next projects cursor: {next_projects_cursor}")
 
-                content += templates.get_template("partials/load_more_oob.html").render(
-                    {
-                        "has_more_projects": has_more_projects,
-                        "next_projects_cursor": next_projects_cursor,
-                    }
-                )
-                response = HTMLResponse(content)
-                return response
-            return templates.TemplateResponse(
-                "project_list.html",
+        # Return appropriate template based on request type
+        if request.headers.get("HX-Request"):
+            content = templates.get_template(
+                "partials/project_list_content.html"
+            ).render(
                 {
                     "request": request,
-                    "user": user,
                     "projects": projects,
                     "has_more_projects": has_more_projects,
                     "next_projects_cursor": next_projects_cursor,
-                },
+                }
             )
 
-        except Exception as e:
-            print(f"Error in get_projects: {str(e)}")
-            if request.headers.get("HX-Request"):
-                return templates.TemplateResponse(
-                    "partials/project_list_content.html",
-                    {
-                        "request": request,
-                        "projects": [],
-                        "has_more_projects": False,
-                        "next_projects_cursor": None,
-                    },
-                )
+            content += templates.get_template("partials/load_more_oob.html").render(
+                {
+                    "has_more_projects": has_more_projects,
+                    "next_projects_cursor": next_projects_cursor,
+                }
+            )
+            response = HTMLResponse(content)
+            return response
+        return templates.TemplateResponse(
+            "project_list.html",
+            {
+                "request": request,
+                "user": user,
+                "projects": projects,
+                "has_more_projects": has_more_projects,
+                "next_projects_cursor": next_projects_cursor,
+            },
+        )
+
+    except Exception as e:
+        print(f"Error in get_projects: {str(e)}")
+        if request.headers.get("HX-Request"):
             return templates.TemplateResponse(
-                "project_list.html",
+                "partials/project_list_content.html",
                 {
                     "request": request,
-                    "user": user,
                     "projects": [],
                     "has_more_projects": False,
                     "next_projects_cursor": None,
                 },
             )
+        return templates.TemplateResponse(
+            "project_list.html",
+            {
+                "request": request,
+                "user": user,
+                "projects": [],
+                "has_more_projects": False,
+                "next_projects_cursor": None,
+            },
+        )
 
 
 @app.get("/projects/search", response_class=HTMLResponse)
@@ -568,89 +605,40 @@ async def search_projects(request: Request, search: str = None):
         return HTMLResponse(status_code=401)
 
     # Get user's Speckle token
-    user_token = db.collection("userTokens").document(user["id"]).get()
-    if not user_token.exists:
+    speckle_token = await repo.get_speckle_token(user["id"])
+    if not speckle_token:
         return HTMLResponse(status_code=401)
 
-    speckle_token = user_token.to_dict().get("speckleToken")
-
     # If search is empty or None, use the regular projects query
     if not search:
         return await get_projects(request)
 
     # Fetch projects from Speckle
-    async with httpx.AsyncClient() as client:
-        try:
-            # Log the request details
-            variables = {
-                "modelsLimit": MODELS_PER_PROJECT,
-                "versionsLimit": VERSIONS_PER_MODEL,
-                "filter": {"search": search},
-            }
-            # print(
-            #     "Making search request to Speckle with variables:",
-            #     json.dumps(variables, indent=2),
-            # )
-
-            response = await client.post(
-                urljoin(SPECKLE_SERVER_URL, "/graphql"),
-                headers={"Authorization": f"Bearer {speckle_token}"},
-                json={"query": PROJECTS_SEARCH_QUERY, "variables": variables},
-            )
-
-            # Log the raw response for debugging
-            # print("Raw response from Speckle:", response.text)
-
-            response.raise_for_status()
-            data = response.json()
-
-            # Check for GraphQL errors
-            if "errors" in data:
-                print("GraphQL errors:", json.dumps(data["errors"], indent=2))
-                return templates.TemplateResponse(
-                    "partials/project_list_content.html",
-                    {
-                        "request": request,
-                        "projects": [],
-                        "has_more_projects": False,
-                        "next_projects_cursor": None,
-                    },
-                )
-
-            # Extract projects from response
-            projects = (
-                data.get("data", {})
-                .get("activeUser", {})
-                .get("projects", {})
-                .get("items", [])
-            )
-
-            # Return both the project list content and the load more container state
+    try:
+        # Log the request details
+        variables = {
+            "modelsLimit": MODELS_PER_PROJECT,
+            "versionsLimit": VERSIONS_PER_MODEL,
+            "filter": {"search": search},
+        }
+        # print(
+        #     "Making search request to Speckle with variables:",
+        #     json.dumps(variables, indent=2),
+        # )
 
-            content = templates.get_template(
-                "partials/project_list_content.html"
-            ).render(
-                {
-                    "request": request,
-                    "projects": projects,
-                    "has_more_projects": False,
-                    "next_projects_cursor": None,
-                }
-            )
+        response = await cached_speckle_graphql(
+            user["id"], speckle_token, PROJECTS_SEARCH_QUERY, variables
+        )
 
-            # Hide the load more button
-            content += templates.get_template("partials/load_more_oob.html").render(
-                {
-                    "has_more_projects": False,
-                    "next_projects_cursor": None,
-                }
-            )
+        # Log the raw response for debugging
+        # print("Raw response from Speckle:", response.text)
 
-            response = HTMLResponse(content)
-            return response
+        response.raise_for_status()
+        data = response.json()
 
-        except Exception as e:
-            print(f"Error in search_projects: {str(e)}")
+        # Check for GraphQL errors
+        if "errors" in data:
+            print("GraphQL errors:", json.dumps(data["errors"], indent=2))
             return templates.TemplateResponse(
                 "partials/project_list_content.html",
                 {
@@ -661,92 +649,114 @@ async def search_projects(request: Request, search: str = None):
                 },
             )
 
+        # Extract projects from response
+        projects = (
+            data.get("data", {})
+            .get("activeUser", {})
+            .get("projects", {})
+            .get("items", [])
+        )
+
+        # Return both the project list content and the load more container state
+
+        content = templates.get_template("partials/project_list_content.html").render(
+            {
+                "request": request,
+                "projects": projects,
+                "has_more_projects": False,
+                "next_projects_cursor": None,
+            }
+        )
+
+        # Hide the load more button
+        content += templates.get_template("partials/load_more_oob.html").render(
+            {
+                "has_more_projects": False,
+                "next_projects_cursor": None,
+            }
+        )
+
+        response = HTMLResponse(content)
+        return response
+
+    except Exception as e:
+        print(f"Error in search_projects: {str(e)}")
+        return templates.TemplateResponse(
+            "partials/project_list_content.html",
+            {
+                "request": request,
+                "projects": [],
+                "has_more_projects": False,
+                "next_projects_cursor": None,
+            },
+        )
+
 
 @app.get("/projects/{project_id}", response_class=HTMLResponse)
 async def project_details(request: Request, project_id: str):
     """Get details and rulesets for a specific project"""
+    timing = ServerTiming()
     user = await get_current_user(request)
     if not user:
         return HTMLResponse(status_code=401)
 
     # Get user's Speckle token
-    user_token = db.collection("userTokens").document(user["id"]).get()
-    if not user_token.exists:
+    speckle_token = await timing.measure("token", repo.get_speckle_token(user["id"]))
+    if not speckle_token:
         return HTMLResponse(status_code=401)
 
-    speckle_token = user_token.to_dict().get("speckleToken")
-
-    # Fetch project details from Speckle
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                urljoin(SPECKLE_SERVER_URL, "/graphql"),
-                headers={"Authorization": f"Bearer {speckle_token}"},
-                json={
-                    "query": """
-                    query($projectId: String!) {
-                        project(id: $projectId) {
-                            id
-                            name
-                            description
-                        }
-                    }
-                    """,
-                    "variables": {"projectId": project_id},
-                },
-            )
-
-            response.raise_for_status()
-            data = response.json()
+    # Fetch project details from Speckle and rulesets from Firestore together.
+    # The template only needs rule counts, which are denormalized onto the
+    # ruleset documents - one query regardless of how many rulesets exist
+    try:
+        results = await fan_out(
+            timing,
+            speckle=speckle_graphql(
+                speckle_token, PROJECT_QUERY, {"projectId": project_id}
+            ),
+            firestore=repo.list_rulesets(user["id"], project_id),
+        )
+        response = results["speckle"]
 
-            if "errors" in data or not data.get("data", {}).get("project"):
-                print(
-                    "Project not found or GraphQL errors:",
-                    json.dumps(data.get("errors", []), indent=2),
-                )
-                return templates.TemplateResponse(
-                    "project_not_found.html", {"request": request, "user": user}
-                )
+        response.raise_for_status()
+        data = response.json()
 
-            project = data.get("data", {}).get("project")
+        if "errors" in data or not data.get("data", {}).get("project"):
+            print(
+                "Project not found or GraphQL errors:",
+                json.dumps(data.get("errors", []), indent=2),
+            )
+            return templates.TemplateResponse(
+                "project_not_found.html", {"request": request, "user": user}
+            )
 
-            # print(f"Project: {project['id']}")
+        project = data.get("data", {}).get("project")
 
-            # Get rulesets for this project
-            rulesets = (
-                db.collection("rulesets")
-                .where("user_id", "==", user["id"])
-                .where("project_id", "==", project["id"])
-                .stream()
-            )
+        # print(f"Project: {project['id']}")
 
-            ruleset_list = []
-            for doc in rulesets:
-                data = doc.to_dict()
-                data["id"] = doc.id
-                data["rules"] = list(
-                    db.collection("rulesets")
-                    .document(doc.id)
-                    .collection("rules")
-                    .stream()
-                )
-                ruleset_list.append(data)
+        # Backfilling missing counts writes, so it runs only once both reads
+        # have succeeded rather than as a branch that may be cancelled
+        await timing.measure(
+            "rule_counts", repo.ensure_rule_counts(results["firestore"])
+        )
 
-            return templates.TemplateResponse(
+        return timing.apply(
+            templates.TemplateResponse(
                 "project_rulesets.html",
                 {
                     "request": request,
                     "user": user,
                     "project": project,
-                    "rulesets": ruleset_list,
+                    "rulesets": results["firestore"],
                 },
             )
+        )
 
-        except Exception as e:
-            print(f"Error in project_details: {str(e)}")
-            return templates.TemplateResponse(
-                "project_not_found.html", {"request": request, "user": user}
-            )
+    except Exception as e:
+        print(f"Error in project_details: {str(e)}")
+        return templates.TemplateResponse(
+            "project_not_found.html", {"request": request, "user": user}
+        )
 
 
 @app.get("/projects/{project_id}/new", response_class=HTMLResponse)
@@ -756,51 +766,35 @@ async def new_project_ruleset(request: Request, project_id: str):
         return HTMLResponse(status_code=401)
 
     # Get user's Speckle token
-    user_token = db.collection("userTokens").document(user["id"]).get()
-    if not user_token.exists:
+    speckle_token = await repo.get_speckle_token(user["id"])
+    if not speckle_token:
         return HTMLResponse(status_code=401)
 
-    speckle_token = user_token.to_dict().get("speckleToken")
-
     # Fetch project details from Speckle
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                urljoin(SPECKLE_SERVER_URL, "/graphql"),
-                headers={"Authorization": f"Bearer {speckle_token}"},
-                json={
-                    "query": """
-                    query($projectId: String!) {
-                        project(id: $projectId) {
-                            id
-                            name
-                            description
-                        }
-                    }
-                    """,
-                    "variables": {"projectId": project_id},
-                },
-            )
-            response.raise_for_status()
-            data = response.json()
-            if "errors" in data or not data.get("data", {}).get("project"):
-                print(
-                    "Project not found or GraphQL errors:",
-                    json.dumps(data.get("errors", []), indent=2),
-                )
-                return templates.TemplateResponse(
-                    "project_not_found.html", {"request": request, "user": user}
-                )
-            project = data.get("data", {}).get("project")
-            return templates.TemplateResponse(
-                "ruleset_form.html",
-                {"request": request, "ruleset": None, "user": user, "project": project},
+    try:
+        response = await speckle_graphql(
+            speckle_token, PROJECT_QUERY, {"projectId": project_id}
+        )
+        response.raise_for_status()
+        data = response.json()
+        if "errors" in data or not data.get("data", {}).get("project"):
+            print(
+                "Project not found or GraphQL errors:",
+                json.dumps(data.get("errors", []), indent=2),
             )
-        except Exception as e:
-            print(f"Error in new_project_ruleset: {str(e)}")
             return templates.TemplateResponse(
                 "project_not_found.html", {"request": request, "user": user}
             )
+        project = data.get("data", {}).get("project")
+        return templates.TemplateResponse(
+            "ruleset_form.html",
+            {"request": request, "ruleset": None, "user": user, "project": project},
+        )
+    except Exception as e:
+        print(f"Error in new_project_ruleset: {str(e)}")
+        return templates.TemplateResponse(
+            "project_not_found.html", {"request": request, "user": user}
+        )
 
 
 @app.get("/rulesets/{ruleset_id}/rules/new", response_class=HTMLResponse)
@@ -891,6 +885,82 @@ def generate_auto_message(conditions, imported_message=None):
     return message
 
 
+async def _publish_ruleset_tsv(
+    ruleset_data: dict, rules: list, version: Optional[int] = None
+):
+    """Materialize a ruleset's TSV and record its ETag on the public hash entry.
+
+    Called after every change to a ruleset's rules or name, so automation
+    fetches are served without reading the rules. If the TSV cannot be stored,
+    the recorded ETag is cleared and the next fetch materializes it again.
+
+    Pass the ``rules_version`` the rules were listed at to reuse the ruleset's
+    compiled rules (see services.rule_compiler); leave it out after a write
+    whose new version is unknown.
+
+    Returns:
+        Tuple of (tsv_content, etag, filename)
+    """
+    ruleset_id = ruleset_data["id"]
+    plan = rule_plans.compile(ruleset_id, version, rules)
+    tsv_content, filename = await run_in_threadpool(
+        generate_ruleset_tsv, ruleset_data, plan
+    )
+    project_id = ruleset_data.get("project_id", "")
+    try:
+        etag = await run_in_threadpool(
+            store_tsv_artifact, bucket, ruleset_id, tsv_content
+        )
+        await repo.set_ruleset_tsv(ruleset_id, project_id, etag, filename)
+    except Exception as e:
+        print(f"Error storing TSV for ruleset {ruleset_id}: {e}")
+        etag = tsv_etag(tsv_content)
+        # The rules were already saved, so a failure here must not fail the
+        # request. If Firestore is down this fails too, and fetches keep
+        # getting the previous TSV until the next change publishes again
+        try:
+            await repo.set_ruleset_tsv(ruleset_id, project_id, None, filename)
+        except Exception as e:
+            print(f"Error clearing TSV ETag for ruleset {ruleset_id}: {e}")
+
+    return tsv_content, etag, filename
+
+
+def _rules_response(
+    request: Request,
+    ruleset_data: dict,
+    rules: list,
+    fragments: dict,
+    include_form: bool = False,
+):
+    """Render the rules section after a rule was added, edited, moved or deleted.
+
+    Requests with ``?swap=oob`` only get the rows and "Rule #" cells listed in
+    ``fragments`` (see services.rule_fragments), as out-of-band swaps. Others
+    get the whole section re-rendered.
+    """
+    if request.query_params.get("swap") == "oob":
+        return templates.TemplateResponse(
+            "partials/rule_fragments.html",
+            {
+                "request": request,
+                "ruleset": ruleset_data,
+                "rules": rules,
+                "include_form": include_form,
+                **fragments,
+            },
+        )
+
+    return templates.TemplateResponse(
+        "partials/ruleset_rules.html",
+        {
+            "request": request,
+            "ruleset": ruleset_data,
+            "rules": rules,
+        },
+    )
+
+
 @app.post("/rulesets/{ruleset_id}/rules")
 async def add_rule(request: Request, ruleset_id: str):
     user = await get_current_user(request)
@@ -912,14 +982,23 @@ async def add_rule(request: Request, ruleset_id: str):
 
     # Clean and validate conditions
     conditions = clean_conditions(conditions)
+    try:
+        compile_rule({"conditions": conditions})
+    except RuleCompileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Create rule document
-    # Get current max order for this ruleset
-    rules_ref = db.collection("rulesets").document(ruleset_id).collection("rules")
+    # Get the ruleset
+    ruleset_data = await repo.get_ruleset(ruleset_id)
+    if not ruleset_data:
+        raise HTTPException(status_code=404, detail="Ruleset not found")
+    if ruleset_data.get("user_id") != user["id"]:
+        raise HTTPException(
+            status_code=403, detail="Not authorized to edit this ruleset"
+        )
 
-    # Count existing rules to determine order
-    existing_rules = list(rules_ref.stream())
-    next_order = len(existing_rules) + 1
+    # Create rule document
+    # Backfill rule_count on older rulesets before create_rule increments it
+    await repo.ensure_rule_counts([ruleset_data])
 
     auto_generated_message = generate_auto_message(conditions, form_data.get("message"))
     rule_data = {
@@ -927,98 +1006,78 @@ async def add_rule(request: Request, ruleset_id: str):
         "message": form_data.get("message"),
         "auto_generated_message": auto_generated_message,
         "severity": form_data.get("severity"),
-        "order": next_order,
         "createdAt": firestore.SERVER_TIMESTAMP,
         "updatedAt": firestore.SERVER_TIMESTAMP,
     }
 
-    # Get the ruleset
-    ruleset_ref = db.collection("rulesets").document(ruleset_id)
-    ruleset = ruleset_ref.get()
-    if not ruleset.exists:
-        raise HTTPException(status_code=404, detail="Ruleset not found")
-    ruleset_data = ruleset.to_dict()
-    if ruleset_data.get("user_id") != user["id"]:
-        raise HTTPException(
-            status_code=403, detail="Not authorized to edit this ruleset"
-        )
-
-    ruleset_data["id"] = ruleset_id
-
     # Generate rule ID
     rule_id = "".join(
         secrets.choice(string.ascii_letters + string.digits) for _ in range(20)
     )
 
-    # Add rule to ruleset
-    rules_ref.document(rule_id).set(rule_data)
-
-    # Fetch all rules from the subcollection
-    rules_query = rules_ref.order_by("order").stream()
-    rules = [doc.to_dict() | {"id": doc.id} for doc in rules_query]
-
-    ruleset_ref.update({"updatedAt": firestore.SERVER_TIMESTAMP})
-
-    # Return the updated rules.html partial
-    return templates.TemplateResponse(
-        "partials/ruleset_rules.html",
-        {
-            "request": request,
-            "ruleset": ruleset_data,
-            "rules": rules,
-        },
+    # Append the rule after the current last one (the order comes from the
+    # ruleset's max_order counter)
+    _, rules_version = await repo.create_rule(ruleset_id, rule_id, rule_data)
+
+    # The rules list cached before the write already includes the new rule, so
+    # this only reads Firestore if the list was not cached
+    rules = await repo.list_rules(ruleset_id, version=rules_version)
+    await _publish_ruleset_tsv(ruleset_data, rules, rules_version)
+
+    return _rules_response(
+        request,
+        ruleset_data,
+        rules,
+        rule_fragments.rule_added(rules),
+        include_form=True,
     )
 
 
-def generate_ruleset_hash(project_id: str, ruleset_id: str) -> str:
-    """Generate a unique hash for a ruleset that combines project and ruleset IDs."""
-    combined = f"{project_id}:{ruleset_id}"
-    hash_bytes = hashlib.sha256(combined.encode()).digest()
-    # Use base64url encoding (URL-safe) and remove padding
-    return base64.urlsafe_b64encode(hash_bytes).decode().rstrip("=")
-
-
 @app.get("/r/{ruleset_hash}/tsv")
 async def get_ruleset_tsv(request: Request, ruleset_hash: str):
-    """Get TSV content for a ruleset using its hash. No authentication required."""
-    # Get all rulesets
-    rulesets = db.collection("rulesets").stream()
-
-    # Find the matching ruleset by comparing hashes
-    matching_ruleset = None
-    for ruleset in rulesets:
-        ruleset_data = ruleset.to_dict()
-        current_hash = generate_ruleset_hash(
-            ruleset_data.get("project_id", ""), ruleset.id
-        )
-        if current_hash == ruleset_hash:
-            matching_ruleset = ruleset
-            break
-
-    if not matching_ruleset:
+    """Get TSV content for a ruleset using its hash. No authentication required.
+
+    The TSV is materialized whenever the ruleset changes and its ETag kept on
+    the hash index entry, so a fetch reads that one document and, when the
+    client's If-None-Match still matches, answers 304 without a body.
+    """
+    # Resolve the hash through the index; only rulesets created before it
+    # existed are found by scanning, once, and indexed
+    index_entry = await repo.get_ruleset_index_entry(ruleset_hash)
+    if not index_entry:
         raise HTTPException(status_code=404, detail="Ruleset not found")
 
-    ruleset_data = matching_ruleset.to_dict()
-    ruleset_data["id"] = matching_ruleset.id
+    ruleset_id = index_entry["ruleset_id"]
+    etag = index_entry.get("tsv_etag")
+    if etag and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=tsv_cache_headers(etag))
 
-    # Get all rules for this ruleset
-    rules_query = (
-        db.collection("rulesets")
-        .document(matching_ruleset.id)
-        .collection("rules")
-        .order_by("order")
-        .stream()
-    )
-    rules = [doc.to_dict() | {"id": doc.id} for doc in rules_query]
-
-    # Generate TSV content
-    tsv_content, filename = generate_ruleset_tsv(ruleset_data, rules)
+    tsv_content = None
+    if etag:
+        tsv_content = await run_in_threadpool(
+            load_tsv_artifact, bucket, ruleset_id, etag
+        )
+    filename = index_entry.get("tsv_filename")
+
+    if tsv_content is None:
+        # Not materialized yet (a new or imported ruleset), or the stored TSV
+        # is gone - build it from the rules once
+        ruleset_data = await repo.get_ruleset(ruleset_id)
+        if not ruleset_data:
+            raise HTTPException(status_code=404, detail="Ruleset not found")
+
+        version = ruleset_data.get("rules_version", 0)
+        rules = await repo.list_rules(ruleset_id, version=version)
+        tsv_content, etag, filename = await _publish_ruleset_tsv(
+            ruleset_data, rules, version
+        )
 
     # Return the TSV content with appropriate headers
     return Response(
         content=tsv_content,
         media_type="text/tab-separated-values",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        headers=tsv_cache_headers(etag)
+        | {"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
@@ -1046,66 +1105,79 @@ async def create_project_ruleset(request: Request, project_id: str):
         "tsv_content": tsv_content,
     }
 
-    # Create the ruleset and get its ID
-    ruleset_ref = db.collection("rulesets").add(ruleset_data)
-    ruleset_id = ruleset_ref[1].id
-
     # If it's an HTMX request from the name field blur, return the form in edit mode
     if (
         request.headers.get("HX-Request")
         and request.headers.get("X-Event-Type") == "blur"
     ):
-        # Get project details
-        user_token = db.collection("userTokens").document(user["id"]).get()
-        speckle_token = user_token.to_dict().get("speckleToken")
-
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                urljoin(SPECKLE_SERVER_URL, "/graphql"),
-                headers={"Authorization": f"Bearer {speckle_token}"},
-                json={
-                    "query": """
-                    query($projectId: String!) {
-                        project(id: $projectId) {
-                            id
-                            name
-                            description
-                        }
-                    }
-                    """,
-                    "variables": {"projectId": project_id},
-                },
-            )
-            response.raise_for_status()
-            data = response.json()
-            project = data.get("data", {}).get("project")
+        timing = ServerTiming()
+        speckle_token = await timing.measure(
+            "token", repo.get_speckle_token(user["id"])
+        )
+        response = await timing.measure(
+            "speckle",
+            speckle_graphql(speckle_token, PROJECT_QUERY, {"projectId": project_id}),
+        )
+        response.raise_for_status()
+        data = response.json()
+        project = data.get("data", {}).get("project")
+
+        # Create the ruleset only once the project was fetched: a write run
+        # alongside it could not be undone if the fetch failed
+        ruleset_id = await timing.measure(
+            "firestore", repo.create_ruleset(ruleset_data)
+        )
 
         # Return the form in edit mode
-        return templates.TemplateResponse(
-            "partials/ruleset_form_content.html",
-            {
-                "request": request,
-                "ruleset": {"id": ruleset_id, **ruleset_data},
-                "user": user,
-                "project": project,
-                "is_edit": True,
-            },
+        return timing.apply(
+            templates.TemplateResponse(
+                "partials/ruleset_form_content.html",
+                {
+                    "request": request,
+                    "ruleset": {"id": ruleset_id, **ruleset_data},
+                    "user": user,
+                    "project": project,
+                    "is_edit": True,
+                },
+            )
         )
 
+    # Create the ruleset
+    await repo.create_ruleset(ruleset_data)
+
     # Otherwise redirect to the project page
     return RedirectResponse(url=f"/projects/{project_id}", status_code=303)
 
 
+@app.get("/api/cache/stats")
+async def cache_stats(user: dict = Depends(get_current_user)):
+    """Report hit/miss counters for the in-process caches.
+
+    The counters cover every user of the instance, so they are only served
+    when CACHE_STATS_ENABLED=true, e.g. while debugging locally.
+    """
+    if os.getenv("CACHE_STATS_ENABLED", "false").lower() != "true":
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return JSONResponse(
+        {
+            "token_cache": token_cache.stats(),
+            "speckle_cache": speckle_cache.stats(),
+            "rules_cache": repo.rules_cache.stats(),
+        }
+    )
+
+
 @app.get("/api/rulesets/{ruleset_id}/hash")
 async def get_ruleset_hash(
     ruleset_id: str, project_id: str, user: dict = Depends(get_current_user)
 ):
     """Generate a hash for a ruleset."""
-    ruleset = db.collection("rulesets").document(ruleset_id).get()
-    if not ruleset.exists:
+    ruleset_data = await repo.get_ruleset(ruleset_id)
+    if not ruleset_data:
         raise HTTPException(status_code=404, detail="Ruleset not found")
 
-    ruleset_data = ruleset.to_dict()
     if (
         ruleset_data["user_id"] != user["id"]
         or ruleset_data["project_id"] != project_id
@@ -1121,77 +1193,58 @@ async def get_ruleset_hash(
 @app.get("/projects/{project_id}/rulesets/{ruleset_id}", response_class=HTMLResponse)
 async def edit_project_ruleset(request: Request, project_id: str, ruleset_id: str):
     """Get the edit form for a specific ruleset in a project."""
+    timing = ServerTiming()
 
     user = await get_current_user(request)
     if not user:
         return HTMLResponse(status_code=401)
 
     # Get user's Speckle token
-    user_token = db.collection("userTokens").document(user["id"]).get()
-    if not user_token.exists:
+    speckle_token = await timing.measure("token", repo.get_speckle_token(user["id"]))
+    if not speckle_token:
         return HTMLResponse(status_code=401)
 
-    speckle_token = user_token.to_dict().get("speckleToken")
-
-    # Fetch project details from Speckle
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                urljoin(SPECKLE_SERVER_URL, "/graphql"),
-                headers={"Authorization": f"Bearer {speckle_token}"},
-                json={
-                    "query": """
-                    query($projectId: String!) {
-                        project(id: $projectId) {
-                            id
-                            name
-                            description
-                        }
-                    }
-                    """,
-                    "variables": {"projectId": project_id},
-                },
+    # Fetch project details from Speckle and the ruleset and its rules from
+    # Firestore together
+    try:
+        results = await fan_out(
+            timing,
+            speckle=speckle_graphql(
+                speckle_token, PROJECT_QUERY, {"projectId": project_id}
+            ),
+            ruleset=repo.get_ruleset(ruleset_id),
+            rules=repo.list_rules(ruleset_id),
+        )
+        response = results["speckle"]
+        response.raise_for_status()
+        data = response.json()
+        if "errors" in data or not data.get("data", {}).get("project"):
+            print(
+                "Project not found or GraphQL errors:",
+                json.dumps(data.get("errors", []), indent=2),
             )
-            response.raise_for_status()
-            data = response.json()
-            if "errors" in data or not data.get("data", {}).get("project"):
-                print(
-                    "Project not found or GraphQL errors:",
-                    json.dumps(data.get("errors", []), indent=2),
-                )
-                return templates.TemplateResponse(
-                    "project_not_found.html", {"request": request, "user": user}
-                )
-            project = data.get("data", {}).get("project")
-
-            # Get the ruleset
-            ruleset_ref = db.collection("rulesets").document(ruleset_id)
-            ruleset = ruleset_ref.get()
-            if not ruleset.exists:
-                raise HTTPException(status_code=404, detail="Ruleset not found")
-
-            ruleset_data = ruleset.to_dict()
-            if (
-                ruleset_data.get("user_id") != user["id"]
-                or ruleset_data.get("project_id") != project_id
-            ):
-                raise HTTPException(
-                    status_code=403, detail="Not authorized to edit this ruleset"
-                )
-
-            ruleset_data["id"] = ruleset_id
-            # Fetch rules from subcollection
-            rules_query = (
-                db.collection("rulesets")
-                .document(ruleset_id)
-                .collection("rules")
-                .order_by("order")
-                .stream()
+            return templates.TemplateResponse(
+                "project_not_found.html", {"request": request, "user": user}
+            )
+        project = data.get("data", {}).get("project")
+
+        ruleset_data = results["ruleset"]
+        if not ruleset_data:
+            raise HTTPException(status_code=404, detail="Ruleset not found")
+
+        if (
+            ruleset_data.get("user_id") != user["id"]
+            or ruleset_data.get("project_id") != project_id
+        ):
+            raise HTTPException(
+                status_code=403, detail="Not authorized to edit this ruleset"
             )
-            rules = [doc.to_dict() | {"id": doc.id} for doc in rules_query]
-            ruleset_data["rules"] = rules
 
-            return templates.TemplateResponse(
+        rules = results["rules"]
+        ruleset_data["rules"] = rules
+
+        return timing.apply(
+            templates.TemplateResponse(
                 "ruleset_form.html",
                 {
                     "request": request,
@@ -1202,11 +1255,12 @@ async def edit_project_ruleset(request: Request, project_id: str, ruleset_id: st
                     "rules": rules,
                 },
             )
-        except Exception as e:
-            print(f"Error in edit_project_ruleset: {str(e)}")
-            return templates.TemplateResponse(
-                "project_not_found.html", {"request": request, "user": user}
-            )
+        )
+    except Exception as e:
+        print(f"Error in edit_project_ruleset: {str(e)}")
+        return templates.TemplateResponse(
+            "project_not_found.html", {"request": request, "user": user}
+        )
 
 
 @app.post("/projects/{project_id}/rulesets/import-tsv")
@@ -1221,100 +1275,67 @@ async def import_ruleset_tsv(request: Request, project_id: str):
     if not tsv_file:
         raise HTTPException(status_code=400, detail="No TSV file provided")
 
-    # Read and parse TSV content
-    tsv_content = await tsv_file.read()
-    tsv_text = tsv_content.decode("utf-8")
-
-    import csv
-    from io import StringIO
-
-    reader = csv.reader(StringIO(tsv_text), delimiter="\t")
-    header = next(reader)  # Skip header row
-
-    ruleset_data = {
-        "name": form_data.get("name", "Imported Ruleset"),
-        "description": form_data.get("description", "Imported from TSV file"),
-        "created_at": datetime.utcnow(),
-        "user_id": user["id"],
-        "project_id": project_id,
-        "tsv_content": tsv_text,
-    }
-
-    ruleset_ref = db.collection("rulesets").add(ruleset_data)
-    ruleset_id = ruleset_ref[1].id
-
-    current_rule_number = None
-    current_conditions = []
-    rule_message = ""
-    rule_severity = "Error"
-    rule_order = 1
+    if tsv_file.size is not None and tsv_file.size > TSV_IMPORT_MAX_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"TSV file is larger than {TSV_IMPORT_MAX_BYTES} bytes",
+        )
 
-    def save_rule():
-        nonlocal rule_order, current_conditions, rule_message, rule_severity
-        cleaned_conditions = clean_conditions(current_conditions)
-        if cleaned_conditions:
+    def build_rules(lines):
+        order = 0
+        for parsed_rule in parse_ruleset_tsv(lines):
+            cleaned_conditions = clean_conditions(parsed_rule["conditions"])
+            if not cleaned_conditions:
+                continue
+            order += 1
+            try:
+                compile_rule({"conditions": cleaned_conditions})
+            except RuleCompileError as e:
+                raise RuleCompileError(f"Rule {order}: {e}") from None
+            rule_message = parsed_rule["message"]
             auto_generated_message = generate_auto_message(
                 cleaned_conditions, rule_message
             )
-            # If the imported message is empty, use the auto-generated message
-            message_to_store = rule_message if rule_message else auto_generated_message
-            rule_data = {
+            yield {
                 "conditions": cleaned_conditions,
-                "message": message_to_store,
+                # If the imported message is empty, use the auto-generated message
+                "message": rule_message if rule_message else auto_generated_message,
                 "auto_generated_message": auto_generated_message,
-                "severity": rule_severity,
-                "order": rule_order,
+                "severity": parsed_rule["severity"],
+                "order": order,
                 "createdAt": firestore.SERVER_TIMESTAMP,
                 "updatedAt": firestore.SERVER_TIMESTAMP,
             }
-            rules_ref = (
-                db.collection("rulesets").document(ruleset_id).collection("rules")
-            )
-            rule_id = "".join(
-                secrets.choice(string.ascii_letters + string.digits) for _ in range(20)
-            )
-            rules_ref.document(rule_id).set(rule_data)
-            rule_order += 1
-
-    for row in reader:
-        if not row or all(not cell.strip() for cell in row):
-            continue
-        rule_number = row[0].strip()
-        logic = row[1].strip().upper() if len(row) > 1 else ""
-        property_name = row[2].strip() if len(row) > 2 else ""
-        predicate = row[3].strip() if len(row) > 3 else ""
-        value = row[4].strip() if len(row) > 4 else ""
-        severity = row[5].strip() if len(row) > 5 else ""
-        message = row[6].strip() if len(row) > 6 else ""
-
-        # If a new rule starts, save the previous one
-        if rule_number:
-            if current_rule_number is not None:
-                save_rule()
-            current_rule_number = rule_number
-            current_conditions = []
-            rule_message = ""
-            rule_severity = "Error"
-
-        # Add condition
-        condition = {
-            "logic": logic,
-            "propertyName": property_name,
-            "predicate": predicate,
-            "value": value,
-        }
-        current_conditions.append(condition)
 
-        # If this is the CHECK row, set severity and message for the rule
-        if logic == "CHECK":
-            if severity:
-                rule_severity = severity
-            if message:
-                rule_message = message
+    # Keep the raw upload in Cloud Storage rather than inline on the ruleset
+    # document, which is capped at 1 MiB
+    tsv_path = await run_in_threadpool(
+        upload_raw_tsv, bucket, tsv_file.file, user["id"], project_id
+    )
+    await tsv_file.seek(0)
+
+    ruleset_data = {
+        "name": form_data.get("name", "Imported Ruleset"),
+        "description": form_data.get("description", "Imported from TSV file"),
+        "created_at": datetime.utcnow(),
+        "user_id": user["id"],
+        "project_id": project_id,
+        "tsv_path": tsv_path,
+    }
 
-    # Save the last rule
-    if current_rule_number is not None:
-        save_rule()
+    # The upload is parsed in chunks as the rules are written in batches; the
+    # ruleset itself is committed last, so a bad file leaves nothing behind
+    try:
+        await repo.import_ruleset(
+            ruleset_data, build_rules(open_tsv_upload(tsv_file.file))
+        )
+    except (TsvTooLargeError, RuleCompileError, UnicodeDecodeError, csv.Error) as e:
+        await run_in_threadpool(bucket.blob(tsv_path).delete)
+        status_code = 413 if isinstance(e, TsvTooLargeError) else 400
+        raise HTTPException(status_code=status_code, detail=f"Invalid TSV file: {e}")
+    except Exception:
+        await run_in_threadpool(bucket.blob(tsv_path).delete)
+        raise
 
     return RedirectResponse(url=f"/projects/{project_id}", status_code=303)
 
@@ -1327,12 +1348,10 @@ async def update_project_ruleset(request: Request, project_id: str, ruleset_id:
         return HTMLResponse(status_code=401)
 
     # Get the ruleset
-    ruleset_ref = db.collection("rulesets").document(ruleset_id)
-    ruleset = ruleset_ref.get()
-    if not ruleset.exists:
+    ruleset_data = await repo.get_ruleset(ruleset_id)
+    if not ruleset_data:
         raise HTTPException(status_code=404, detail="Ruleset not found")
 
-    ruleset_data = ruleset.to_dict()
     if (
         ruleset_data.get("user_id") != user["id"]
         or ruleset_data.get("project_id") != project_id
@@ -1341,8 +1360,6 @@ async def update_project_ruleset(request: Request, project_id: str, ruleset_id:
             status_code=403, detail="Not authorized to edit this ruleset"
         )
 
-    ruleset_data["id"] = ruleset_id
-
     # Get form data
     form_data = await request.form()
 
@@ -1354,7 +1371,12 @@ async def update_project_ruleset(request: Request, project_id: str, ruleset_id:
     }
 
     # Update the ruleset
-    ruleset_ref.update(update_data)
+    await repo.update_ruleset(ruleset_id, update_data)
+
+    # The TSV filename follows the ruleset name
+    version = ruleset_data.get("rules_version", 0)
+    rules = await repo.list_rules(ruleset_id, version=version)
+    await _publish_ruleset_tsv(ruleset_data | update_data, rules, version)
 
     # Redirect back to the project page
     return RedirectResponse(url=f"/projects/{project_id}", status_code=303)
@@ -1390,26 +1412,20 @@ async def edit_rule(request: Request, ruleset_id: str, rule_id: str):
         return HTMLResponse(status_code=401)
 
     # Get the ruleset
-    ruleset_ref = db.collection("rulesets").document(ruleset_id)
-    ruleset = ruleset_ref.get()
-    if not ruleset.exists:
+    ruleset_data = await repo.get_ruleset(ruleset_id)
+    if not ruleset_data:
         raise HTTPException(status_code=404, detail="Ruleset not found")
 
-    ruleset_data = ruleset.to_dict()
     if ruleset_data.get("user_id") != user["id"]:
         raise HTTPException(
             status_code=403, detail="Not authorized to edit this ruleset"
         )
 
     # Get the rule
-    rule_ref = ruleset_ref.collection("rules").document(rule_id)
-    rule = rule_ref.get()
-    if not rule.exists:
+    rule_data = await repo.get_rule(ruleset_id, rule_id)
+    if not rule_data:
         raise HTTPException(status_code=404, detail="Rule not found")
 
-    rule_data = rule.to_dict()
-    rule_data["id"] = rule_id
-
     return templates.TemplateResponse(
         "partials/edit_rule_form.html",
         {
@@ -1441,20 +1457,20 @@ async def update_rule(request: Request, ruleset_id: str, rule_id: str):
 
     # Clean and validate conditions
     conditions = clean_conditions(conditions)
+    try:
+        compile_rule({"conditions": conditions})
+    except RuleCompileError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     # Get the ruleset
-    ruleset_ref = db.collection("rulesets").document(ruleset_id)
-    ruleset = ruleset_ref.get()
-    if not ruleset.exists:
+    ruleset_data = await repo.get_ruleset(ruleset_id)
+    if not ruleset_data:
         raise HTTPException(status_code=404, detail="Ruleset not found")
-    ruleset_data = ruleset.to_dict()
     if ruleset_data.get("user_id") != user["id"]:
         raise HTTPException(
             status_code=403, detail="Not authorized to edit this ruleset"
         )
 
-    ruleset_data["id"] = ruleset_id
-
     # Update rule document
     rule_data = {
         "conditions": conditions,
@@ -1464,22 +1480,32 @@ async def update_rule(request: Request, ruleset_id: str, rule_id: str):
         "updatedAt": firestore.SERVER_TIMESTAMP,
     }
 
-    # Update rule in ruleset
-    rules_ref = db.collection("rulesets").document(ruleset_id).collection("rules")
-    rules_ref.document(rule_id).update(rule_data)
-
-    # Fetch all rules from the subcollection
-    rules_query = rules_ref.order_by("order").stream()
-    rules = [doc.to_dict() | {"id": doc.id} for doc in rules_query]
+    # Load the rules before the write, while the cached list is still current,
+    # and apply the edit to it instead of reading every rule again afterwards
+    rules = await repo.list_rules(
+        ruleset_id, version=ruleset_data.get("rules_version", 0)
+    )
+    rule = next((rule for rule in rules if rule["id"] == rule_id), None)
+    if rule is None:
+        raise HTTPException(status_code=404, detail="Rule not found")
 
-    # Return the rules list partial
-    return templates.TemplateResponse(
-        "partials/ruleset_rules.html",
+    # Update rule in ruleset
+    await repo.update_rule(ruleset_id, rule_id, rule_data)
+    rule.update(
         {
-            "request": request,
-            "ruleset": ruleset_data,
-            "rules": rules,
-        },
+            key: value
+            for key, value in rule_data.items()
+            if value is not firestore.SERVER_TIMESTAMP
+        }
+    )
+    await _publish_ruleset_tsv(ruleset_data, rules)
+
+    return _rules_response(
+        request,
+        ruleset_data,
+        rules,
+        rule_fragments.rule_updated(rules, rule_id),
+        include_form=True,
     )
 
 
@@ -1495,29 +1521,24 @@ async def confirm_delete_rule(
     if not user:
         return HTMLResponse(status_code=401)
 
-    ruleset_ref = db.collection("rulesets").document(ruleset_id)
-    ruleset = ruleset_ref.get()
+    ruleset_data = await repo.get_ruleset(ruleset_id)
 
-    if not ruleset.exists:
+    if not ruleset_data:
         raise HTTPException(status_code=404, detail="Ruleset not found")
 
-    ruleset_data = ruleset.to_dict()
     if ruleset_data.get("user_id") != user["id"]:
         raise HTTPException(
             status_code=403, detail="Not authorized to edit this ruleset"
         )
 
-    ruleset_data["id"] = ruleset_id
+    rule = await repo.get_rule(ruleset_id, rule_id)
 
-    rule_ref = ruleset_ref.collection("rules").document(rule_id)
-    rule = rule_ref.get()
-
-    if not rule.exists:
+    if not rule:
         raise HTTPException(status_code=404, detail="Rule not found")
 
     return templates.TemplateResponse(
         "partials/delete_rule_confirm.html",
-        {"request": request, "ruleset": ruleset_data, "rule": rule.to_dict()},
+        {"request": request, "ruleset": ruleset_data, "rule": rule},
     )
 
 
@@ -1533,49 +1554,38 @@ async def delete_rule(
     if not user:
         return HTMLResponse(status_code=401)
 
-    ruleset_ref = db.collection("rulesets").document(ruleset_id)
-    ruleset = ruleset_ref.get()
+    ruleset_data = await repo.get_ruleset(ruleset_id)
 
-    if not ruleset.exists:
+    if not ruleset_data:
         raise HTTPException(status_code=404, detail="Ruleset not found")
 
-    ruleset_data = ruleset.to_dict()
-    ruleset_data["id"] = ruleset_id
-
     if ruleset_data.get("user_id") != user["id"]:
         raise HTTPException(
             status_code=403, detail="Not authorized to edit this ruleset"
         )
 
-    rule_ref = ruleset_ref.collection("rules").document(rule_id)
-    rule = rule_ref.get()
+    # Load the rules before the write, while the cached list is still current
+    rules = await repo.list_rules(
+        ruleset_id, version=ruleset_data.get("rules_version", 0)
+    )
+    index = next((i for i, rule in enumerate(rules) if rule["id"] == rule_id), None)
 
-    if not rule.exists:
+    if index is None:
         raise HTTPException(status_code=404, detail="Rule not found")
 
-    # Delete the rule
-    rule_ref.delete()
-
-    rules_ref = ruleset_ref.collection("rules")
-
-    rules_query = rules_ref.order_by("order").stream()
+    # Delete the rule (also decrements rule_count)
+    await repo.ensure_rule_counts([ruleset_data])
+    await repo.delete_rule(ruleset_id, rule_id)
 
-    batch = db.batch()
-    for index, rule in enumerate(rules_query):
-        rule_ref = rules_ref.document(rule.id)
-        batch.update(rule_ref, {"order": index + 1})
+    # The remaining rules keep their order values; gaps are harmless
+    rules.pop(index)
+    await _publish_ruleset_tsv(ruleset_data, rules)
 
-    batch.commit()
-
-    # Get all rules to return updated list
-    rules = [
-        doc.to_dict() | {"id": doc.id}
-        for doc in ruleset_ref.collection("rules").order_by("order").stream()
-    ]
-
-    return templates.TemplateResponse(
-        "partials/ruleset_rules.html",
-        {"request": request, "ruleset": ruleset_data, "rules": rules},
+    return _rules_response(
+        request,
+        ruleset_data,
+        rules,
+        rule_fragments.rule_deleted(rules, rule_id, index),
     )
 
 
@@ -1591,24 +1601,23 @@ async def reorder_rule(
     if not user:
         return HTMLResponse(status_code=401)
 
-    ruleset_ref = db.collection("rulesets").document(ruleset_id)
-    ruleset = ruleset_ref.get()
+    ruleset_data = await repo.get_ruleset(ruleset_id)
 
-    if not ruleset.exists:
+    if not ruleset_data:
         raise HTTPException(status_code=404, detail="Ruleset not found")
 
-    ruleset_data = ruleset.to_dict()
     if ruleset_data.get("user_id") != user["id"]:
         raise HTTPException(
             status_code=403, detail="Not authorized to edit this ruleset"
         )
 
-    ruleset_data["id"] = ruleset_id
-
     # Get all rules ordered by their current order
-    rules_ref = ruleset_ref.collection("rules")
-    rules_query = rules_ref.order_by("order").stream()
-    rules = [(doc.id, doc.to_dict()) for doc in rules_query]
+    rules = [
+        (rule["id"], rule)
+        for rule in await repo.list_rules(
+            ruleset_id, version=ruleset_data.get("rules_version", 0)
+        )
+    ]
 
     # Find the current rule's index
     current_index = next(
@@ -1624,36 +1633,34 @@ async def reorder_rule(
         target_index = current_index + 1
     else:
         # Can't move further in this direction
-        return templates.TemplateResponse(
-            "partials/ruleset_rules.html",
-            {
-                "request": request,
-                "ruleset": ruleset_data,
-                "rules": [{"id": rid, **rdata} for rid, rdata in rules],
-            },
+        return _rules_response(
+            request,
+            ruleset_data,
+            [{"id": rid, **rdata} for rid, rdata in rules],
+            rule_fragments.rules_unchanged(),
         )
 
-    # Swap the rules
-    rules[current_index], rules[target_index] = (
-        rules[target_index],
-        rules[current_index],
+    # Give the moved rule an order value between its new neighbours, so only
+    # that one document is written
+    new_order = moved_order(
+        [rdata["order"] for _, rdata in rules], current_index, target_index
     )
-
-    # Update the order values in Firestore
-    batch = db.batch()
-    for i, (rid, rdata) in enumerate(rules):
-        rule_ref = rules_ref.document(rid)
-        batch.update(rule_ref, {"order": i + 1})
-    batch.commit()
-
-    # Return the updated rules list
-    return templates.TemplateResponse(
-        "partials/ruleset_rules.html",
-        {
-            "request": request,
-            "ruleset": ruleset_data,
-            "rules": [{"id": rid, **rdata} for rid, rdata in rules],
-        },
+    rules.insert(target_index, rules.pop(current_index))
+    if new_order is not None:
+        await repo.update_rule(ruleset_id, rule_id, {"order": new_order})
+        rules[target_index][1]["order"] = new_order
+    else:
+        # Repeated moves used up the gap - renumber the whole ruleset
+        await repo.set_rule_order(ruleset_id, [rid for rid, _ in rules])
+
+    # Return the updated rules list, or just the two rows that swapped places
+    rules = [{"id": rid, **rdata} for rid, rdata in rules]
+    await _publish_ruleset_tsv(ruleset_data, rules)
+    return _rules_response(
+        request,
+        ruleset_data,
+        rules,
+        rule_fragments.rule_moved(rules, current_index, target_index),
     )
 
 
@@ -1682,32 +1689,36 @@ def chrome_probe():
 
 
 @app.delete("/api/rulesets/{ruleset_id}")
-async def delete_ruleset(request: Request, ruleset_id: str):
+async def delete_ruleset(
+    request: Request, ruleset_id: str, background_tasks: BackgroundTasks
+):
     """Delete a ruleset and all its rules."""
     user = await get_current_user(request)
     if not user:
         return HTMLResponse(status_code=401)
 
     # Get the ruleset
-    ruleset_ref = db.collection("rulesets").document(ruleset_id)
-    ruleset = ruleset_ref.get()
+    ruleset_data = await repo.get_ruleset(ruleset_id)
 
-    if not ruleset.exists:
+    if not ruleset_data:
         raise HTTPException(status_code=404, detail="Ruleset not found")
 
-    ruleset_data = ruleset.to_dict()
     if ruleset_data.get("user_id") != user["id"]:
         raise HTTPException(
             status_code=403, detail="Not authorized to delete this ruleset"
         )
 
-    # Delete all rules in the subcollection
-    rules_ref = ruleset_ref.collection("rules")
-    for rule in rules_ref.stream():
-        rule.reference.delete()
-
-    # Delete the ruleset
-    ruleset_ref.delete()
+    # Delete the ruleset and its public hash entry, then its rules. Rules that
+    # take more than one batch are deleted after the response has been sent
+    in_background = ruleset_data.get("rule_count", 0) > MAX_BATCH_SIZE
+    await repo.delete_ruleset(
+        ruleset_id,
+        ruleset_data.get("project_id", ""),
+        include_rules=not in_background,
+    )
+    if in_background:
+        background_tasks.add_task(repo.delete_rules, ruleset_id)
+    background_tasks.add_task(delete_tsv_artifact, bucket, ruleset_id)
 
     return HTMLResponse("")
 
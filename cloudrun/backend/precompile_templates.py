@@ -0,0 +1,11 @@
+"""Precompile the frontend templates into Python modules.
+
+Run at image build time (see the Dockerfile), or from cloudrun/backend:
+    python precompile_templates.py
+"""
+
+from services.template_env import COMPILED_TEMPLATE_DIR, precompile_templates
+
+if __name__ == "__main__":
+    count = precompile_templates()
+    print(f"Compiled {count} templates into {COMPILED_TEMPLATE_DIR}")
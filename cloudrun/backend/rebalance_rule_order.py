@@ -0,0 +1,16 @@
+"""Renumber rule order values in rulesets where repeated moves used up the gaps.
+
+Moving a rule only rewrites that rule, giving it an order value halfway
+between its new neighbours. Run this occasionally (e.g. from a scheduled job)
+to restore evenly spaced values before they run out of float precision.
+
+Usage (from cloudrun/backend, with the service account key in place):
+    python rebalance_rule_order.py
+"""
+
+from auth import db
+from services.rule_ordering import rebalance_all_rulesets
+
+if __name__ == "__main__":
+    count = rebalance_all_rulesets(db)
+    print(f"Rebalanced {count} rulesets")
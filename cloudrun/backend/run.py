@@ -1,5 +1,10 @@
+import os
+
 import uvicorn
 
+# Pick up template edits without restarting
+os.environ.setdefault("TEMPLATES_AUTO_RELOAD", "true")
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",  # module:attribute
@@ -0,0 +1,76 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Optional
+
+
+class ServerTiming:
+    """Collect named durations for a ``Server-Timing`` response header."""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+
+    async def measure(self, name: str, awaitable: Awaitable) -> Any:
+        """Await ``awaitable`` and record how long it took under ``name``."""
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.durations[name] = (time.perf_counter() - start) * 1000
+
+    def header(self) -> str:
+        total = (time.perf_counter() - self._start) * 1000
+        metrics = [f"{name};dur={dur:.1f}" for name, dur in self.durations.items()]
+        metrics.append(f"total;dur={total:.1f}")
+        return ", ".join(metrics)
+
+    def apply(self, response):
+        """Attach the header to a response and return it."""
+        response.headers["Server-Timing"] = self.header()
+        return response
+
+
+async def fan_out(
+    timing: Optional[ServerTiming] = None, **branches: Awaitable
+) -> Dict[str, Any]:
+    """Run independent lookups concurrently and return their results by name.
+
+    If any branch raises, the others are cancelled and the first error is
+    re-raised unchanged, so callers keep their existing error handling. If
+    the caller is cancelled (e.g. the client disconnected), every branch is
+    cancelled with it. With ``timing``, each branch's duration is recorded
+    under its name.
+
+    Only pass reads: cancelling a branch does not stop a Firestore call that
+    is already running in the thread pool, so a write could still land after
+    another branch failed. Run writes once the lookups have succeeded.
+    """
+    tasks = {
+        name: asyncio.ensure_future(timing.measure(name, branch) if timing else branch)
+        for name, branch in branches.items()
+    }
+    try:
+        done, pending = await asyncio.wait(
+            tasks.values(), return_when=asyncio.FIRST_EXCEPTION
+        )
+    except asyncio.CancelledError:
+        await _cancel(tasks.values())
+        raise
+
+    if pending:
+        await _cancel(pending)
+    # Retrieve every exception so none is reported as never retrieved
+    errors = [
+        task.exception()
+        for task in tasks.values()
+        if task in done and not task.cancelled() and task.exception() is not None
+    ]
+    if errors:
+        raise errors[0]
+    return {name: task.result() for name, task in tasks.items()}
+
+
+async def _cancel(tasks) -> None:
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
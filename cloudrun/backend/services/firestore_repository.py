@@ -0,0 +1,427 @@
+import asyncio
+import functools
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from firebase_admin import firestore
+from services.rule_ordering import order_between, renumber_rules, rules_changed
+from services.ruleset_deletion import delete_collection
+from services.ruleset_index_service import (
+    MAX_BATCH_SIZE,
+    get_ruleset_index_entry,
+    index_ruleset,
+    index_unindexed_ruleset,
+    remove_ruleset_from_index,
+    resolve_ruleset_hash,
+    set_ruleset_tsv,
+)
+from services.rules_cache import rules_cache as default_rules_cache
+from services.token_cache import token_cache as default_token_cache
+
+# Upper bound on Firestore calls in flight at once from a single instance
+FIRESTORE_MAX_WORKERS = int(os.getenv("FIRESTORE_MAX_WORKERS", "16"))
+
+# Rule batches committed concurrently by a single import
+IMPORT_MAX_IN_FLIGHT = 4
+
+
+def _with_id(doc) -> Dict:
+    return doc.to_dict() | {"id": doc.id}
+
+
+async def _settle(
+    in_flight: Dict[asyncio.Future, List],
+    written: List,
+    return_when: str,
+    strict: bool = True,
+) -> None:
+    """Wait for batch commits, moving the refs of successful ones to ``written``.
+
+    With ``strict``, the first failed commit's error is raised afterwards.
+    """
+    done, _ = await asyncio.wait(in_flight, return_when=return_when)
+    errors = []
+    for future in done:
+        refs = in_flight.pop(future)
+        if future.exception() is None:
+            written.extend(refs)
+        else:
+            errors.append(future.exception())
+    if errors and strict:
+        raise errors[0]
+
+
+class FirestoreRepository:
+    """Awaitable Firestore access for the async request handlers.
+
+    The firebase_admin client is synchronous, so every call is dispatched to a
+    bounded thread pool. A slow Firestore round trip then only occupies a
+    worker thread instead of stalling the event loop for every other request.
+    """
+
+    def __init__(
+        self,
+        db,
+        max_workers: int = FIRESTORE_MAX_WORKERS,
+        token_cache=None,
+        rules_cache=None,
+    ):
+        self.db = db
+        self.token_cache = (
+            token_cache if token_cache is not None else default_token_cache
+        )
+        self.rules_cache = (
+            rules_cache if rules_cache is not None else default_rules_cache
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="firestore"
+        )
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking Firestore call on the worker pool and await its result."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _rulesets(self):
+        return self.db.collection("rulesets")
+
+    def _rules(self, ruleset_id: str):
+        return self._rulesets().document(ruleset_id).collection("rules")
+
+    # User tokens
+
+    async def get_speckle_token(self, user_id: str) -> Optional[str]:
+        """Get the stored Speckle token for a user, or None if there is none.
+
+        Reads through the token cache, so only a miss costs a Firestore read.
+        """
+        speckle_token = self.token_cache.get(user_id)
+        if speckle_token is not None:
+            return speckle_token
+
+        user_token = await self.run(
+            self.db.collection("userTokens").document(user_id).get
+        )
+        if not user_token.exists:
+            return None
+        speckle_token = user_token.to_dict().get("speckleToken")
+        self.token_cache.set(user_id, speckle_token)
+        return speckle_token
+
+    # Rulesets
+
+    async def get_ruleset(self, ruleset_id: str) -> Optional[Dict]:
+        """Get a ruleset with its ID, or None if it does not exist."""
+        doc = await self.run(self._rulesets().document(ruleset_id).get)
+        if not doc.exists:
+            return None
+        return _with_id(doc)
+
+    async def list_rulesets(
+        self, user_id: str, project_id: Optional[str] = None
+    ) -> List[Dict]:
+        """List a user's rulesets, optionally limited to one project."""
+        query = self._rulesets().where("user_id", "==", user_id)
+        if project_id is not None:
+            query = query.where("project_id", "==", project_id)
+        docs = await self.run(query.get)
+        return [_with_id(doc) for doc in docs]
+
+    async def create_ruleset(self, ruleset_data: Dict) -> str:
+        """Create a ruleset, register its public hash and return its ID."""
+
+        def create():
+            _, ruleset_ref = self._rulesets().add(
+                {"rule_count": 0, "max_order": 0, "rules_version": 0} | ruleset_data
+            )
+            index_ruleset(self.db, ruleset_data.get("project_id"), ruleset_ref.id)
+            return ruleset_ref.id
+
+        return await self.run(create)
+
+    async def import_ruleset(
+        self,
+        ruleset_data: Dict,
+        rules: Iterable[Dict],
+        max_in_flight: int = IMPORT_MAX_IN_FLIGHT,
+    ) -> str:
+        """Create a ruleset together with all of its rules and return its ID.
+
+        ``rules`` is consumed lazily on the worker pool, 500 rules at a time,
+        so it can be a generator parsing an upload as it goes. Each chunk is
+        committed as one batch while the next is built, with at most
+        ``max_in_flight`` batches outstanding. The ruleset document and its
+        hash index entry are committed last, so the ruleset only becomes
+        visible once every rule is stored. If reading the rules or any write
+        fails, the rules already written are deleted and the error re-raised.
+        """
+        ruleset_ref = self._rulesets().document()
+        rules_ref = ruleset_ref.collection("rules")
+        rule_iter = iter(rules)
+        in_flight: Dict[asyncio.Future, List] = {}
+        written: List = []
+        rule_count = 0
+        max_order = 0
+
+        def next_batch():
+            nonlocal max_order
+            batch = self.db.batch()
+            refs = []
+            for rule_data in itertools.islice(rule_iter, MAX_BATCH_SIZE):
+                rule_ref = rules_ref.document()
+                batch.set(rule_ref, rule_data)
+                refs.append(rule_ref)
+                max_order = max(max_order, rule_data.get("order", 0))
+            return batch, refs
+
+        def commit_ruleset():
+            batch = self.db.batch()
+            batch.set(
+                ruleset_ref,
+                ruleset_data
+                | {
+                    "rule_count": rule_count,
+                    "max_order": max_order,
+                    "rules_version": 0,
+                },
+            )
+            index_ruleset(
+                self.db, ruleset_data.get("project_id"), ruleset_ref.id, batch
+            )
+            batch.commit()
+
+        try:
+            while True:
+                batch, refs = await self.run(next_batch)
+                if not refs:
+                    break
+                rule_count += len(refs)
+                in_flight[asyncio.ensure_future(self.run(batch.commit))] = refs
+                if len(in_flight) >= max_in_flight:
+                    await _settle(in_flight, written, asyncio.FIRST_COMPLETED)
+            await _settle(in_flight, written, asyncio.ALL_COMPLETED)
+            await self.run(commit_ruleset)
+        except Exception:
+            if in_flight:
+                await _settle(in_flight, written, asyncio.ALL_COMPLETED, strict=False)
+            await self.run(self._delete_refs, written)
+            raise
+        return ruleset_ref.id
+
+    def _delete_refs(self, refs: List) -> None:
+        for start in range(0, len(refs), MAX_BATCH_SIZE):
+            batch = self.db.batch()
+            for ref in refs[start : start + MAX_BATCH_SIZE]:
+                batch.delete(ref)
+            batch.commit()
+
+    async def count_rules(self, ruleset_id: str) -> int:
+        """Count a ruleset's rules with a server-side aggregation query."""
+        result = await self.run(self._rules(ruleset_id).count().get)
+        return result[0][0].value
+
+    async def ensure_rule_counts(self, rulesets: List[Dict]) -> None:
+        """Fill in ``rule_count`` for rulesets created before it was tracked.
+
+        Missing counts are computed concurrently and written back, so each
+        ruleset only pays for this once.
+        """
+        missing = [ruleset for ruleset in rulesets if "rule_count" not in ruleset]
+        if not missing:
+            return
+
+        counts = await asyncio.gather(
+            *(self.count_rules(ruleset["id"]) for ruleset in missing)
+        )
+        for ruleset, count in zip(missing, counts):
+            ruleset["rule_count"] = count
+        await asyncio.gather(
+            *(
+                self.update_ruleset(ruleset["id"], {"rule_count": count})
+                for ruleset, count in zip(missing, counts)
+            )
+        )
+
+    async def update_ruleset(self, ruleset_id: str, data: Dict) -> None:
+        await self.run(self._rulesets().document(ruleset_id).update, data)
+
+    async def delete_ruleset(
+        self, ruleset_id: str, project_id: str, include_rules: bool = True
+    ) -> None:
+        """Delete a ruleset, its public hash entry and its rules.
+
+        The ruleset and its hash entry go first, in one batch, so the ruleset
+        disappears at once. Pass ``include_rules=False`` to delete the rules
+        separately with ``delete_rules`` (e.g. in a background task); rules
+        that are left behind are removed by ``delete_orphaned_rules``.
+        """
+
+        def delete():
+            batch = self.db.batch()
+            batch.delete(self._rulesets().document(ruleset_id))
+            remove_ruleset_from_index(self.db, project_id, ruleset_id, batch)
+            batch.commit()
+
+        await self.run(delete)
+        self.rules_cache.invalidate(ruleset_id)
+
+        if include_rules:
+            await self.delete_rules(ruleset_id)
+
+    async def delete_rules(self, ruleset_id: str) -> int:
+        """Delete all of a ruleset's rules, up to 500 per batched write."""
+        deleted = await self.run(delete_collection, self.db, self._rules(ruleset_id))
+        self.rules_cache.invalidate(ruleset_id)
+        return deleted
+
+    async def resolve_ruleset_hash(self, ruleset_hash: str) -> Optional[str]:
+        return await self.run(resolve_ruleset_hash, self.db, ruleset_hash)
+
+    async def get_ruleset_index_entry(self, ruleset_hash: str) -> Optional[Dict]:
+        """Read a hash's index entry, indexing the ruleset on a miss.
+
+        Rulesets created before the index have no entry until they are
+        looked up once or the backfill has run.
+        """
+
+        def lookup():
+            entry = get_ruleset_index_entry(self.db, ruleset_hash)
+            return entry or index_unindexed_ruleset(self.db, ruleset_hash)
+
+        return await self.run(lookup)
+
+    async def set_ruleset_tsv(
+        self, ruleset_id: str, project_id: str, etag: Optional[str], filename: str
+    ) -> None:
+        await self.run(set_ruleset_tsv, self.db, project_id, ruleset_id, etag, filename)
+
+    # Rules
+
+    def _rules_changed(self, **fields) -> Dict:
+        """Ruleset fields to write alongside any change to its rules.
+
+        Bumping ``rules_version`` invalidates every instance's cached list.
+        """
+        return rules_changed(**fields)
+
+    async def list_rules(
+        self, ruleset_id: str, version: Optional[int] = None
+    ) -> List[Dict]:
+        """List the rules of a ruleset in display order.
+
+        Pass the ruleset's ``rules_version`` to serve the list from the rules
+        cache when it is still current, and to cache it otherwise.
+        """
+        if version is not None:
+            rules = self.rules_cache.get(ruleset_id, version)
+            if rules is not None:
+                return rules
+
+        docs = await self.run(self._rules(ruleset_id).order_by("order").get)
+        rules = [_with_id(doc) for doc in docs]
+        if version is not None:
+            self.rules_cache.set(ruleset_id, version, rules)
+        return rules
+
+    async def get_rule(self, ruleset_id: str, rule_id: str) -> Optional[Dict]:
+        doc = await self.run(self._rules(ruleset_id).document(rule_id).get)
+        if not doc.exists:
+            return None
+        return _with_id(doc)
+
+    async def create_rule(
+        self, ruleset_id: str, rule_id: str, rule_data: Dict
+    ) -> Tuple[Dict, int]:
+        """Append a rule after the current last one.
+
+        The next ``order`` comes from the ``max_order`` counter on the ruleset
+        document, read and advanced in a transaction together with
+        ``rule_count`` and ``rules_version``, so adding a rule costs the same
+        number of reads however many rules the ruleset has.
+
+        Returns:
+            The stored rule with its ID, and the new ``rules_version``
+        """
+        ruleset_ref = self._rulesets().document(ruleset_id)
+        rule_ref = self._rules(ruleset_id).document(rule_id)
+
+        @firestore.transactional
+        def append(transaction):
+            ruleset = ruleset_ref.get(transaction=transaction).to_dict()
+            max_order = ruleset.get("max_order")
+            if max_order is None:
+                # Rulesets created before max_order was tracked
+                last = (
+                    self._rules(ruleset_id)
+                    .order_by("order", direction=firestore.Query.DESCENDING)
+                    .limit(1)
+                    .get(transaction=transaction)
+                )
+                max_order = last[0].get("order") if last else None
+
+            order = order_between(max_order, None)
+            transaction.set(rule_ref, rule_data | {"order": order})
+            transaction.update(
+                ruleset_ref,
+                self._rules_changed(max_order=order, rule_count=firestore.Increment(1)),
+            )
+            return order, ruleset.get("rules_version", 0)
+
+        order, version = await self.run(append, self.db.transaction())
+        # Server timestamps are only known to Firestore; leave them out rather
+        # than caching the sentinel
+        rule = {
+            field: value
+            for field, value in rule_data.items()
+            if value is not firestore.SERVER_TIMESTAMP
+        } | {"order": order, "id": rule_id}
+        self.rules_cache.append(ruleset_id, version, version + 1, rule)
+        return rule, version + 1
+
+    async def update_rule(self, ruleset_id: str, rule_id: str, rule_data: Dict) -> None:
+        def update():
+            batch = self.db.batch()
+            batch.update(self._rules(ruleset_id).document(rule_id), rule_data)
+            batch.update(self._rulesets().document(ruleset_id), self._rules_changed())
+            batch.commit()
+
+        await self.run(update)
+        self.rules_cache.invalidate(ruleset_id)
+
+    async def delete_rule(self, ruleset_id: str, rule_id: str) -> None:
+        """Delete a rule and decrement the ruleset's ``rule_count`` in one batch."""
+
+        def delete():
+            batch = self.db.batch()
+            batch.delete(self._rules(ruleset_id).document(rule_id))
+            batch.update(
+                self._rulesets().document(ruleset_id),
+                self._rules_changed(rule_count=firestore.Increment(-1)),
+            )
+            batch.commit()
+
+        await self.run(delete)
+        self.rules_cache.invalidate(ruleset_id)
+
+    async def set_rule_order(self, ruleset_id: str, rule_ids: List[str]) -> None:
+        """Renumber rules evenly in the given order.
+
+        Moves normally rewrite only the moved rule (see services.rule_ordering);
+        this full rewrite is the fallback once order values get too close.
+        """
+
+        rules_ref = self._rules(ruleset_id)
+        await self.run(
+            renumber_rules,
+            self.db,
+            self._rulesets().document(ruleset_id),
+            [rules_ref.document(rule_id) for rule_id in rule_ids],
+        )
+        self.rules_cache.invalidate(ruleset_id)
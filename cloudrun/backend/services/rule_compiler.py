@@ -0,0 +1,259 @@
+import math
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Pattern, Sequence, Tuple
+
+from cachetools import LRUCache
+
+RULE_PLAN_CACHE_MAXSIZE = int(os.getenv("RULE_PLAN_CACHE_MAXSIZE", "256"))
+
+# Predicates understood by the automation function
+CANONICAL_PREDICATES = (
+    "exists",
+    "greater than",
+    "less than",
+    "in range",
+    "in list",
+    "equal to",
+    "not equal to",
+    "is true",
+    "is false",
+    "is like",
+    "identical to",
+    "contains",
+    "does not contain",
+)
+
+# Older storage formats of the canonical predicates
+STORAGE_TO_CANONICAL = {
+    "==": "equal to",
+    "!=": "not equal to",
+    ">": "greater than",
+    "<": "less than",
+    "range": "in range",
+    "in": "in list",
+    "true": "is true",
+    "false": "is false",
+    "like": "is like",
+    "===": "identical to",
+    "contains": "contains",
+    "!contains": "does not contain",
+    "exists": "exists",
+}
+
+
+class RuleCompileError(ValueError):
+    """Raised when a condition's value cannot be used with its predicate."""
+
+
+def canonical_predicate(predicate: Optional[str]) -> str:
+    """Map a stored predicate to the form the automation function expects.
+
+    Empty predicates mean ``exists``. Unknown predicates are returned as-is.
+    """
+    if not predicate:
+        return "exists"
+    if predicate in CANONICAL_PREDICATES:
+        return predicate
+    if predicate in STORAGE_TO_CANONICAL:
+        return STORAGE_TO_CANONICAL[predicate]
+    lowered = predicate.strip().lower()
+    return lowered if lowered in CANONICAL_PREDICATES else predicate
+
+
+@dataclass(frozen=True)
+class CompiledCondition:
+    """A condition with its value parsed for its predicate.
+
+    Only the field its predicate uses is set: ``number`` for greater/less
+    than and numeric equality, ``bounds`` for ``in range``, ``items`` for
+    ``in list`` and ``pattern`` for ``is like``. ``value`` keeps the value as
+    stored. Stored conditions that no longer compile keep the reason in
+    ``error`` and have nothing parsed.
+    """
+
+    logic: str
+    property_name: str
+    predicate: str
+    value: str
+    number: Optional[float] = None
+    bounds: Optional[Tuple[float, float]] = None
+    items: Tuple[str, ...] = ()
+    pattern: Optional[Pattern] = None
+    error: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """A rule's conditions compiled in order.
+
+    ``filters`` select the objects the rule applies to and ``check`` is the
+    CHECK condition (the last one if none is marked CHECK).
+    """
+
+    rule_id: Optional[str]
+    conditions: Tuple[CompiledCondition, ...]
+    severity: Optional[str]
+    message: Optional[str]
+
+    @property
+    def check(self) -> Optional[CompiledCondition]:
+        for condition in reversed(self.conditions):
+            if condition.logic.upper() == "CHECK":
+                return condition
+        return self.conditions[-1] if self.conditions else None
+
+    @property
+    def filters(self) -> Tuple[CompiledCondition, ...]:
+        check = self.check
+        return tuple(c for c in self.conditions if c is not check)
+
+
+def _parse_number(text: str, predicate: str) -> float:
+    try:
+        number = float(text.strip())
+    except ValueError:
+        number = math.nan
+    if math.isnan(number):
+        raise RuleCompileError(f"'{predicate}' needs a number, got '{text}'")
+    return number
+
+
+def _split_items(text: str) -> Tuple[str, ...]:
+    return tuple(item.strip() for item in text.split(",") if item.strip())
+
+
+def _parse_value(predicate: str, value: str) -> Dict:
+    parsed = {}
+    if predicate in ("greater than", "less than"):
+        parsed["number"] = _parse_number(value, predicate)
+    elif predicate == "in range":
+        bounds = _split_items(value)
+        if len(bounds) != 2:
+            raise RuleCompileError(f"'in range' needs 'min,max', got '{value}'")
+        parsed["bounds"] = tuple(sorted(_parse_number(b, predicate) for b in bounds))
+    elif predicate == "in list":
+        parsed["items"] = _split_items(value)
+        if not parsed["items"]:
+            raise RuleCompileError("'in list' needs comma-separated values")
+    elif predicate in ("equal to", "not equal to"):
+        # Numeric when the value is a number, compared as text otherwise
+        try:
+            parsed["number"] = _parse_number(value, predicate)
+        except RuleCompileError:
+            pass
+    elif predicate == "is like":
+        try:
+            parsed["pattern"] = re.compile(value, re.IGNORECASE)
+        except re.error as e:
+            raise RuleCompileError(f"'is like' needs a valid pattern: {e}")
+    return parsed
+
+
+def compile_condition(condition: Dict, strict: bool = True) -> CompiledCondition:
+    """Compile one stored condition.
+
+    Args:
+        condition: Condition with logic, propertyName, predicate and value
+        strict: Raise on a malformed value instead of recording it in
+            ``error``
+
+    Raises:
+        RuleCompileError: If strict and the value does not parse for the
+            predicate
+    """
+    predicate = canonical_predicate(condition.get("predicate"))
+    value = condition.get("value")
+    value = "" if value is None else str(value)
+    try:
+        parsed = _parse_value(predicate, value)
+    except RuleCompileError as e:
+        if strict:
+            raise
+        parsed = {"error": str(e)}
+
+    return CompiledCondition(
+        logic=condition.get("logic") or "",
+        property_name=condition.get("propertyName") or "",
+        predicate=predicate,
+        value=value,
+        **parsed,
+    )
+
+
+def compile_rule(rule: Dict, strict: bool = True) -> CompiledRule:
+    """Compile a rule's conditions.
+
+    Raises:
+        RuleCompileError: If strict and any condition's value does not
+            parse, naming the condition by its position
+    """
+    conditions = []
+    for position, condition in enumerate(rule.get("conditions") or [], 1):
+        try:
+            conditions.append(compile_condition(condition, strict))
+        except RuleCompileError as e:
+            raise RuleCompileError(f"Condition {position}: {e}") from None
+    return CompiledRule(
+        rule_id=rule.get("id"),
+        conditions=tuple(conditions),
+        severity=rule.get("severity", "Error"),
+        message=rule.get("message", ""),
+    )
+
+
+def validate_rules(rules: Sequence[Dict]) -> None:
+    """Check that every rule compiles, before it is written.
+
+    Raises:
+        RuleCompileError: For the first rule that does not, naming it by its
+            position
+    """
+    for position, rule in enumerate(rules, 1):
+        try:
+            compile_rule(rule)
+        except RuleCompileError as e:
+            raise RuleCompileError(f"Rule {position}: {e}") from None
+
+
+class RulePlanCache:
+    """In-process cache of each ruleset's compiled rules, validated by version.
+
+    Keyed like the rules cache (services.rules_cache) by the ruleset's
+    ``rules_version``, which every rule write bumps along with ``updatedAt``.
+    """
+
+    def __init__(self, maxsize: int = RULE_PLAN_CACHE_MAXSIZE):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def compile(
+        self, ruleset_id: str, version: Optional[int], rules: Sequence[Dict]
+    ) -> List[CompiledRule]:
+        """Compile a ruleset's rules, or return the plan cached for ``version``.
+
+        Pass ``version=None`` when the rules may be newer than any version
+        read from Firestore; they are then compiled without caching. Rules
+        saved before values were validated compile with the reason in their
+        conditions' ``error``.
+        """
+        if version is not None:
+            with self._lock:
+                entry = self._cache.get(ruleset_id)
+            if entry is not None and entry[0] == version:
+                return list(entry[1])
+
+        plan = tuple(compile_rule(rule, strict=False) for rule in rules)
+        if version is not None and self._cache.maxsize:
+            with self._lock:
+                self._cache[ruleset_id] = (version, plan)
+        return list(plan)
+
+    def invalidate(self, ruleset_id: str) -> None:
+        with self._lock:
+            self._cache.pop(ruleset_id, None)
+
+
+rule_plans = RulePlanCache()
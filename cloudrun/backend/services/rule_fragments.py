@@ -0,0 +1,90 @@
+from typing import Dict, Iterable, List
+
+# hx-swap-oob values used by partials/rule_fragments.html
+REPLACE = "true"
+DELETE = "delete"
+APPEND = "beforeend:#rules-tbody"
+
+
+def _row(rules: List[Dict], index: int, swap: str) -> Dict:
+    return {"rule": rules[index], "index": index + 1, "swap": swap}
+
+
+def _index_cell(rules: List[Dict], index: int) -> Dict:
+    return {"rule": rules[index], "index": index + 1}
+
+
+def _fragments(
+    rows: Iterable[Dict] = (),
+    index_cells: Iterable[Dict] = (),
+    replace_list: bool = False,
+) -> Dict:
+    return {
+        "replace_list": replace_list,
+        "row_fragments": list(rows),
+        "index_cells": list(index_cells),
+    }
+
+
+def rule_added(rules: List[Dict]) -> Dict:
+    """Fragments for a rule appended to the end of ``rules``."""
+    if len(rules) == 1:
+        # There was no table to add the row to yet
+        return _fragments(replace_list=True)
+
+    # The previous last row gains its "move down" button
+    last = len(rules) - 1
+    return _fragments([_row(rules, last - 1, REPLACE), _row(rules, last, APPEND)])
+
+
+def rule_updated(rules: List[Dict], rule_id: str) -> Dict:
+    """Fragments for an edit to one rule's content."""
+    index = next(i for i, rule in enumerate(rules) if rule["id"] == rule_id)
+    return _fragments([_row(rules, index, REPLACE)])
+
+
+def rule_deleted(rules: List[Dict], rule_id: str, index: int) -> Dict:
+    """Fragments for deleting the rule that was at ``index``.
+
+    ``rules`` are the remaining rules. Rules after the deleted one move up a
+    place, so their "Rule #" cells are renumbered.
+    """
+    if not rules:
+        return _fragments(replace_list=True)
+
+    rows = [{"rule": {"id": rule_id}, "index": None, "swap": DELETE}]
+
+    # A new first row loses its "move up" button, a new last row its "move down"
+    redrawn = set()
+    if index == 0:
+        redrawn.add(0)
+    if index == len(rules):
+        redrawn.add(len(rules) - 1)
+    rows += [_row(rules, i, REPLACE) for i in sorted(redrawn)]
+
+    index_cells = [
+        _index_cell(rules, i) for i in range(index, len(rules)) if i not in redrawn
+    ]
+    return _fragments(rows, index_cells)
+
+
+def rule_moved(rules: List[Dict], from_index: int, to_index: int) -> Dict:
+    """Fragments for moving a rule one place, with ``rules`` in the new order.
+
+    The neighbour it swapped with is removed and re-inserted on the other side
+    of the moved row; both rows are redrawn with their new numbers and buttons.
+    """
+    moved_id = rules[to_index]["id"]
+    position = "afterend" if to_index < from_index else "beforebegin"
+    return _fragments(
+        [
+            {"rule": rules[from_index], "index": None, "swap": DELETE},
+            _row(rules, to_index, REPLACE),
+            _row(rules, from_index, f"{position}:#rule-row-{moved_id}"),
+        ]
+    )
+
+
+def rules_unchanged() -> Dict:
+    """Fragments for a request that did not change the rules."""
+    return _fragments()
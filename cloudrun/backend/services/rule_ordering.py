@@ -0,0 +1,107 @@
+from typing import Dict, List, Optional
+
+from firebase_admin import firestore
+from services.ruleset_index_service import MAX_BATCH_SIZE
+
+# Gap between consecutive rules after appending or rebalancing
+ORDER_STEP = 1.0
+
+# Midpoints closer than this to a neighbour trigger a rebalance. Repeatedly
+# halving the same gap exhausts float precision after ~50 moves.
+MIN_ORDER_GAP = 1e-9
+
+
+def order_between(before: Optional[float], after: Optional[float]) -> Optional[float]:
+    """Pick an ``order`` value that sorts between two neighbouring rules.
+
+    Either neighbour may be None when inserting at the start or the end.
+    Returns None when the neighbours are too close together, in which case
+    the ruleset needs rebalancing.
+    """
+    if before is None and after is None:
+        return ORDER_STEP
+    if before is None:
+        return after - ORDER_STEP
+    if after is None:
+        return before + ORDER_STEP
+    if after - before < 2 * MIN_ORDER_GAP:
+        return None
+    return (before + after) / 2
+
+
+def moved_order(orders: List[float], current_index: int, target_index: int):
+    """Return the ``order`` for moving one rule from one position to another.
+
+    Args:
+        orders: Current order values of the ruleset's rules, sorted
+        current_index: Position of the rule being moved
+        target_index: Position the rule should end up at
+
+    Returns:
+        The new order value, or None if the ruleset needs rebalancing
+    """
+    others = orders[:current_index] + orders[current_index + 1 :]
+    before = others[target_index - 1] if target_index > 0 else None
+    after = others[target_index] if target_index < len(others) else None
+    return order_between(before, after)
+
+
+def needs_rebalance(orders: List[float]) -> bool:
+    return any(b - a < 2 * MIN_ORDER_GAP for a, b in zip(orders, orders[1:]))
+
+
+def rules_changed(**fields) -> Dict:
+    """Ruleset fields to write alongside any change to its rules.
+
+    Bumping ``rules_version`` invalidates every instance's cached list.
+    """
+    return {
+        "rules_version": firestore.Increment(1),
+        "updatedAt": firestore.SERVER_TIMESTAMP,
+    } | fields
+
+
+def renumber_rules(db, ruleset_ref, rule_refs: List) -> None:
+    """Write ``order`` 1..n to rules in the given order, in batches.
+
+    The ruleset update (see rules_changed) goes in the last batch, so other
+    instances only drop their cached lists once every order is written. Each
+    batch stays within MAX_BATCH_SIZE writes, counting that update.
+    """
+    chunk_size = MAX_BATCH_SIZE - 1
+    for start in range(0, max(len(rule_refs), 1), chunk_size):
+        batch = db.batch()
+        for index, rule_ref in enumerate(rule_refs[start : start + chunk_size], start):
+            batch.update(rule_ref, {"order": (index + 1) * ORDER_STEP})
+        if start + chunk_size >= len(rule_refs):
+            batch.update(
+                ruleset_ref, rules_changed(max_order=len(rule_refs) * ORDER_STEP)
+            )
+        batch.commit()
+
+
+def rebalance_ruleset(db, ruleset_id: str) -> bool:
+    """Renumber a ruleset's rules 1..n if their order values got too close.
+
+    Returns:
+        Whether the rules were renumbered
+    """
+    ruleset_ref = db.collection("rulesets").document(ruleset_id)
+    rules = list(ruleset_ref.collection("rules").order_by("order").stream())
+    if not needs_rebalance([rule.get("order") for rule in rules]):
+        return False
+
+    renumber_rules(db, ruleset_ref, [rule.reference for rule in rules])
+    return True
+
+
+def rebalance_all_rulesets(db) -> int:
+    """Rebalance every ruleset whose rule order values got too close.
+
+    Returns:
+        Number of rulesets renumbered
+    """
+    return sum(
+        rebalance_ruleset(db, ruleset.id)
+        for ruleset in db.collection("rulesets").stream()
+    )
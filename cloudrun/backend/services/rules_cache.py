@@ -0,0 +1,70 @@
+import os
+import threading
+from typing import Dict, List, Optional
+
+from cachetools import LRUCache
+
+RULES_CACHE_MAXSIZE = int(os.getenv("RULES_CACHE_MAXSIZE", "256"))
+
+
+class RulesCache:
+    """In-process cache of each ruleset's rules list, validated by version.
+
+    Every rule write bumps ``rules_version`` on the ruleset document. A list
+    cached for one version is only served to callers that read that same
+    version from Firestore, so other instances' writes are never hidden.
+    """
+
+    def __init__(self, maxsize: int = RULES_CACHE_MAXSIZE):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ruleset_id: str, version: int) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._cache.get(ruleset_id)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Copies, so callers can annotate rules without touching the cache
+            return [dict(rule) for rule in entry[1]]
+
+    def set(self, ruleset_id: str, version: int, rules: List[Dict]) -> None:
+        if not self._cache.maxsize:
+            return
+        with self._lock:
+            self._cache[ruleset_id] = (version, [dict(rule) for rule in rules])
+
+    def append(
+        self, ruleset_id: str, version: int, new_version: int, rule: Dict
+    ) -> bool:
+        """Extend the list cached at ``version`` with a rule added by this instance.
+
+        Returns:
+            Whether a matching list was cached and extended
+        """
+        with self._lock:
+            entry = self._cache.get(ruleset_id)
+            if entry is None or entry[0] != version:
+                return False
+            self._cache[ruleset_id] = (new_version, entry[1] + [dict(rule)])
+            return True
+
+    def invalidate(self, ruleset_id: str) -> None:
+        with self._lock:
+            self._cache.pop(ruleset_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+rules_cache = RulesCache()
@@ -0,0 +1,50 @@
+from services.ruleset_index_service import MAX_BATCH_SIZE
+
+
+def delete_collection(db, collection, batch_size: int = MAX_BATCH_SIZE) -> int:
+    """Delete every document in a collection with batched writes.
+
+    Documents are listed a page at a time by reference only, without reading
+    their data, and each page is deleted in one batch.
+
+    Returns:
+        Number of documents deleted
+    """
+    deleted = 0
+    batch = db.batch()
+    pending = 0
+
+    for doc_ref in collection.list_documents(page_size=batch_size):
+        batch.delete(doc_ref)
+        pending += 1
+        deleted += 1
+
+        if pending == batch_size:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    return deleted
+
+
+def delete_orphaned_rules(db) -> int:
+    """Delete rules whose ruleset no longer exists.
+
+    A ruleset whose rules were not removed with it (an interrupted background
+    deletion, or a ruleset deleted before rules were cleaned up) still shows up
+    in ``list_documents`` as a missing document with a ``rules`` subcollection.
+
+    Returns:
+        Number of rules deleted
+    """
+    ruleset_refs = list(db.collection("rulesets").list_documents())
+
+    deleted = 0
+    for snapshot in db.get_all(ruleset_refs):
+        if not snapshot.exists:
+            deleted += delete_collection(db, snapshot.reference.collection("rules"))
+
+    return deleted
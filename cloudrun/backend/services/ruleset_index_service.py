@@ -0,0 +1,146 @@
+import base64
+import hashlib
+from typing import Dict, Optional
+
+# Collection mapping a public ruleset hash to the ruleset it was generated from
+RULESET_INDEX_COLLECTION = "rulesetHashes"
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_SIZE = 500
+
+
+def generate_ruleset_hash(project_id: str, ruleset_id: str) -> str:
+    """Generate a unique hash for a ruleset that combines project and ruleset IDs."""
+    combined = f"{project_id}:{ruleset_id}"
+    hash_bytes = hashlib.sha256(combined.encode()).digest()
+    # Use base64url encoding (URL-safe) and remove padding
+    return base64.urlsafe_b64encode(hash_bytes).decode().rstrip("=")
+
+
+def index_ruleset(db, project_id: str, ruleset_id: str, batch=None) -> str:
+    """Record the hash -> ruleset mapping for a ruleset.
+
+    Args:
+        db: Firestore client
+        project_id: Project the ruleset belongs to
+        ruleset_id: Ruleset document ID
+        batch: Optional write batch to add the write to instead of writing directly
+
+    Returns:
+        The ruleset hash
+    """
+    ruleset_hash = generate_ruleset_hash(project_id or "", ruleset_id)
+    index_ref = db.collection(RULESET_INDEX_COLLECTION).document(ruleset_hash)
+    index_data = {"ruleset_id": ruleset_id, "project_id": project_id or ""}
+
+    if batch is not None:
+        batch.set(index_ref, index_data)
+    else:
+        index_ref.set(index_data)
+
+    return ruleset_hash
+
+
+def get_ruleset_index_entry(db, ruleset_hash: str) -> Optional[Dict]:
+    """Read the index entry for a public hash with a single document read.
+
+    Besides ``ruleset_id`` and ``project_id``, the entry carries ``tsv_etag``
+    and ``tsv_filename`` once the ruleset's TSV has been materialized.
+    """
+    index_doc = db.collection(RULESET_INDEX_COLLECTION).document(ruleset_hash).get()
+    if not index_doc.exists:
+        return None
+    return index_doc.to_dict()
+
+
+def index_unindexed_ruleset(db, ruleset_hash: str) -> Optional[Dict]:
+    """Find a ruleset created before the index existed and index it.
+
+    Scans every ruleset comparing hashes, as lookups did before the index,
+    so only call this when the index has no entry for the hash. Once found,
+    the entry is written and later lookups take a single read.
+
+    Returns:
+        The new index entry, or None if no ruleset has the hash
+    """
+    for ruleset in db.collection("rulesets").stream():
+        project_id = ruleset.to_dict().get("project_id", "")
+        if generate_ruleset_hash(project_id or "", ruleset.id) == ruleset_hash:
+            index_ruleset(db, project_id, ruleset.id)
+            return {"ruleset_id": ruleset.id, "project_id": project_id or ""}
+    return None
+
+
+def resolve_ruleset_hash(db, ruleset_hash: str) -> Optional[str]:
+    """Look up the ruleset ID for a public hash with a single document read."""
+    index_entry = get_ruleset_index_entry(db, ruleset_hash)
+    if index_entry is None:
+        return None
+    return index_entry.get("ruleset_id")
+
+
+def set_ruleset_tsv(
+    db, project_id: str, ruleset_id: str, etag: Optional[str], filename: str
+) -> None:
+    """Record the ETag and download filename of a ruleset's materialized TSV.
+
+    Args:
+        db: Firestore client
+        project_id: Project the ruleset belongs to
+        ruleset_id: Ruleset document ID
+        etag: ETag of the stored TSV, or None to have the next fetch
+            materialize it again
+        filename: Download filename for the TSV
+    """
+    ruleset_hash = generate_ruleset_hash(project_id or "", ruleset_id)
+    db.collection(RULESET_INDEX_COLLECTION).document(ruleset_hash).update(
+        {"tsv_etag": etag, "tsv_filename": filename}
+    )
+
+
+def remove_ruleset_from_index(db, project_id: str, ruleset_id: str, batch=None) -> None:
+    """Remove the index entry for a deleted ruleset.
+
+    Args:
+        db: Firestore client
+        project_id: Project the ruleset belonged to
+        ruleset_id: Ruleset document ID
+        batch: Optional write batch to add the delete to instead of deleting directly
+    """
+    ruleset_hash = generate_ruleset_hash(project_id or "", ruleset_id)
+    index_ref = db.collection(RULESET_INDEX_COLLECTION).document(ruleset_hash)
+
+    if batch is not None:
+        batch.delete(index_ref)
+    else:
+        index_ref.delete()
+
+
+def backfill_ruleset_index(db) -> int:
+    """Write index entries for every existing ruleset.
+
+    Safe to run repeatedly - entries are keyed by hash, so existing ones are
+    simply overwritten.
+
+    Returns:
+        Number of rulesets indexed
+    """
+    indexed = 0
+    batch = db.batch()
+    pending = 0
+
+    for ruleset in db.collection("rulesets").stream():
+        ruleset_data = ruleset.to_dict()
+        index_ruleset(db, ruleset_data.get("project_id", ""), ruleset.id, batch)
+        pending += 1
+        indexed += 1
+
+        if pending == MAX_BATCH_SIZE:
+            batch.commit()
+            batch = db.batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    return indexed
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import httpx
+from cachetools import LRUCache
+from services.speckle_client import speckle_graphql
+
+# Serve cached responses without revalidating for this many seconds
+SPECKLE_CACHE_TTL = float(os.getenv("SPECKLE_CACHE_TTL", "30"))
+# After that, serve the stale response while refreshing it in the background
+SPECKLE_CACHE_STALE_TTL = float(os.getenv("SPECKLE_CACHE_STALE_TTL", "300"))
+SPECKLE_CACHE_MAXSIZE = int(os.getenv("SPECKLE_CACHE_MAXSIZE", "1024"))
+
+CacheKey = Tuple[str, str, str]
+
+
+def _is_cacheable(response: httpx.Response) -> bool:
+    if response.status_code != 200:
+        return False
+    try:
+        return "errors" not in response.json()
+    except json.JSONDecodeError:
+        return False
+
+
+class _Entry:
+    __slots__ = ("response", "fresh_until", "stale_until")
+
+    def __init__(self, response: httpx.Response, now: float, ttl: float, stale: float):
+        self.response = response
+        self.fresh_until = now + ttl
+        self.stale_until = now + ttl + stale
+
+
+class SpeckleResponseCache:
+    """Per-user cache of Speckle GraphQL responses with stale-while-revalidate.
+
+    Responses are keyed by (user, query, variables). A fresh entry is served
+    directly; a stale one is served while a background task refreshes it; an
+    expired or missing one is fetched. Concurrent requests for the same key
+    share a single in-flight upstream call. Only successful responses without
+    GraphQL errors are stored.
+    """
+
+    def __init__(
+        self,
+        ttl: float = SPECKLE_CACHE_TTL,
+        stale_ttl: float = SPECKLE_CACHE_STALE_TTL,
+        maxsize: int = SPECKLE_CACHE_MAXSIZE,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._clock = clock
+        self._entries: LRUCache = LRUCache(maxsize=maxsize)
+        self._in_flight: Dict[CacheKey, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.refreshes = 0
+
+    @staticmethod
+    def make_key(user_id: str, query: str, variables: Optional[Dict]) -> CacheKey:
+        return (user_id, query, json.dumps(variables, sort_keys=True))
+
+    async def fetch(
+        self,
+        key: CacheKey,
+        fetch: Callable[[], Awaitable[httpx.Response]],
+    ) -> httpx.Response:
+        """Return the cached response for ``key`` or load it with ``fetch``."""
+        now = self._clock()
+        entry = self._entries.get(key)
+
+        if entry is not None and now < entry.fresh_until:
+            self.hits += 1
+            return entry.response
+
+        if entry is not None and now < entry.stale_until:
+            self.stale_hits += 1
+            if key not in self._in_flight:
+                self.refreshes += 1
+                self._start(key, fetch)
+            return entry.response
+
+        if key in self._in_flight:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            self._start(key, fetch)
+        # Shield the shared task so one cancelled request does not cancel it
+        # for every other request waiting on the same key
+        return await asyncio.shield(self._in_flight[key])
+
+    def _start(self, key: CacheKey, fetch) -> None:
+        task = asyncio.ensure_future(self._load(key, fetch))
+        self._in_flight[key] = task
+        # Background refreshes may fail with nobody awaiting them
+        task.add_done_callback(_log_refresh_failure)
+
+    async def _load(self, key: CacheKey, fetch) -> httpx.Response:
+        try:
+            response = await fetch()
+            if _is_cacheable(response):
+                self._entries[key] = _Entry(
+                    response, self._clock(), self.ttl, self.stale_ttl
+                )
+            return response
+        finally:
+            self._in_flight.pop(key, None)
+
+    def invalidate_user(self, user_id: str) -> None:
+        for key in [key for key in self._entries if key[0] == user_id]:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        requests = self.hits + self.stale_hits + self.misses + self.coalesced
+        return {
+            "size": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "refreshes": self.refreshes,
+            "hit_rate": ((self.hits + self.stale_hits) / requests if requests else 0.0),
+        }
+
+
+def _log_refresh_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Speckle request failed: {task.exception()}")
+
+
+speckle_cache = SpeckleResponseCache()
+
+
+async def cached_speckle_graphql(
+    user_id: str, speckle_token: str, query: str, variables: Optional[Dict] = None
+) -> httpx.Response:
+    """speckle_graphql() behind the per-user response cache."""
+    return await speckle_cache.fetch(
+        SpeckleResponseCache.make_key(user_id, query, variables),
+        lambda: speckle_graphql(speckle_token, query, variables),
+    )
@@ -0,0 +1,94 @@
+import os
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from urllib.parse import urljoin
+
+import httpx
+from services.token_cache import token_cache
+
+DEFAULT_SPECKLE_SERVER_URL = "https://app.speckle.systems"
+
+# Speckle GraphQL responses for the project listing can be slow to produce, so
+# reads get a generous timeout while connecting and waiting for a pooled
+# connection fail fast.
+HTTP_TIMEOUT = httpx.Timeout(connect=5.0, read=30.0, write=10.0, pool=5.0)
+
+# Keep enough idle connections around to absorb bursts of HTMX fragment
+# requests without re-handshaking with the Speckle server.
+HTTP_LIMITS = httpx.Limits(
+    max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0
+)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def speckle_server_url() -> str:
+    """The Speckle server to query.
+
+    Read on each call rather than at import, so a value loaded from ``.env``
+    after this module was imported still applies.
+    """
+    return os.getenv("SPECKLE_SERVER_URL", DEFAULT_SPECKLE_SERVER_URL)
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional ``h2`` package; fall back to HTTP/1.1 without it."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create an AsyncClient configured for talking to the Speckle server."""
+    return httpx.AsyncClient(
+        http2=_http2_available(),
+        limits=HTTP_LIMITS,
+        timeout=HTTP_TIMEOUT,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and release its pooled connections."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """FastAPI lifespan that owns the shared client for the life of the process."""
+    get_http_client()
+    try:
+        yield
+    finally:
+        await close_http_client()
+
+
+async def speckle_graphql(
+    speckle_token: str, query: str, variables: Optional[Dict] = None
+) -> httpx.Response:
+    """POST a GraphQL query to the Speckle server over the shared client."""
+    payload = {"query": query}
+    if variables is not None:
+        payload["variables"] = variables
+
+    response = await get_http_client().post(
+        urljoin(speckle_server_url(), "/graphql"),
+        headers={"Authorization": f"Bearer {speckle_token}"},
+        json=payload,
+    )
+    if response.status_code in (401, 403):
+        # The token was revoked or refreshed elsewhere - stop serving it from cache
+        token_cache.invalidate_token(speckle_token)
+    return response
@@ -0,0 +1,71 @@
+import compileall
+import os
+import shutil
+
+from jinja2 import (
+    ChoiceLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    ModuleLoader,
+)
+
+TEMPLATE_DIR = os.getenv("TEMPLATE_DIR", "./frontend/templates")
+# Written by precompile_templates.py when the image is built
+COMPILED_TEMPLATE_DIR = os.getenv(
+    "COMPILED_TEMPLATE_DIR", "./frontend/compiled_templates"
+)
+# Check template files for changes on every render, for local development
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "false").lower() == "true"
+# Compiled bytecode of templates loaded from source, shared by processes on
+# one machine. Defaults to a per-user directory under the system temp dir
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR")
+
+# Options that change the generated code, so precompiled templates must be
+# built with the same ones
+_COMPILE_OPTIONS = {"autoescape": True}
+
+
+def create_template_env(
+    template_dir: str = TEMPLATE_DIR,
+    compiled_dir: str = COMPILED_TEMPLATE_DIR,
+    auto_reload: bool = TEMPLATES_AUTO_RELOAD,
+) -> Environment:
+    """Create the Jinja environment for the frontend templates.
+
+    Precompiled templates are loaded as Python modules, so a cold instance
+    neither reads nor parses template sources. Templates missing from
+    ``compiled_dir`` (or all of them, when it was not built) are loaded from
+    source through a bytecode cache. Without ``auto_reload`` a loaded template
+    is never checked against its file again.
+    """
+    source_loader = FileSystemLoader(template_dir)
+    loader = source_loader
+    if not auto_reload and os.path.isdir(compiled_dir):
+        loader = ChoiceLoader([ModuleLoader(compiled_dir), source_loader])
+
+    return Environment(
+        loader=loader,
+        auto_reload=auto_reload,
+        bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR),
+        **_COMPILE_OPTIONS,
+    )
+
+
+def precompile_templates(
+    template_dir: str = TEMPLATE_DIR, compiled_dir: str = COMPILED_TEMPLATE_DIR
+) -> int:
+    """Compile every template under ``template_dir`` into modules in ``compiled_dir``.
+
+    Stale modules from a previous build are removed first, and the modules'
+    own bytecode is written too, so the first import skips Python compilation.
+
+    Returns:
+        Number of templates compiled
+    """
+    env = Environment(loader=FileSystemLoader(template_dir), **_COMPILE_OPTIONS)
+    names = env.list_templates()
+    shutil.rmtree(compiled_dir, ignore_errors=True)
+    env.compile_templates(compiled_dir, zip=None, ignore_errors=False)
+    compileall.compile_dir(compiled_dir, quiet=1)
+    return len(names)
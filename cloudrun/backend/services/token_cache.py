@@ -0,0 +1,76 @@
+import os
+import threading
+from typing import Dict, Optional
+
+from cachetools import TTLCache
+
+TOKEN_CACHE_MAXSIZE = int(os.getenv("TOKEN_CACHE_MAXSIZE", "1024"))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+
+class TokenCache:
+    """In-process cache of Speckle tokens keyed by Firebase user ID.
+
+    Entries expire after ``ttl`` seconds so a token refreshed by another
+    instance is picked up eventually, and the least recently used entry is
+    evicted once ``maxsize`` users are cached.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_MAXSIZE, ttl: int = TOKEN_CACHE_TTL):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: str) -> Optional[str]:
+        with self._lock:
+            token = self._cache.get(user_id)
+            if token is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return token
+
+    def set(self, user_id: str, token: str) -> None:
+        # TOKEN_CACHE_MAXSIZE=0 disables caching
+        if not token or not self._cache.maxsize:
+            return
+        with self._lock:
+            self._cache[user_id] = token
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            if self._cache.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_token(self, token: str) -> None:
+        """Drop every entry holding ``token``, e.g. after Speckle rejected it."""
+        with self._lock:
+            stale = [
+                user_id for user_id, value in self._cache.items() if value == token
+            ]
+            for user_id in stale:
+                del self._cache[user_id]
+            self.invalidations += len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                # Every hit is a userTokens document read that did not happen
+                "firestore_reads_saved": self.hits,
+            }
+
+
+# Shared by the auth flow (write-through) and the request handlers (reads)
+token_cache = TokenCache()
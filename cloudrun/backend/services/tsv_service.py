@@ -1,14 +1,65 @@
 import csv
+import hashlib
+import io
+import os
+import threading
+import uuid
 from io import StringIO
-from typing import Dict, List, Tuple
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Sequence, Tuple, Union
 
+from cachetools import LRUCache
+from google.api_core.exceptions import NotFound
+from services.rule_compiler import CompiledRule, compile_rule
 
-def generate_ruleset_tsv(ruleset: Dict, rules: List[Dict]) -> Tuple[str, str]:
+# Largest TSV upload accepted for import, in bytes
+TSV_IMPORT_MAX_BYTES = int(os.getenv("TSV_IMPORT_MAX_BYTES", str(100 * 1024 * 1024)))
+
+# Uploads are decoded and parsed this many bytes at a time
+TSV_READ_CHUNK_SIZE = 64 * 1024
+
+# Seconds automation clients may reuse a fetched TSV before revalidating it
+TSV_CACHE_MAX_AGE = int(os.getenv("TSV_CACHE_MAX_AGE", "60"))
+
+# Characters of materialized TSV kept in memory, across all rulesets
+TSV_CACHE_MAX_CHARS = int(os.getenv("TSV_CACHE_MAX_CHARS", str(32 * 1024 * 1024)))
+
+# Materialized TSV content keyed by ETag. The content behind an ETag never
+# changes, so entries never go stale
+_tsv_artifacts = LRUCache(maxsize=TSV_CACHE_MAX_CHARS, getsizeof=len)
+_tsv_artifacts_lock = threading.Lock()
+
+
+class TsvTooLargeError(ValueError):
+    """Raised when a TSV upload exceeds TSV_IMPORT_MAX_BYTES."""
+
+
+class _SizeLimitedReader(io.RawIOBase):
+    def __init__(self, stream: BinaryIO, max_bytes: int):
+        self._stream = stream
+        self._max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        data = self._stream.read(len(buffer))
+        self.bytes_read += len(data)
+        if self.bytes_read > self._max_bytes:
+            raise TsvTooLargeError(f"TSV file is larger than {self._max_bytes} bytes")
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def generate_ruleset_tsv(
+    ruleset: Dict, rules: Sequence[Union[Dict, CompiledRule]]
+) -> Tuple[str, str]:
     """Generate TSV content for a ruleset.
 
     Args:
         ruleset: Dictionary containing ruleset data
-        rules: List of rule dictionaries
+        rules: List of rule dictionaries, or their compiled plans (see
+            services.rule_compiler). Predicates are written in canonical form
 
     Returns:
         Tuple of (tsv_content, filename)
@@ -33,50 +84,29 @@ def generate_ruleset_tsv(ruleset: Dict, rules: List[Dict]) -> Tuple[str, str]:
     # Write rules
     rule_number = 1
     for rule in rules:
-        conditions = rule.get("conditions", [])
+        if not isinstance(rule, CompiledRule):
+            rule = compile_rule(rule, strict=False)
+        conditions = rule.conditions
 
         # Skip empty rules
         if not conditions:
             continue
 
-        # For each condition except the last one
-        for i, condition in enumerate(conditions[:-1]):
-            row = []
-
-            # Only include rule number on first row
-            if i == 0:
-                row.append(str(rule_number))
-            else:
-                row.append("")
-
-            row.append(condition.get("logic", ""))
-            row.append(condition.get("propertyName", ""))
-            row.append(condition.get("predicate", ""))
-            row.append(condition.get("value", ""))
-            row.append("")  # Empty severity
-            row.append("")  # Empty message
-
-            writer.writerow(row)
-
-        # For the last condition, include severity and message
-        if conditions:
-            last_condition = conditions[-1]
-            row = []
-
-            # Only include rule number on first row if there was only one condition
-            if len(conditions) == 1:
-                row.append(str(rule_number))
-            else:
-                row.append("")
-
-            row.append(last_condition.get("logic", ""))
-            row.append(last_condition.get("propertyName", ""))
-            row.append(last_condition.get("predicate", ""))
-            row.append(last_condition.get("value", ""))
-            row.append(rule.get("severity", "Error"))
-            row.append(rule.get("message", ""))
-
-            writer.writerow(row)
+        for i, condition in enumerate(conditions):
+            is_last = i == len(conditions) - 1
+            writer.writerow(
+                [
+                    # Only include rule number on the first row
+                    str(rule_number) if i == 0 else "",
+                    condition.logic,
+                    condition.property_name,
+                    condition.predicate,
+                    condition.value,
+                    # Severity and message go on the last row
+                    rule.severity if is_last else "",
+                    rule.message if is_last else "",
+                ]
+            )
 
         rule_number += 1
 
@@ -84,3 +114,180 @@ def generate_ruleset_tsv(ruleset: Dict, rules: List[Dict]) -> Tuple[str, str]:
     filename = f"{ruleset.get('name', 'ruleset').replace(' ', '_').lower()}.tsv"
 
     return output.getvalue(), filename
+
+
+def parse_ruleset_tsv(lines: Iterable[str]) -> Iterator[Dict]:
+    """Parse ruleset TSV lines into rule groups.
+
+    A row with a rule number starts a new rule; following rows without one add
+    conditions to it. The CHECK row carries the rule's severity and message.
+
+    Args:
+        lines: TSV lines including the header row, e.g. a file object
+
+    Yields:
+        Dicts with the raw ``conditions``, ``severity`` and ``message`` of each
+        rule, in file order
+    """
+    reader = csv.reader(lines, delimiter="\t")
+    next(reader, None)  # Skip header row
+
+    rule = None
+    for row in reader:
+        if not row or all(not cell.strip() for cell in row):
+            continue
+        rule_number = row[0].strip()
+        logic = row[1].strip().upper() if len(row) > 1 else ""
+        property_name = row[2].strip() if len(row) > 2 else ""
+        predicate = row[3].strip() if len(row) > 3 else ""
+        value = row[4].strip() if len(row) > 4 else ""
+        severity = row[5].strip() if len(row) > 5 else ""
+        message = row[6].strip() if len(row) > 6 else ""
+
+        # If a new rule starts, emit the previous one
+        if rule_number:
+            if rule is not None:
+                yield rule
+            rule = {"conditions": [], "severity": "Error", "message": ""}
+        elif rule is None:
+            # Conditions before the first rule number have no rule to join
+            continue
+
+        rule["conditions"].append(
+            {
+                "logic": logic,
+                "propertyName": property_name,
+                "predicate": predicate,
+                "value": value,
+            }
+        )
+
+        # If this is the CHECK row, set severity and message for the rule
+        if logic == "CHECK":
+            if severity:
+                rule["severity"] = severity
+            if message:
+                rule["message"] = message
+
+    # Emit the last rule
+    if rule is not None:
+        yield rule
+
+
+def open_tsv_upload(
+    stream: BinaryIO,
+    max_bytes: int = TSV_IMPORT_MAX_BYTES,
+    chunk_size: int = TSV_READ_CHUNK_SIZE,
+) -> io.TextIOWrapper:
+    """Wrap an uploaded binary file as a lazily decoded UTF-8 text stream.
+
+    The file is read ``chunk_size`` bytes at a time, so passing the result to
+    parse_ruleset_tsv() never holds more than a chunk of the upload in memory.
+    Reading past ``max_bytes`` raises TsvTooLargeError.
+    """
+    reader = io.BufferedReader(
+        _SizeLimitedReader(stream, max_bytes), buffer_size=chunk_size
+    )
+    # newline="" lets the csv module handle quoted fields containing newlines
+    return io.TextIOWrapper(reader, encoding="utf-8", newline="")
+
+
+def upload_raw_tsv(
+    storage_bucket, stream: BinaryIO, user_id: str, project_id: str
+) -> str:
+    """Upload an imported TSV file to Cloud Storage and return its path."""
+    path = f"rulesets/{user_id}/{project_id}/{uuid.uuid4().hex}.tsv"
+    blob = storage_bucket.blob(path)
+    blob.upload_from_file(stream, rewind=True, content_type="text/tab-separated-values")
+    return path
+
+
+def tsv_etag(content: str) -> str:
+    """Content hash of a TSV (SHA-256 hex digest), used as its ETag."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def tsv_cache_headers(etag: str) -> Dict[str, str]:
+    """ETag and Cache-Control headers for a materialized TSV."""
+    return {
+        "ETag": f'"{etag}"',
+        "Cache-Control": f"public, max-age={TSV_CACHE_MAX_AGE}",
+    }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check whether an If-None-Match header names ``etag``.
+
+    Handles ``*``, comma-separated lists and weak ``W/`` validators, which
+    If-None-Match compares the same as strong ones.
+    """
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"') == etag:
+            return True
+    return False
+
+
+def _tsv_artifact_path(ruleset_id: str) -> str:
+    return f"tsv/{ruleset_id}.tsv"
+
+
+def _remember_tsv(etag: str, content: str) -> None:
+    if len(content) > _tsv_artifacts.maxsize:
+        return
+    with _tsv_artifacts_lock:
+        _tsv_artifacts[etag] = content
+
+
+def store_tsv_artifact(storage_bucket, ruleset_id: str, content: str) -> str:
+    """Upload a ruleset's materialized TSV to Cloud Storage and return its ETag.
+
+    Each ruleset has one object, overwritten on every publish, so replaced
+    versions do not accumulate.
+    """
+    etag = tsv_etag(content)
+    blob = storage_bucket.blob(_tsv_artifact_path(ruleset_id))
+    blob.upload_from_string(content, content_type="text/tab-separated-values")
+    _remember_tsv(etag, content)
+    return etag
+
+
+def load_tsv_artifact(storage_bucket, ruleset_id: str, etag: str) -> Optional[str]:
+    """Get a ruleset's materialized TSV by ETag.
+
+    Served from memory when this instance has seen the ETag before. The stored
+    object is checked against the ETag, since a concurrent publish may have
+    replaced it.
+
+    Returns:
+        The TSV content, or None if it is missing or no longer matches
+    """
+    with _tsv_artifacts_lock:
+        content = _tsv_artifacts.get(etag)
+    if content is not None:
+        return content
+
+    blob = storage_bucket.blob(_tsv_artifact_path(ruleset_id))
+    try:
+        content = blob.download_as_bytes().decode("utf-8")
+    except NotFound:
+        return None
+    if tsv_etag(content) != etag:
+        return None
+
+    _remember_tsv(etag, content)
+    return content
+
+
+def delete_tsv_artifact(storage_bucket, ruleset_id: str) -> None:
+    """Delete a ruleset's materialized TSV, if it was ever stored."""
+    try:
+        storage_bucket.blob(_tsv_artifact_path(ruleset_id)).delete()
+    except NotFound:
+        pass
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.responses import HTMLResponse
+from services.fanout import ServerTiming, fan_out
+
+
+async def sleep_then(delay, value):
+    await asyncio.sleep(delay)
+    return value
+
+
+async def fail_after(delay):
+    await asyncio.sleep(delay)
+    raise ValueError("lookup failed")
+
+
+@pytest.mark.asyncio
+async def test_branches_run_concurrently():
+    """Test that total latency is the slowest branch, not the sum"""
+    start = time.perf_counter()
+
+    results = await fan_out(
+        speckle=sleep_then(0.1, "project"), firestore=sleep_then(0.1, "rulesets")
+    )
+
+    assert results == {"speckle": "project", "firestore": "rulesets"}
+    assert time.perf_counter() - start < 0.18
+
+
+@pytest.mark.asyncio
+async def test_error_cancels_other_branches():
+    """Test that the first error is re-raised and the slow branch cancelled"""
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    with pytest.raises(ValueError, match="lookup failed"):
+        await fan_out(speckle=fail_after(0.01), firestore=slow())
+
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header():
+    """Test that each branch and the total are reported in Server-Timing"""
+    timing = ServerTiming()
+
+    await fan_out(timing, speckle=sleep_then(0.02, None), firestore=sleep_then(0, None))
+    response = timing.apply(HTMLResponse("ok"))
+
+    header = response.headers["Server-Timing"]
+    assert "speckle;dur=" in header and "firestore;dur=" in header
+    assert "total;dur=" in header
+    assert timing.durations["speckle"] >= 20
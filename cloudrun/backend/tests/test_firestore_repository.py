@@ -0,0 +1,230 @@
+import threading
+from unittest.mock import MagicMock, Mock
+
+import pytest
+from benchmarks.memory_firestore import MemoryFirestore
+from services.firestore_repository import FirestoreRepository
+from services.ruleset_index_service import generate_ruleset_hash
+from services.rules_cache import RulesCache
+from services.token_cache import TokenCache
+
+
+@pytest.fixture
+def repo():
+    repository = FirestoreRepository(
+        MagicMock(), max_workers=2, token_cache=TokenCache(), rules_cache=RulesCache()
+    )
+    yield repository
+    repository.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_run_executes_off_the_event_loop_thread(repo):
+    """Test that blocking calls are dispatched to the worker pool"""
+    loop_thread = threading.current_thread()
+
+    worker_thread = await repo.run(threading.current_thread)
+
+    assert worker_thread is not loop_thread
+    assert worker_thread.name.startswith("firestore")
+
+
+@pytest.mark.asyncio
+async def test_get_speckle_token(repo):
+    """Test reading the Speckle token for a user"""
+    token_doc = repo.db.collection.return_value.document.return_value.get.return_value
+    token_doc.exists = True
+    token_doc.to_dict.return_value = {"speckleToken": "test-token"}
+
+    assert await repo.get_speckle_token("user-1") == "test-token"
+
+    token_doc.exists = False
+    assert await repo.get_speckle_token("user-2") is None
+
+
+@pytest.mark.asyncio
+async def test_get_speckle_token_reads_through_cache(repo):
+    """Test that only the first lookup for a user reads Firestore"""
+    token_ref = repo.db.collection.return_value.document.return_value
+    token_ref.get.return_value.exists = True
+    token_ref.get.return_value.to_dict.return_value = {"speckleToken": "test-token"}
+
+    assert await repo.get_speckle_token("user-1") == "test-token"
+    assert await repo.get_speckle_token("user-1") == "test-token"
+
+    token_ref.get.assert_called_once()
+    assert repo.token_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_list_rules_includes_document_ids(repo):
+    """Test that rules are returned as dicts with their IDs"""
+    rule_doc = Mock(id="rule-1")
+    rule_doc.to_dict.return_value = {"order": 1, "message": "Walls need a type"}
+    rules_ref = repo.db.collection.return_value.document.return_value.collection
+    rules_ref.return_value.order_by.return_value.get.return_value = [rule_doc]
+
+    rules = await repo.list_rules("ruleset-1")
+
+    assert rules == [{"id": "rule-1", "order": 1, "message": "Walls need a type"}]
+    rules_ref.return_value.order_by.assert_called_once_with("order")
+
+
+@pytest.mark.asyncio
+async def test_create_rule_advances_max_order_in_transaction(repo):
+    """Test that adding a rule reads one document, not every rule"""
+    transaction = repo.db.transaction.return_value
+    transaction._max_attempts = 1
+    transaction._read_only = False
+    ruleset_doc = repo.db.collection.return_value.document.return_value.get
+    ruleset_doc.return_value.to_dict.return_value = {
+        "max_order": 3.0,
+        "rules_version": 5,
+    }
+
+    rule, version = await repo.create_rule("ruleset-1", "rule-1", {"message": "m"})
+
+    assert rule == {"message": "m", "order": 4.0, "id": "rule-1"}
+    assert version == 6
+    (_, rule_data), _ = transaction.set.call_args
+    assert rule_data["order"] == 4.0
+    (_, update_data), _ = transaction.update.call_args
+    assert update_data["max_order"] == 4.0
+    assert update_data["rule_count"].value == 1
+    assert update_data["rules_version"].value == 1
+    transaction._commit.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_list_rules_is_served_from_cache_for_current_version(repo):
+    """Test that the rules list is only queried once per rules_version"""
+    rules_query = repo.db.collection.return_value.document.return_value.collection
+    order_by = rules_query.return_value.order_by.return_value
+    order_by.get.return_value = []
+
+    await repo.list_rules("ruleset-1", version=1)
+    await repo.list_rules("ruleset-1", version=1)
+    await repo.list_rules("ruleset-1", version=2)
+
+    assert order_by.get.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_ensure_rule_counts_only_counts_missing(repo):
+    """Test that rulesets without rule_count are counted and backfilled"""
+    rules_query = repo.db.collection.return_value.document.return_value.collection
+    rules_query.return_value.count.return_value.get.return_value = [[Mock(value=3)]]
+    rulesets = [{"id": "ruleset-1", "rule_count": 5}, {"id": "ruleset-2"}]
+
+    await repo.ensure_rule_counts(rulesets)
+
+    assert [ruleset["rule_count"] for ruleset in rulesets] == [5, 3]
+    rules_query.return_value.count.assert_called_once()
+    repo.db.collection.return_value.document.return_value.update.assert_called_once_with(
+        {"rule_count": 3}
+    )
+
+
+@pytest.mark.asyncio
+async def test_import_ruleset_commits_rules_in_batches_then_ruleset(repo):
+    """Test that rules go out in 500-write batches before the ruleset itself"""
+    batch = repo.db.batch.return_value
+    rules = [{"order": i + 1} for i in range(1200)]
+
+    await repo.import_ruleset({"project_id": "project-1"}, rules)
+
+    # 3 rule batches, then one batch for the ruleset and its index entry
+    assert batch.commit.call_count == 4
+    assert batch.set.call_count == 1200 + 2
+    (_, ruleset_data), _ = batch.set.call_args_list[1200]
+    assert ruleset_data["rule_count"] == 1200
+
+
+@pytest.mark.asyncio
+async def test_import_ruleset_cleans_up_after_failed_batch(repo):
+    """Test that a failed batch removes the rules that were already written"""
+    batch = repo.db.batch.return_value
+    batch.commit.side_effect = [None, RuntimeError("unavailable"), None]
+    rules = [{"order": i + 1} for i in range(1000)]
+
+    with pytest.raises(RuntimeError, match="unavailable"):
+        await repo.import_ruleset({"project_id": "project-1"}, rules)
+
+    # The ruleset is never written; only the successful batch's rules are deleted
+    assert batch.set.call_count == 1000
+    assert batch.delete.call_count == 500
+
+
+@pytest.mark.asyncio
+async def test_delete_ruleset_removes_ruleset_then_rules_in_batches(repo):
+    """Test that the ruleset and its index entry go in one batch, then rules 500 at a time"""
+    batch = repo.db.batch.return_value
+    rules = repo.db.collection.return_value.document.return_value.collection
+    rules.return_value.list_documents.return_value = [Mock() for _ in range(1200)]
+
+    await repo.delete_ruleset("ruleset-1", "project-1")
+
+    rules.return_value.list_documents.assert_called_once_with(page_size=500)
+    # One batch for the ruleset and its index entry, then 3 rule batches
+    assert batch.commit.call_count == 4
+    assert batch.delete.call_count == 2 + 1200
+
+
+@pytest.mark.asyncio
+async def test_delete_ruleset_can_leave_rules_for_later(repo):
+    """Test that include_rules=False only deletes the ruleset and its index entry"""
+    batch = repo.db.batch.return_value
+    rules = repo.db.collection.return_value.document.return_value.collection
+
+    await repo.delete_ruleset("ruleset-1", "project-1", include_rules=False)
+
+    rules.return_value.list_documents.assert_not_called()
+    assert batch.delete.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_set_rule_order_keeps_batches_within_limit():
+    """Test that renumbering over 500 rules bumps the version without a 501-write batch"""
+    db = MemoryFirestore()
+    repository = FirestoreRepository(db, max_workers=2, rules_cache=RulesCache())
+    ruleset_ref = db.collection("rulesets").document("ruleset-1")
+    ruleset_ref.set({"rules_version": 3, "max_order": 1.0})
+    rule_ids = [f"rule-{i}" for i in range(1200)]
+    for rule_id in rule_ids:
+        ruleset_ref.collection("rules").document(rule_id).set({"order": 1.0})
+
+    try:
+        await repository.set_rule_order("ruleset-1", list(reversed(rule_ids)))
+    finally:
+        repository.shutdown()
+
+    rules = ruleset_ref.collection("rules")
+    assert rules.document("rule-1199").get().get("order") == 1.0
+    assert rules.document("rule-0").get().get("order") == 1200.0
+    ruleset = ruleset_ref.get()
+    assert ruleset.get("rules_version") == 4
+    assert ruleset.get("max_order") == 1200.0
+
+
+@pytest.mark.asyncio
+async def test_index_miss_falls_back_to_scanning_rulesets():
+    """Test that a shared link to a ruleset created before the index resolves"""
+    db = MemoryFirestore()
+    repository = FirestoreRepository(db, max_workers=2, rules_cache=RulesCache())
+    db.collection("rulesets").document("legacy").set({"project_id": "project-1"})
+    ruleset_hash = generate_ruleset_hash("project-1", "legacy")
+
+    try:
+        entry = await repository.get_ruleset_index_entry(ruleset_hash)
+        db.reset_counters()
+        indexed_entry = await repository.get_ruleset_index_entry(ruleset_hash)
+        indexed_reads = db.document_reads
+        missing = await repository.get_ruleset_index_entry("unknown-hash")
+    finally:
+        repository.shutdown()
+
+    assert entry == {"ruleset_id": "legacy", "project_id": "project-1"}
+    assert indexed_entry == entry
+    # Once indexed, the lookup no longer scans the rulesets
+    assert indexed_reads == 1
+    assert missing is None
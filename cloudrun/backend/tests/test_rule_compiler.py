@@ -0,0 +1,133 @@
+import pytest
+from services.rule_compiler import (
+    RuleCompileError,
+    RulePlanCache,
+    canonical_predicate,
+    compile_condition,
+    compile_rule,
+    validate_rules,
+)
+from services.tsv_service import generate_ruleset_tsv
+
+
+def condition(predicate, value="", logic="CHECK", name="height"):
+    return {
+        "logic": logic,
+        "propertyName": name,
+        "predicate": predicate,
+        "value": value,
+    }
+
+
+def test_canonical_predicate_maps_storage_formats():
+    """Test that stored predicate formats map to the automation's predicates"""
+    assert canonical_predicate(">") == "greater than"
+    assert canonical_predicate("Equal To") == "equal to"
+    assert canonical_predicate("") == "exists"
+    assert canonical_predicate("is set") == "is set"
+
+
+def test_compile_condition_parses_values_once():
+    """Test that values are parsed into the form their predicate uses"""
+    assert compile_condition(condition("greater than", " 2.5 ")).number == 2.5
+    assert compile_condition(condition("in range", "10, 2")).bounds == (2.0, 10.0)
+    assert compile_condition(condition("in list", "EI60, ,EI90")).items == (
+        "EI60",
+        "EI90",
+    )
+    assert compile_condition(condition("equal to", "Walls")).number is None
+    assert compile_condition(condition("==", "3")).number == 3.0
+    assert compile_condition(condition("is like", "^d\\d+")).pattern.search("D12")
+
+
+@pytest.mark.parametrize(
+    "predicate, value",
+    [
+        ("greater than", "tall"),
+        ("less than", ""),
+        ("in range", "1-5"),
+        ("in range", "1,b"),
+        ("in list", " , "),
+        ("is like", "(unclosed"),
+    ],
+)
+def test_compile_condition_rejects_malformed_values(predicate, value):
+    """Test that values that do not parse for their predicate are rejected"""
+    with pytest.raises(RuleCompileError):
+        compile_condition(condition(predicate, value))
+
+
+def test_lenient_compile_records_error():
+    """Test that stored rules which no longer compile keep the reason"""
+    rule = {"conditions": [condition("in range", "1-5")]}
+
+    with pytest.raises(RuleCompileError, match="Condition 1"):
+        compile_rule(rule)
+    compiled = compile_rule(rule, strict=False)
+
+    assert compiled.conditions[0].bounds is None
+    assert "min,max" in compiled.conditions[0].error
+
+
+def test_compiled_rule_splits_filters_and_check():
+    """Test that the CHECK condition is told apart from the filters"""
+    compiled = compile_rule(
+        {
+            "id": "r1",
+            "conditions": [
+                condition("equal to", "Walls", "WHERE", "category"),
+                condition("exists", logic="AND", name="fire_rating"),
+                condition("greater than", "2"),
+            ],
+        }
+    )
+
+    assert compiled.check.property_name == "height"
+    assert [c.property_name for c in compiled.filters] == ["category", "fire_rating"]
+
+
+def test_validate_rules_names_the_bad_rule():
+    """Test that validation reports which rule and condition is malformed"""
+    rules = [
+        {"conditions": [condition("exists")]},
+        {"conditions": [condition("exists", logic="WHERE"), condition(">", "x")]},
+    ]
+
+    with pytest.raises(RuleCompileError, match="Rule 2: Condition 2"):
+        validate_rules(rules)
+
+
+def test_plan_cache_is_validated_by_version():
+    """Test that a ruleset's plan is reused only for the version it was built at"""
+    cache = RulePlanCache()
+    rules = [{"id": "r1", "conditions": [condition("greater than", "2")]}]
+
+    plan = cache.compile("rs-1", 1, rules)
+    assert cache.compile("rs-1", 1, [])[0] is plan[0]
+    assert cache.compile("rs-1", 2, []) == []
+    # Without a version the rules are compiled and nothing is cached
+    assert cache.compile("rs-1", None, rules)[0] is not plan[0]
+    assert cache.compile("rs-1", 2, rules) == []
+
+
+def test_tsv_export_writes_canonical_predicates_from_plan():
+    """Test that the TSV export writes a compiled plan's canonical predicates"""
+    rules = [
+        {
+            "conditions": [
+                condition("==", "Walls", "WHERE", "category"),
+                condition(">", "2"),
+            ],
+            "severity": "Warning",
+            "message": "Walls too low",
+        }
+    ]
+
+    tsv, _ = generate_ruleset_tsv(
+        {"name": "Walls"}, RulePlanCache().compile("rs-1", 0, rules)
+    )
+
+    assert tsv.splitlines()[1:] == [
+        "1\tWHERE\tcategory\tequal to\tWalls\t\t",
+        "\tCHECK\theight\tgreater than\t2\tWarning\tWalls too low",
+    ]
@@ -0,0 +1,63 @@
+from services.rule_fragments import (
+    APPEND,
+    DELETE,
+    REPLACE,
+    rule_added,
+    rule_deleted,
+    rule_moved,
+)
+
+
+def _rules(*ids):
+    return [{"id": rule_id} for rule_id in ids]
+
+
+def _swaps(fragments):
+    return [(row["rule"]["id"], row["swap"]) for row in fragments["row_fragments"]]
+
+
+def test_added_rule_is_appended_and_previous_last_row_redrawn():
+    """Test that adding a rule sends the new row and the row that gains a down arrow"""
+    fragments = rule_added(_rules("a", "b", "c"))
+
+    assert _swaps(fragments) == [("b", REPLACE), ("c", APPEND)]
+    assert fragments["row_fragments"][1]["index"] == 3
+    assert not fragments["replace_list"]
+
+
+def test_first_added_rule_replaces_the_empty_list():
+    """Test that the first rule re-renders the list, which had no table yet"""
+    assert rule_added(_rules("a"))["replace_list"]
+
+
+def test_deleted_rule_renumbers_only_the_rules_after_it():
+    """Test that deleting from the middle only sends the later index cells"""
+    fragments = rule_deleted(_rules("a", "c", "d"), "b", 1)
+
+    assert _swaps(fragments) == [("b", DELETE)]
+    assert [
+        (cell["rule"]["id"], cell["index"]) for cell in fragments["index_cells"]
+    ] == [
+        ("c", 2),
+        ("d", 3),
+    ]
+
+
+def test_deleting_first_rule_redraws_new_first_row():
+    """Test that the new first row is redrawn instead of just renumbered"""
+    fragments = rule_deleted(_rules("b", "c"), "a", 0)
+
+    assert _swaps(fragments) == [("a", DELETE), ("b", REPLACE)]
+    assert [cell["rule"]["id"] for cell in fragments["index_cells"]] == ["c"]
+
+
+def test_moved_rule_swaps_places_with_its_neighbour():
+    """Test that moving a rule down re-inserts its neighbour above it"""
+    fragments = rule_moved(_rules("b", "a", "c"), 0, 1)
+
+    assert _swaps(fragments) == [
+        ("b", DELETE),
+        ("a", REPLACE),
+        ("b", "beforebegin:#rule-row-a"),
+    ]
+    assert [row["index"] for row in fragments["row_fragments"][1:]] == [2, 1]
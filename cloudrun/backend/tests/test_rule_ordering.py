@@ -0,0 +1,62 @@
+from benchmarks.memory_firestore import MemoryFirestore
+from services.rule_ordering import (
+    ORDER_STEP,
+    moved_order,
+    needs_rebalance,
+    order_between,
+    rebalance_ruleset,
+)
+
+
+def test_order_between_neighbours_and_ends():
+    """Test picking order values at the start, middle and end"""
+    assert order_between(None, None) == ORDER_STEP
+    assert order_between(None, 1.0) == 0.0
+    assert order_between(3.0, None) == 4.0
+    assert order_between(1.0, 2.0) == 1.5
+
+
+def test_moved_order_sorts_between_new_neighbours():
+    """Test that a moved rule lands between the rules around its target"""
+    orders = [1.0, 2.0, 3.0, 4.0]
+
+    # Move the third rule up one place: between 1.0 and 2.0
+    assert moved_order(orders, 2, 1) == 1.5
+    # Move the second rule down one place: between 3.0 and 4.0
+    assert moved_order(orders, 1, 2) == 3.5
+    # Move the first rule down one place: between 2.0 and 3.0
+    assert moved_order(orders, 0, 1) == 2.5
+    # Move the last rule to the top
+    assert moved_order(orders, 3, 0) == 0.0
+
+
+def test_repeated_moves_eventually_require_rebalance():
+    """Test that halving the same gap is detected before precision runs out"""
+    before, after = 1.0, 2.0
+    moves = 0
+    # Keep moving a rule into the shrinking gap right after the first rule
+    while (middle := order_between(before, after)) is not None:
+        after = middle
+        moves += 1
+
+    assert 20 < moves < 60
+    assert needs_rebalance([before, after])
+    assert not needs_rebalance([1.0, 2.0, 3.0])
+
+
+def test_rebalance_ruleset_bumps_version_within_batch_limit():
+    """Test that rebalancing over 500 rules invalidates cached lists in valid batches"""
+    db = MemoryFirestore()
+    ruleset_ref = db.collection("rulesets").document("ruleset-1")
+    ruleset_ref.set({"rules_version": 7})
+    for i in range(600):
+        ruleset_ref.collection("rules").document(f"rule-{i}").set(
+            {"order": 1.0 + i * 1e-12}
+        )
+
+    assert rebalance_ruleset(db, "ruleset-1")
+
+    orders = [rule.get("order") for rule in ruleset_ref.collection("rules").stream()]
+    assert sorted(orders) == [float(i + 1) for i in range(600)]
+    assert ruleset_ref.get().get("rules_version") == 8
+    assert ruleset_ref.get().get("max_order") == 600.0
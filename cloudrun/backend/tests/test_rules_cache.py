@@ -0,0 +1,36 @@
+from services.rules_cache import RulesCache
+
+
+def test_get_only_returns_list_for_matching_version():
+    """Test that a cached list is ignored once the ruleset version moves on"""
+    cache = RulesCache()
+    cache.set("rs-1", 3, [{"id": "r1"}])
+
+    assert cache.get("rs-1", 3) == [{"id": "r1"}]
+    assert cache.get("rs-1", 4) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_append_advances_version_of_current_list():
+    """Test that append extends the list only when it is cached at the old version"""
+    cache = RulesCache()
+    cache.set("rs-1", 1, [{"id": "r1"}])
+
+    assert cache.append("rs-1", 1, 2, {"id": "r2"})
+    assert cache.get("rs-1", 2) == [{"id": "r1"}, {"id": "r2"}]
+
+    assert not cache.append("rs-1", 1, 3, {"id": "r3"})
+    assert cache.get("rs-1", 3) is None
+
+
+def test_returned_rules_are_copies():
+    """Test that callers mutating returned rules do not change the cache"""
+    cache = RulesCache()
+    cache.set("rs-1", 0, [{"id": "r1"}])
+
+    cache.get("rs-1", 0)[0]["order"] = 99
+
+    assert cache.get("rs-1", 0) == [{"id": "r1"}]
@@ -0,0 +1,21 @@
+from unittest.mock import MagicMock, Mock
+
+from services.ruleset_deletion import delete_orphaned_rules
+
+
+def test_delete_orphaned_rules_only_empties_missing_rulesets():
+    """Test that rules are deleted only under rulesets that no longer exist"""
+    db = MagicMock()
+    existing = Mock(exists=True)
+    missing = Mock(exists=False)
+    db.get_all.return_value = [existing, missing]
+    missing.reference.collection.return_value.list_documents.return_value = [
+        Mock(),
+        Mock(),
+    ]
+
+    assert delete_orphaned_rules(db) == 2
+
+    existing.reference.collection.assert_not_called()
+    missing.reference.collection.assert_called_once_with("rules")
+    db.batch.return_value.commit.assert_called_once()
@@ -0,0 +1,94 @@
+from unittest.mock import MagicMock, Mock
+
+from benchmarks.memory_firestore import MemoryFirestore
+
+from services.ruleset_index_service import (
+    RULESET_INDEX_COLLECTION,
+    backfill_ruleset_index,
+    generate_ruleset_hash,
+    get_ruleset_index_entry,
+    index_ruleset,
+    index_unindexed_ruleset,
+    resolve_ruleset_hash,
+    set_ruleset_tsv,
+)
+
+
+def test_generate_ruleset_hash_is_stable_and_url_safe():
+    """The hash must not change, as it is embedded in shared automation links"""
+    ruleset_hash = generate_ruleset_hash("project-1", "ruleset-1")
+
+    assert ruleset_hash == generate_ruleset_hash("project-1", "ruleset-1")
+    assert ruleset_hash != generate_ruleset_hash("project-2", "ruleset-1")
+    assert "=" not in ruleset_hash
+    assert "/" not in ruleset_hash and "+" not in ruleset_hash
+
+
+def test_index_ruleset_writes_entry_keyed_by_hash():
+    """Test that indexing stores the ruleset ID under its hash"""
+    db = MagicMock()
+
+    ruleset_hash = index_ruleset(db, "project-1", "ruleset-1")
+
+    db.collection.assert_called_with(RULESET_INDEX_COLLECTION)
+    db.collection.return_value.document.assert_called_with(ruleset_hash)
+    db.collection.return_value.document.return_value.set.assert_called_once_with(
+        {"ruleset_id": "ruleset-1", "project_id": "project-1"}
+    )
+
+
+def test_resolve_ruleset_hash():
+    """Test resolving known and unknown hashes"""
+    db = MagicMock()
+    index_doc = db.collection.return_value.document.return_value.get.return_value
+
+    index_doc.exists = True
+    index_doc.to_dict.return_value = {"ruleset_id": "ruleset-1"}
+    assert resolve_ruleset_hash(db, "some-hash") == "ruleset-1"
+
+    index_doc.exists = False
+    assert resolve_ruleset_hash(db, "some-hash") is None
+
+
+def test_set_ruleset_tsv_updates_entry_by_hash():
+    """Test that the TSV ETag is recorded on the ruleset's index entry"""
+    db = MagicMock()
+
+    set_ruleset_tsv(db, "project-1", "ruleset-1", "abc", "walls.tsv")
+
+    db.collection.return_value.document.assert_called_with(
+        generate_ruleset_hash("project-1", "ruleset-1")
+    )
+    db.collection.return_value.document.return_value.update.assert_called_once_with(
+        {"tsv_etag": "abc", "tsv_filename": "walls.tsv"}
+    )
+
+
+def test_backfill_commits_in_batches():
+    """Test that the backfill never exceeds the Firestore batch limit"""
+    db = MagicMock()
+    rulesets = []
+    for i in range(1201):
+        doc = Mock(id=f"ruleset-{i}")
+        doc.to_dict.return_value = {"project_id": "project-1"}
+        rulesets.append(doc)
+    db.collection.return_value.stream.return_value = iter(rulesets)
+
+    assert backfill_ruleset_index(db) == 1201
+    assert db.batch.return_value.commit.call_count == 3
+    assert db.batch.return_value.set.call_count == 1201
+
+
+def test_unindexed_ruleset_is_found_and_indexed():
+    """Test that a ruleset created before the index resolves and is indexed"""
+    db = MemoryFirestore()
+    db.collection("rulesets").document("other").set({"project_id": "project-2"})
+    db.collection("rulesets").document("legacy").set({"project_id": "project-1"})
+    ruleset_hash = generate_ruleset_hash("project-1", "legacy")
+    assert get_ruleset_index_entry(db, ruleset_hash) is None
+
+    entry = index_unindexed_ruleset(db, ruleset_hash)
+
+    assert entry == {"ruleset_id": "legacy", "project_id": "project-1"}
+    assert get_ruleset_index_entry(db, ruleset_hash) == entry
+    assert index_unindexed_ruleset(db, "unknown-hash") is None
@@ -0,0 +1,99 @@
+import asyncio
+
+import httpx
+import pytest
+from services.speckle_cache import SpeckleResponseCache
+
+KEY = SpeckleResponseCache.make_key("user-1", "query { activeUser { id } }", None)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_fetch(calls, status_code=200, payload=None, delay=0):
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        return httpx.Response(status_code, json=payload or {"data": len(calls)})
+
+    return fetch
+
+
+@pytest.mark.asyncio
+async def test_fresh_response_is_served_from_cache():
+    """Test that a second request within the TTL does not call Speckle"""
+    calls = []
+    cache = SpeckleResponseCache(ttl=30, stale_ttl=300, clock=FakeClock())
+
+    first = await cache.fetch(KEY, make_fetch(calls))
+    second = await cache.fetch(KEY, make_fetch(calls))
+
+    assert second is first
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_response_is_served_while_revalidating():
+    """Test stale-while-revalidate: stale data now, fresh data next time"""
+    calls = []
+    clock = FakeClock()
+    cache = SpeckleResponseCache(ttl=30, stale_ttl=300, clock=clock)
+    await cache.fetch(KEY, make_fetch(calls))
+
+    clock.now = 60
+    stale = await cache.fetch(KEY, make_fetch(calls))
+    assert stale.json() == {"data": 1}
+
+    await asyncio.sleep(0.01)  # let the background refresh run
+    refreshed = await cache.fetch(KEY, make_fetch(calls))
+    assert refreshed.json() == {"data": 2}
+    assert cache.stats()["refreshes"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_upstream_call():
+    """Test that identical concurrent requests are coalesced"""
+    calls = []
+    cache = SpeckleResponseCache(clock=FakeClock())
+    fetch = make_fetch(calls, delay=0.01)
+
+    responses = await asyncio.gather(*(cache.fetch(KEY, fetch) for _ in range(10)))
+
+    assert len(calls) == 1
+    assert all(response is responses[0] for response in responses)
+    assert cache.stats()["coalesced"] == 9
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached():
+    """Test that failed and GraphQL error responses always go upstream"""
+    calls = []
+    cache = SpeckleResponseCache(clock=FakeClock())
+
+    await cache.fetch(KEY, make_fetch(calls, status_code=500))
+    await cache.fetch(KEY, make_fetch(calls, payload={"errors": ["boom"]}))
+    await cache.fetch(KEY, make_fetch(calls))
+
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_invalidate_user_only_drops_that_users_entries():
+    """Test that logging out clears only the user's own responses"""
+    calls = []
+    cache = SpeckleResponseCache(clock=FakeClock())
+    other_key = SpeckleResponseCache.make_key("user-2", "query", None)
+    await cache.fetch(KEY, make_fetch(calls))
+    await cache.fetch(other_key, make_fetch(calls))
+
+    cache.invalidate_user("user-1")
+
+    assert cache.stats()["size"] == 1
+    await cache.fetch(other_key, make_fetch(calls))
+    assert len(calls) == 2
@@ -0,0 +1,37 @@
+import pytest
+from services import speckle_client
+
+
+@pytest.mark.asyncio
+async def test_get_http_client_is_shared():
+    """Test that every caller gets the same pooled client"""
+    client = speckle_client.get_http_client()
+    try:
+        assert speckle_client.get_http_client() is client
+    finally:
+        await speckle_client.close_http_client()
+
+    assert client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_lifespan_closes_client():
+    """Test that the FastAPI lifespan opens and gracefully closes the client"""
+    async with speckle_client.lifespan(None):
+        client = speckle_client.get_http_client()
+        assert not client.is_closed
+
+    assert client.is_closed
+    # A new client is created lazily after shutdown
+    replacement = speckle_client.get_http_client()
+    assert replacement is not client
+    await speckle_client.close_http_client()
+
+
+def test_server_url_is_read_at_call_time(monkeypatch):
+    """Test that SPECKLE_SERVER_URL set after import (e.g. from .env) is used"""
+    monkeypatch.delenv("SPECKLE_SERVER_URL", raising=False)
+    assert speckle_client.speckle_server_url() == "https://app.speckle.systems"
+
+    monkeypatch.setenv("SPECKLE_SERVER_URL", "https://speckle.example.com")
+    assert speckle_client.speckle_server_url() == "https://speckle.example.com"
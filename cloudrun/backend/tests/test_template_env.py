@@ -0,0 +1,71 @@
+from jinja2 import ChoiceLoader, FileSystemLoader
+
+from services.template_env import create_template_env, precompile_templates
+
+
+def _write_templates(directory):
+    (directory / "partials").mkdir()
+    (directory / "partials" / "row.html").write_text("<td>{{ value }}</td>")
+    (directory / "page.html").write_text("<tr>{% include 'partials/row.html' %}</tr>")
+
+
+def test_precompiled_templates_render_like_source(tmp_path):
+    """Test that precompiled modules render the same HTML, escaped, as the sources"""
+    source_dir = tmp_path / "templates"
+    source_dir.mkdir()
+    _write_templates(source_dir)
+    compiled_dir = tmp_path / "compiled"
+
+    assert precompile_templates(str(source_dir), str(compiled_dir)) == 2
+
+    compiled = create_template_env(str(source_dir), str(compiled_dir))
+    source = create_template_env(str(source_dir), str(tmp_path / "missing"))
+    assert isinstance(compiled.loader, ChoiceLoader)
+    assert isinstance(source.loader, FileSystemLoader)
+
+    html = compiled.get_template("page.html").render(value="<b>")
+    assert html == "<tr><td>&lt;b&gt;</td></tr>"
+    assert html == source.get_template("page.html").render(value="<b>")
+
+
+def test_compiled_templates_are_not_reloaded_from_source(tmp_path):
+    """Test that edits to a source file are ignored once templates are precompiled"""
+    source_dir = tmp_path / "templates"
+    source_dir.mkdir()
+    _write_templates(source_dir)
+    compiled_dir = tmp_path / "compiled"
+    precompile_templates(str(source_dir), str(compiled_dir))
+
+    env = create_template_env(str(source_dir), str(compiled_dir))
+    (source_dir / "page.html").write_text("edited")
+
+    assert env.get_template("page.html").render(value=1) == "<tr><td>1</td></tr>"
+
+
+def test_auto_reload_uses_sources(tmp_path):
+    """Test that development mode skips compiled templates and checks for edits"""
+    source_dir = tmp_path / "templates"
+    source_dir.mkdir()
+    _write_templates(source_dir)
+    compiled_dir = tmp_path / "compiled"
+    precompile_templates(str(source_dir), str(compiled_dir))
+
+    env = create_template_env(str(source_dir), str(compiled_dir), auto_reload=True)
+
+    assert isinstance(env.loader, FileSystemLoader)
+    assert env.auto_reload
+    assert env.get_template("page.html").render(value=1) == "<tr><td>1</td></tr>"
+
+
+def test_new_templates_fall_back_to_source(tmp_path):
+    """Test that a template added after the build is still found"""
+    source_dir = tmp_path / "templates"
+    source_dir.mkdir()
+    _write_templates(source_dir)
+    compiled_dir = tmp_path / "compiled"
+    precompile_templates(str(source_dir), str(compiled_dir))
+    (source_dir / "new.html").write_text("new {{ value }}")
+
+    env = create_template_env(str(source_dir), str(compiled_dir))
+
+    assert env.get_template("new.html").render(value=1) == "new 1"
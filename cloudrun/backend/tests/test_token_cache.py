@@ -0,0 +1,54 @@
+import time
+
+from services.token_cache import TokenCache
+
+
+def test_get_counts_hits_and_misses():
+    """Test that lookups are counted as hits or misses"""
+    cache = TokenCache()
+
+    assert cache.get("user-1") is None
+    cache.set("user-1", "token-1")
+    assert cache.get("user-1") == "token-1"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_entries_expire_after_ttl():
+    """Test that tokens are dropped once their TTL has passed"""
+    cache = TokenCache(ttl=0.05)
+    cache.set("user-1", "token-1")
+
+    time.sleep(0.1)
+
+    assert cache.get("user-1") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    """Test that the cache stays within maxsize by evicting the LRU entry"""
+    cache = TokenCache(maxsize=2)
+    cache.set("user-1", "token-1")
+    cache.set("user-2", "token-2")
+    cache.get("user-1")
+    cache.set("user-3", "token-3")
+
+    assert cache.get("user-1") == "token-1"
+    assert cache.get("user-2") is None
+    assert cache.get("user-3") == "token-3"
+
+
+def test_invalidate_user_and_token():
+    """Test explicit invalidation on logout and on a rejected token"""
+    cache = TokenCache()
+    cache.set("user-1", "token-1")
+    cache.set("user-2", "token-2")
+
+    cache.invalidate("user-1")
+    cache.invalidate_token("token-2")
+
+    assert cache.get("user-1") is None
+    assert cache.get("user-2") is None
+    assert cache.stats()["invalidations"] == 2
@@ -0,0 +1,129 @@
+from io import BytesIO, StringIO
+from unittest.mock import MagicMock
+
+import pytest
+from google.api_core.exceptions import NotFound
+from services.tsv_service import (
+    TsvTooLargeError,
+    etag_matches,
+    generate_ruleset_tsv,
+    load_tsv_artifact,
+    open_tsv_upload,
+    parse_ruleset_tsv,
+    store_tsv_artifact,
+    tsv_etag,
+    upload_raw_tsv,
+)
+
+TSV = (
+    "Rule Number\tLogic\tProperty Name\tPredicate\tValue\tReport Severity\tMessage\n"
+    "1\tWHERE\tcategory\tequal to\tWalls\t\t\n"
+    "\tCHECK\theight\tgreater than\t2\tWarning\tWalls too low\n"
+    "\n"
+    "2\tCHECK\tname\tis set\t\t\t\n"
+)
+
+
+def test_parse_ruleset_tsv_groups_conditions_into_rules():
+    """Test that continuation rows join the preceding rule"""
+    rules = list(parse_ruleset_tsv(StringIO(TSV)))
+
+    assert len(rules) == 2
+    assert [c["logic"] for c in rules[0]["conditions"]] == ["WHERE", "CHECK"]
+    assert rules[0]["severity"] == "Warning"
+    assert rules[0]["message"] == "Walls too low"
+    assert rules[1]["severity"] == "Error"
+    assert rules[1]["message"] == ""
+
+
+def test_parse_ruleset_tsv_round_trips_generated_tsv():
+    """Test that exported TSV parses back into the same rules"""
+    rules = [
+        {
+            "conditions": [
+                {
+                    "logic": "WHERE",
+                    "propertyName": "category",
+                    "predicate": "equal to",
+                    "value": "Doors",
+                },
+                {
+                    "logic": "CHECK",
+                    "propertyName": "width",
+                    "predicate": "greater than",
+                    "value": "0.9",
+                },
+            ],
+            "severity": "Error",
+            "message": "Doors too narrow",
+        }
+    ]
+    tsv_content, _ = generate_ruleset_tsv({"name": "Doors"}, rules)
+
+    assert list(parse_ruleset_tsv(StringIO(tsv_content))) == rules
+
+
+def test_open_tsv_upload_parses_in_small_chunks():
+    """Test that rules are parsed correctly when read a few bytes at a time"""
+    data = TSV.replace("Walls too low", "Wände zu niedrig").encode("utf-8")
+
+    rules = list(parse_ruleset_tsv(open_tsv_upload(BytesIO(data), chunk_size=7)))
+
+    assert len(rules) == 2
+    assert rules[0]["message"] == "Wände zu niedrig"
+
+
+def test_open_tsv_upload_enforces_size_cap():
+    """Test that reading past the size cap raises TsvTooLargeError"""
+    data = TSV.encode("utf-8")
+
+    with pytest.raises(TsvTooLargeError):
+        list(parse_ruleset_tsv(open_tsv_upload(BytesIO(data), max_bytes=len(data) - 1)))
+
+
+def test_upload_raw_tsv_stores_file_in_bucket():
+    """Test that the raw upload is streamed to Cloud Storage"""
+    bucket = MagicMock()
+    stream = BytesIO(TSV.encode("utf-8"))
+
+    path = upload_raw_tsv(bucket, stream, "user-1", "project-1")
+
+    assert path.startswith("rulesets/user-1/project-1/") and path.endswith(".tsv")
+    bucket.blob.assert_called_once_with(path)
+    bucket.blob.return_value.upload_from_file.assert_called_once()
+
+
+def test_etag_matches_if_none_match_forms():
+    """Test quoted, weak, listed and wildcard If-None-Match values"""
+    etag = tsv_etag(TSV)
+
+    assert etag_matches(f'"{etag}"', etag)
+    assert etag_matches(f'W/"{etag}"', etag)
+    assert etag_matches(f'"other", "{etag}"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_stored_tsv_artifact_is_served_from_memory():
+    """Test that a TSV stored by this instance is loaded without a download"""
+    bucket = MagicMock()
+
+    etag = store_tsv_artifact(bucket, "ruleset-1", TSV)
+
+    assert etag == tsv_etag(TSV)
+    bucket.blob.assert_called_once_with("tsv/ruleset-1.tsv")
+    assert load_tsv_artifact(bucket, "ruleset-1", etag) == TSV
+    bucket.blob.return_value.download_as_bytes.assert_not_called()
+
+
+def test_load_tsv_artifact_rejects_replaced_or_missing_content():
+    """Test that stored content not matching the ETag is not served"""
+    bucket = MagicMock()
+    blob = bucket.blob.return_value
+
+    blob.download_as_bytes.return_value = b"newer content"
+    assert load_tsv_artifact(bucket, "ruleset-2", "0" * 64) is None
+
+    blob.download_as_bytes.side_effect = NotFound("gone")
+    assert load_tsv_artifact(bucket, "ruleset-2", "0" * 64) is None
@@ -0,0 +1,94 @@
+"""Benchmark ID token verification per request with and without the cache.
+
+Before: every request ran auth.verify_id_token, an RSA signature check plus
+claim validation. After: safe_verify_id_token verifies a token once and
+serves the session's later requests from the decoded claims cache.
+
+Tokens are signed with a local RSA key and checked the same way Firebase
+Admin does (RS256 with PyJWT), so no Firebase project or network is needed.
+Firebase Admin also fetches Google's public keys when its copy expires,
+which this leaves out.
+
+Run from firebase/ with the functions' dependencies installed:
+    python benchmarks/bench_id_token_cache.py
+"""
+
+import os
+import sys
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "functions")
+)
+
+from src.utils import firestore_utils  # noqa: E402
+
+USERS = 20
+REQUESTS = 2000
+
+
+def make_tokens(private_key):
+    now = int(time.time())
+    return [
+        jwt.encode(
+            {
+                "uid": f"user-{i}",
+                "sub": f"user-{i}",
+                "aud": "speckle-model-checker",
+                "iat": now,
+                "exp": now + 3600,
+            },
+            private_key,
+            algorithm="RS256",
+        )
+        for i in range(USERS)
+    ]
+
+
+def make_verifier(public_key):
+    calls = []
+
+    def verify_id_token(id_token, check_revoked=False, clock_skew_seconds=0):
+        calls.append(id_token)
+        return jwt.decode(
+            id_token,
+            public_key,
+            algorithms=["RS256"],
+            audience="speckle-model-checker",
+            leeway=clock_skew_seconds,
+        )
+
+    return verify_id_token, calls
+
+
+def measure(name, verify, tokens, calls):
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        verify(tokens[i % USERS])
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<28} {elapsed / REQUESTS * 1e6:>10.1f} "
+        f"{len(calls) / REQUESTS:>16.3f}"
+    )
+
+
+def main():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    tokens = make_tokens(private_key)
+    verify_id_token, calls = make_verifier(private_key.public_key())
+
+    firestore_utils.auth.verify_id_token = verify_id_token
+    firestore_utils.ensure_firebase_app = lambda: None
+
+    print(f"{REQUESTS} requests from {USERS} signed-in users")
+    print(f"{'':<28} {'us/request':>10} {'verifies/request':>16}")
+    measure("verify_id_token (before)", verify_id_token, tokens, calls)
+    calls.clear()
+    measure("safe_verify_id_token", firestore_utils.safe_verify_id_token, tokens, calls)
+
+
+if __name__ == "__main__":
+    main()
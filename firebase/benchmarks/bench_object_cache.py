@@ -0,0 +1,68 @@
+"""Benchmark previewing the same model version twice with the object cache.
+
+The first preview streams the version's objects from a stub Speckle server
+and writes them to the on-disk cache; the second must read them back
+without a single request. Reports each preview's time, the requests it
+made, and the cache's size next to the object stream's.
+
+Run from firebase/ with the functions' dependencies installed:
+    python benchmarks/bench_object_cache.py --objects 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "functions")
+)
+
+from bench_object_stream import serve, write_fixtures  # noqa: E402
+from src.utils.object_cache import ObjectCache  # noqa: E402
+from src.utils.speckle_api import SpeckleAPI  # noqa: E402
+
+
+def preview(api):
+    start = time.perf_counter()
+    count = sum(1 for _ in api.get_version_objects("project", "root", stream=True))
+    return time.perf_counter() - start, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--objects", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        stream_path, array_path = write_fixtures(directory, args.objects)
+        server = serve(stream_path, array_path)
+        cache = ObjectCache(os.path.join(directory, "cache"), 1024**3)
+        api = SpeckleAPI(
+            "token", host=f"http://127.0.0.1:{server.server_port}", object_cache=cache
+        )
+
+        print(f"{'':<22} {'seconds':>8} {'records':>9} {'requests':>9}")
+        for name in ("first (network)", "second (disk cache)"):
+            before = server.requests
+            seconds, count = preview(api)
+            requests = server.requests - before
+            print(f"{name:<22} {seconds:>8.2f} {count:>9,} {requests:>9}")
+        server.shutdown()
+
+        object_id = f"{args.objects // 2:032x}"
+        start = time.perf_counter()
+        obj = cache.get_object(api.host, "project", "root", object_id)
+        lookup_ms = (time.perf_counter() - start) * 1000
+        assert obj["id"] == object_id
+
+        stream_mb = os.path.getsize(stream_path) / 1e6
+        print(
+            f"object stream {stream_mb:.1f} MB, cache {cache.size_bytes() / 1e6:.1f} MB"
+        )
+        print(f"single object by id from the cache: {lookup_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
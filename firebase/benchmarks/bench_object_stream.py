@@ -0,0 +1,161 @@
+"""Benchmark peak memory and throughput of downloading a version's objects.
+
+Before: get_version_objects loads the whole object graph with .json() and
+the property records are flattened from the loaded list.
+After: get_version_objects(stream=True) decodes the newline-delimited object
+stream line by line and yields each record as it arrives.
+
+A stub HTTP server serves a generated fixture to both, from the endpoints
+each one calls. Each mode runs in a fresh interpreter, so its peak RSS is
+its own.
+
+Run from firebase/ with the functions' dependencies installed:
+    python benchmarks/bench_object_stream.py --objects 200000
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FUNCTIONS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "functions"
+)
+CHUNK_SIZE = 64 * 1024
+CATEGORIES = ["Walls", "Doors", "Windows", "Floors", "Columns"]
+
+# Runs in a fresh interpreter and prints the seconds taken, the records
+# read and the peak RSS in KiB, before and after reading
+CLIENT = """
+import json, resource, sys, time
+from src.utils.speckle_api import SpeckleAPI
+from src.utils.speckle_objects import flatten_object, is_property_object
+api = SpeckleAPI("token", host=sys.argv[2])
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+if sys.argv[1] == "before":
+    objects = api.get_version_objects("project", "root")
+    records = [flatten_object(o) for o in objects if is_property_object(o)]
+    count = len(records)
+else:
+    count = sum(1 for _ in api.get_version_objects("project", "root", stream=True))
+seconds = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps([seconds, count, base, peak]))
+"""
+
+
+def make_object(index, rng):
+    category = CATEGORIES[index % len(CATEGORIES)]
+    element = {
+        "id": f"{index:032x}",
+        "speckle_type": f"Objects.BuiltElements.{category[:-1]}",
+        "category": category,
+        "name": f"{category[:-1]} {index}",
+        "parameters": {
+            "WIDTH": {
+                "name": "Width",
+                "value": round(rng.uniform(50, 400), 1),
+                "units": "mm",
+            },
+            "FIRE_RATING": {"name": "Fire Rating", "value": "EI60", "units": None},
+            "IS_STRUCTURAL": {"name": "Structural", "value": index % 3 == 0},
+        },
+        "displayValue": [{"speckle_type": "reference", "referencedId": f"m{index}"}],
+    }
+    mesh = {
+        "id": f"m{index}",
+        "speckle_type": "Objects.Geometry.Mesh",
+        "vertices": [round(rng.random(), 3) for _ in range(48)],
+        "faces": list(range(16)),
+    }
+    return element, mesh
+
+
+def write_fixtures(directory, count, seed=0):
+    """Write the object stream as NDJSON and as the JSON array .json() loads."""
+    rng = random.Random(seed)
+    stream_path = os.path.join(directory, "objects.txt")
+    array_path = os.path.join(directory, "objects.json")
+    with open(stream_path, "w") as stream, open(array_path, "w") as array:
+        array.write("[")
+        for index in range(count):
+            for obj in make_object(index, rng):
+                line = json.dumps(obj)
+                stream.write(f"{obj['id']}\t{line}\n")
+                array.write(("," if array.tell() > 1 else "") + line)
+        array.write("]")
+    return stream_path, array_path
+
+
+def serve(stream_path, array_path):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.server.requests += 1
+            if self.path.startswith("/objects/"):
+                path, content_type = stream_path, "text/plain"
+            elif self.path.startswith("/api/streams/"):
+                path, content_type = array_path, "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure(mode, host):
+    # Every run downloads; bench_object_cache.py measures the object cache
+    env = dict(os.environ, SPECKLE_OBJECT_CACHE_MAX_BYTES="0")
+    output = subprocess.run(
+        [sys.executable, "-c", CLIENT, mode, host],
+        cwd=FUNCTIONS_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--objects", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        stream_path, array_path = write_fixtures(directory, args.objects)
+        size_mb = os.path.getsize(stream_path) / 1e6
+        server = serve(stream_path, array_path)
+        host = f"http://127.0.0.1:{server.server_port}"
+        print(f"{args.objects:,} elements + meshes, {size_mb:.0f} MB object stream")
+
+        print(f"{'':<24} {'seconds':>8} {'records/s':>10} {'peak RSS MB':>12}")
+        for name, mode in [("full .json() (before)", "before"), ("streaming", "after")]:
+            seconds, count, base, peak = measure(mode, host)
+            print(
+                f"{name:<24} {seconds:>8.2f} {count / seconds:>10,.0f} "
+                f"{(peak - base) / 1024:>12.1f}"
+            )
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
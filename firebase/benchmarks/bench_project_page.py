@@ -0,0 +1,143 @@
+"""Measure project page latency as a user's ruleset count grows.
+
+Before: get_project_with_rulesets fetched the Speckle project, then queried
+the rules of each ruleset one after another, so latency grew with every
+ruleset. After: the Speckle fetch runs alongside the Firestore reads and the
+rules of all rulesets are queried concurrently, so latency stays nearly flat.
+A warm instance also reuses the cached rules of rulesets whose rulesVersion
+has not changed.
+
+Seeds 1, 10 and 100 rulesets into the Firestore emulator for the signed-in
+user, times GET /api/projects/<project_id> for each, and removes the seeded
+rulesets afterwards. Check out the commit before the change to measure the
+baseline.
+
+Start the emulators from firebase/:
+    firebase emulators:start
+
+then, with an emulator ID token for a user whose Speckle token is stored and
+one of their Speckle projects:
+    FIREBASE_ID_TOKEN=... python benchmarks/bench_project_page.py \\
+        --project-id PROJECT_ID
+"""
+
+import argparse
+import os
+import time
+
+import jwt
+import requests
+from google.cloud import firestore
+
+SEEDED_PREFIX = "Project page benchmark"
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def seed_rulesets(db, user_id, project_id, start, stop, rules_per_ruleset):
+    refs = []
+    for i in range(start, stop):
+        ruleset_ref = db.collection("ruleSets").document()
+        batch = db.batch()
+        batch.set(
+            ruleset_ref,
+            {
+                "name": f"{SEEDED_PREFIX} {i}",
+                "description": "",
+                "userId": user_id,
+                "projectId": project_id,
+                "maxOrder": rules_per_ruleset - 1,
+                "rulesVersion": 0,
+                "isShared": False,
+                "createdAt": firestore.SERVER_TIMESTAMP,
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            },
+        )
+        for order in range(rules_per_ruleset):
+            batch.set(
+                ruleset_ref.collection("rules").document(),
+                {
+                    "order": order,
+                    "message": f"Walls need a fire rating ({order})",
+                    "severity": "Error",
+                    "conditions": [
+                        {
+                            "logic": "WHERE",
+                            "propertyName": "category",
+                            "predicate": "equal to",
+                            "value": "Walls",
+                        },
+                        {
+                            "logic": "CHECK",
+                            "propertyName": "fire_rating",
+                            "predicate": "exists",
+                            "value": "",
+                        },
+                    ],
+                },
+            )
+        batch.commit()
+        refs.append(ruleset_ref)
+    return refs
+
+
+def delete_rulesets(db, refs):
+    for ruleset_ref in refs:
+        for rule_ref in ruleset_ref.collection("rules").list_documents():
+            rule_ref.delete()
+        ruleset_ref.delete()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--project-id", required=True)
+    parser.add_argument("--gcloud-project", default="speckle-model-checker")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--rules-per-ruleset", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault("FIRESTORE_EMULATOR_HOST", "localhost:8080")
+    token = os.environ["FIREBASE_ID_TOKEN"]
+    # Emulator tokens are unsigned; only the user ID is needed here
+    user_id = jwt.decode(token, options={"verify_signature": False})["user_id"]
+
+    db = firestore.Client(project=args.gcloud_project)
+    http = requests.Session()
+    http.headers["Authorization"] = f"Bearer {token}"
+    url = f"{args.base_url.rstrip('/')}/api/projects/{args.project_id}"
+
+    print(f"GET {url}, {args.requests} requests per ruleset count")
+    print(f"{'rulesets':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    seeded = []
+    try:
+        for count in sorted(args.counts):
+            seeded += seed_rulesets(
+                db,
+                user_id,
+                args.project_id,
+                len(seeded),
+                count,
+                args.rules_per_ruleset,
+            )
+            http.get(url).raise_for_status()  # Warm the instance
+
+            timings = []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                http.get(url).raise_for_status()
+                timings.append((time.perf_counter() - start) * 1000)
+            print(
+                f"{count:>8} {percentile(timings, 0.5):>8.0f} "
+                f"{percentile(timings, 0.99):>8.0f}"
+            )
+    finally:
+        delete_rulesets(db, seeded)
+
+
+if __name__ == "__main__":
+    main()
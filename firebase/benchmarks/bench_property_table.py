@@ -0,0 +1,114 @@
+"""Benchmark the columnar property table against a list of property dicts.
+
+Before: each Speckle object is flattened into a dict and the dicts are kept
+in a list.
+After: the objects stream into a PropertyTableBuilder. It keeps one typed
+value per object and property: float64 numbers, dictionary-encoded text,
+and bools with a null mask. The table is saved to a file and mapped back
+with PropertyTable.load.
+
+Reports the memory each form holds, the size of the table file, build and
+load times, and checks that rule previews agree on the records and on the
+loaded table.
+
+Run from firebase/ with the functions' dependencies installed:
+    python benchmarks/bench_property_table.py --objects 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "functions")
+)
+
+from bench_object_stream import make_object  # noqa: E402
+from src.evaluation.builder import build_table  # noqa: E402
+from src.evaluation.engine import evaluate_ruleset  # noqa: E402
+from src.evaluation.table import PropertyTable  # noqa: E402
+from src.utils.speckle_objects import flatten_object, is_property_object  # noqa: E402
+
+RULES = [
+    {
+        "id": "wall-width",
+        "conditions": [
+            {"logic": "WHERE", "propertyName": "category", "predicate": "equal to",
+             "value": "Walls"},
+            {"logic": "CHECK", "propertyName": "Width", "predicate": "greater than",
+             "value": "200"},
+        ],
+    },
+    {
+        "id": "structural-fire-rating",
+        "conditions": [
+            {"logic": "WHERE", "propertyName": "Structural", "predicate": "is true",
+             "value": ""},
+            {"logic": "CHECK", "propertyName": "Fire Rating", "predicate": "in list",
+             "value": "EI90,EI120"},
+        ],
+    },
+]  # fmt: skip
+
+
+def objects(count):
+    rng = random.Random(0)
+    for index in range(count):
+        yield from make_object(index, rng)
+
+
+def records(count):
+    return [flatten_object(o) for o in objects(count) if is_property_object(o)]
+
+
+def retained(build, count):
+    """Bytes still allocated by what build returns, and the result."""
+    tracemalloc.start()
+    result = build(count)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--objects", type=int, default=200_000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    records(args.objects)
+    records_s = time.perf_counter() - start
+    start = time.perf_counter()
+    build_table(objects(args.objects))
+    build_s = time.perf_counter() - start
+
+    records_bytes, flat = retained(records, args.objects)
+    table_bytes, table = retained(lambda n: build_table(objects(n)), args.objects)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "properties.ptab")
+        table.save(path)
+        file_bytes = os.path.getsize(path)
+        start = time.perf_counter()
+        loaded = PropertyTable.load(path)
+        load_s = time.perf_counter() - start
+
+        expected = evaluate_ruleset(RULES, PropertyTable.from_records(flat))
+        assert evaluate_ruleset(RULES, table) == expected
+        assert evaluate_ruleset(RULES, loaded) == expected
+
+    print(f"{len(flat):,} objects, {len(table.columns)} properties")
+    print(f"{'':<26} {'MB':>8} {'seconds':>8}")
+    print(
+        f"{'list of dicts (before)':<26} {records_bytes / 1e6:>8.1f} {records_s:>8.2f}"
+    )
+    print(f"{'PropertyTable in memory':<26} {table_bytes / 1e6:>8.1f} {build_s:>8.2f}")
+    print(f"{'PropertyTable file, load':<26} {file_bytes / 1e6:>8.1f} {load_s:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Replay a scripted UI session and report cold starts and latency percentiles.
+
+Before: each of the ~17 functions in firebase.json serves its own routes, so
+a session touching every screen starts (and keeps warm) an instance of each
+one, each loading credentials and Firestore clients on its cold start.
+After: with the rewrites in firebase.router.json, api_fn serves every route
+from one instance.
+
+Every routed response carries the X-Instance-Id of the instance that served
+it, so the number of distinct IDs is the number of cold starts. Each function
+gets its own worker in the emulator too.
+
+Start the emulators from firebase/ with one of:
+    firebase emulators:start
+    firebase emulators:start --config firebase.router.json
+
+then, with an ID token for a signed-in user and one of their projects:
+    FIREBASE_ID_TOKEN=... python benchmarks/bench_router_session.py \\
+        --project-id PROJECT_ID --rounds 5
+"""
+
+import argparse
+import os
+import re
+import time
+
+import requests
+
+RULE_ROW = re.compile(r'id="rule-row-([^"]+)"')
+RULESET_ID = re.compile(r'data-ruleset-id="([^"]+)"')
+
+
+def rule_form(message):
+    return {
+        "message": message,
+        "severity": "Error",
+        "conditions[0][logic]": "WHERE",
+        "conditions[0][propertyName]": "category",
+        "conditions[0][predicate]": "equal to",
+        "conditions[0][value]": "Walls",
+        "conditions[1][logic]": "CHECK",
+        "conditions[1][propertyName]": "fire_rating",
+        "conditions[1][predicate]": "exists",
+        "conditions[1][value]": "",
+    }
+
+
+class Session:
+    def __init__(self, base_url, token):
+        self.base_url = base_url.rstrip("/")
+        self.http = requests.Session()
+        self.http.headers["Authorization"] = f"Bearer {token}"
+        self.timings = []
+        self.instances = {}
+
+    def request(self, method, path, **kwargs):
+        start = time.perf_counter()
+        response = self.http.request(method, self.base_url + path, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        instance = response.headers.get("X-Instance-Id")
+        cold = instance is not None and instance not in self.instances
+        if cold:
+            self.instances[instance] = f"{method} {path}"
+        self.timings.append((elapsed, cold))
+
+        response.raise_for_status()
+        return response.text
+
+
+def ui_session(session, project_id):
+    """The screens a user goes through to edit and export a ruleset."""
+    session.request("GET", "/api/projects")
+    session.request("GET", f"/api/projects/{project_id}")
+    session.request("GET", f"/api/rulesets/new?projectId={project_id}")
+    html = session.request(
+        "POST",
+        "/api/rulesets",
+        data={"projectId": project_id, "name": "Router benchmark"},
+    )
+    ruleset_id = RULESET_ID.search(html).group(1)
+
+    session.request("GET", f"/api/rulesets/{ruleset_id}")
+    session.request("GET", f"/api/rulesets/{ruleset_id}/rules/new")
+    session.request("GET", "/api/rule/condition?index=1")
+    html = session.request(
+        "POST", f"/api/rulesets/{ruleset_id}/rules", data=rule_form("Walls")
+    )
+    rule_id = RULE_ROW.findall(html)[-1]
+
+    session.request("GET", f"/api/rulesets/{ruleset_id}/rules/{rule_id}/edit")
+    session.request(
+        "PUT",
+        f"/api/rulesets/{ruleset_id}/rules/{rule_id}?swap=oob",
+        data=rule_form("Walls need a fire rating"),
+    )
+    session.request("GET", f"/api/rulesets/{ruleset_id}/rules")
+    session.request("PATCH", f"/api/rulesets/{ruleset_id}/share")
+    session.request("GET", f"/api/rulesets/{ruleset_id}/export")
+    session.request("GET", f"/shared/{ruleset_id}")
+    session.request("DELETE", f"/api/rulesets/{ruleset_id}/rules/{rule_id}?swap=oob")
+    session.request("DELETE", f"/api/rulesets/{ruleset_id}/delete")
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:5000")
+    parser.add_argument("--project-id", required=True)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    session = Session(args.base_url, os.environ["FIREBASE_ID_TOKEN"])
+    for _ in range(args.rounds):
+        ui_session(session, args.project_id)
+
+    all_ms = [elapsed * 1000 for elapsed, _ in session.timings]
+    warm_ms = [elapsed * 1000 for elapsed, cold in session.timings if not cold]
+    print(f"{len(all_ms)} requests over {args.rounds} sessions against {args.base_url}")
+    print(f"cold starts: {len(session.instances)}")
+    for instance, first_request in session.instances.items():
+        print(f"  {instance}  first served {first_request}")
+    print(
+        f"p50 {percentile(all_ms, 0.5):.0f} ms, p99 {percentile(all_ms, 0.99):.0f} ms"
+    )
+    if warm_ms:
+        print(
+            f"warm only: p50 {percentile(warm_ms, 0.5):.0f} ms, "
+            f"p99 {percentile(warm_ms, 0.99):.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
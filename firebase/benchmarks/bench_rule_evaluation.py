@@ -0,0 +1,221 @@
+"""Benchmark previewing a ruleset against a 1M-object model.
+
+Naive: every condition of every rule is checked per object on its property
+dict, which is what evaluating rules object by object costs in Python.
+Vectorized: the properties are loaded once into a PropertyTable and each
+condition runs as NumPy kernels over whole columns.
+
+Both evaluators must agree on every rule's matched and failed counts.
+
+Run from firebase/ with the functions' dependencies installed:
+    python benchmarks/bench_rule_evaluation.py --objects 1000000
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "functions")
+)
+
+from src.evaluation.engine import compile_ruleset, evaluate_ruleset  # noqa: E402
+from src.evaluation.table import (  # noqa: E402
+    FALSE_TEXT,
+    TRUE_TEXT,
+    PropertyTable,
+    parse_number,
+    value_text,
+)
+from src.utils.mapping import get_canonical_predicate  # noqa: E402
+
+CATEGORIES = ["Walls", "Doors", "Windows", "Floors", "Columns", "Structural Framing"]
+FIRE_RATINGS = ["EI30", "EI60", "EI90", "EI120"]
+
+
+def condition(logic, name, predicate, value=""):
+    return {
+        "logic": logic,
+        "propertyName": name,
+        "predicate": predicate,
+        "value": value,
+    }
+
+
+RULES = [
+    {
+        "id": "wall-width",
+        "conditions": [
+            condition("WHERE", "category", "equal to", "Walls"),
+            condition("CHECK", "Width", "greater than", "200"),
+        ],
+    },
+    {
+        "id": "wall-fire-rating",
+        "conditions": [
+            condition("WHERE", "category", "is like", "wall"),
+            condition("AND", "is_structural", "is true"),
+            condition("CHECK", "fire_rating", "in list", "EI60,EI90,EI120"),
+        ],
+    },
+    {
+        "id": "column-height",
+        "conditions": [
+            condition("WHERE", "category", "equal to", "Columns"),
+            condition("CHECK", "height", "in range", "2400,4000"),
+        ],
+    },
+    {
+        "id": "door-names",
+        "conditions": [
+            condition("WHERE", "category", "equal to", "Doors"),
+            condition("CHECK", "name", "is like", r"^D\d{3}$"),
+        ],
+    },
+    {
+        "id": "no-temporary-types",
+        "conditions": [
+            condition("WHERE", "type", "exists"),
+            condition("CHECK", "type", "does not contain", "temp"),
+        ],
+    },
+]
+
+
+def make_records(count, seed=0):
+    rng = np.random.default_rng(seed)
+    categories = rng.integers(0, len(CATEGORIES), count)
+    widths = rng.uniform(50, 400, count).round(1)
+    heights = rng.uniform(2000, 4500, count).round()
+    ratings = rng.integers(0, len(FIRE_RATINGS) + 1, count)
+    structural = rng.random(count) < 0.4
+    door_numbers = rng.integers(0, 1200, count)
+    types = rng.integers(0, 50, count)
+
+    records = []
+    for i in range(count):
+        category = CATEGORIES[categories[i]]
+        record = {
+            "id": f"object-{i}",
+            "category": category,
+            "Width": float(widths[i]),
+            "height": float(heights[i]),
+            "is_structural": bool(structural[i]),
+            "type": f"Type {types[i]}" if types[i] else "temp type",
+        }
+        if ratings[i] < len(FIRE_RATINGS):
+            record["fire_rating"] = FIRE_RATINGS[ratings[i]]
+        if category == "Doors":
+            record["name"] = f"D{door_numbers[i]:03d}"
+        records.append(record)
+    return records
+
+
+def naive_condition(condition):
+    """Per-object test for a condition, with the engine's semantics."""
+    name = condition["propertyName"]
+    predicate = get_canonical_predicate(condition["predicate"])
+    value = condition.get("value", "")
+    number = parse_number(value)
+    items = [item.strip() for item in str(value).split(",") if item.strip()]
+    pattern = re.compile(str(value), re.IGNORECASE)
+
+    def test(record):
+        if name not in record or record[name] is None:
+            return False
+        prop = record[name]
+        text = value_text(prop)
+        prop_number = parse_number(prop)
+        if predicate == "exists":
+            return True
+        if predicate == "greater than":
+            return prop_number > number
+        if predicate == "less than":
+            return prop_number < number
+        if predicate == "in range":
+            low, high = sorted(float(item) for item in items)
+            return low <= prop_number <= high
+        if predicate == "in list":
+            return text.lower() in {item.lower() for item in items} or any(
+                prop_number == parse_number(item) for item in items
+            )
+        if predicate == "equal to":
+            return prop_number == number or text.lower() == str(value).strip().lower()
+        if predicate == "not equal to":
+            return not (
+                prop_number == number or text.lower() == str(value).strip().lower()
+            )
+        if predicate == "is true":
+            return prop is True or (
+                isinstance(prop, str) and prop.strip().lower() in TRUE_TEXT
+            )
+        if predicate == "is false":
+            return prop is False or (
+                isinstance(prop, str) and prop.strip().lower() in FALSE_TEXT
+            )
+        if predicate == "is like":
+            return pattern.search(text) is not None
+        if predicate == "identical to":
+            return text == str(value)
+        if predicate == "contains":
+            return str(value).lower() in text.lower()
+        if predicate == "does not contain":
+            return str(value).lower() not in text.lower()
+        raise ValueError(predicate)
+
+    return test
+
+
+def naive_evaluate(rules, records):
+    results = []
+    for rule in rules:
+        tests = [naive_condition(c) for c in rule["conditions"]]
+        check = tests.pop()
+        matched = failed = 0
+        for record in records:
+            if all(test(record) for test in tests):
+                matched += 1
+                if not check(record):
+                    failed += 1
+        results.append((rule["id"], matched, failed))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--objects", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    records = make_records(args.objects)
+    print(f"{len(RULES)} rules over {args.objects:,} objects")
+
+    start = time.perf_counter()
+    naive = naive_evaluate(RULES, records)
+    naive_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = PropertyTable.from_records(records)
+    build_s = time.perf_counter() - start
+
+    compiled = compile_ruleset(RULES)
+    start = time.perf_counter()
+    results = evaluate_ruleset(compiled, table)
+    vectorized_s = time.perf_counter() - start
+
+    vectorized = [(r["id"], r["matched"], r["failed"]) for r in results]
+    assert vectorized == naive, (vectorized, naive)
+
+    print(f"{'':<26} {'seconds':>8}")
+    print(f"{'naive per-object dicts':<26} {naive_s:>8.2f}")
+    print(f"{'build PropertyTable':<26} {build_s:>8.2f}")
+    print(f"{'vectorized evaluation':<26} {vectorized_s:>8.2f}")
+    for rule_id, matched, failed in vectorized:
+        print(f"  {rule_id:<22} matched {matched:>9,} failed {failed:>9,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark first-render latency and per-render CPU of the rules list.
+
+Before: each new instance parsed and compiled templates from source on their
+first use, then checked every file's modification time on each render.
+After: templates are precompiled into modules before deploying and loaded
+with auto_reload off. The emulator (FUNCTIONS_EMULATOR=true) still loads
+sources, through a bytecode cache that processes on one machine share.
+
+Each first render runs in a fresh interpreter, like a cold instance.
+
+Run from firebase/ after precompiling:
+    (cd functions && python precompile_templates.py)
+    python benchmarks/bench_templates.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+FUNCTIONS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "functions"
+)
+TEMPLATE = "rules_list.html"
+RULES = 100
+COLD_RUNS = 5
+RENDERS = 500
+
+# Runs in a fresh interpreter and prints the seconds to the first render and
+# the CPU seconds per render afterwards
+RENDER = """
+import json, sys, time
+from src.utils.jinja_env import env
+if sys.argv[1] == "before":
+    env.bytecode_cache = None
+rules = [
+    {
+        "id": f"rule-{i}",
+        "message": f"Walls on level {i} must have a fire rating",
+        "severity": "Error",
+        "conditions": [
+            {"logic": "WHERE", "propertyName": "category",
+             "predicate": "equal to", "value": "Walls"},
+            {"logic": "CHECK", "propertyName": "fire_rating",
+             "predicate": "exists", "value": ""},
+        ],
+    }
+    for i in range(%d)
+]
+context = {"ruleset": {"id": "ruleset-1"}, "rules": rules}
+start = time.perf_counter()
+env.get_template("%s").render(**context)
+first = time.perf_counter() - start
+cpu = time.process_time()
+for _ in range(%d):
+    env.get_template("%s").render(**context)
+print(json.dumps([first, (time.process_time() - cpu) / %d]))
+""" % (
+    RULES,
+    TEMPLATE,
+    RENDERS,
+    TEMPLATE,
+    RENDERS,
+)
+
+
+def measure(mode):
+    env = dict(os.environ)
+    env.pop("FUNCTIONS_EMULATOR", None)
+    if mode != "precompiled":
+        env["FUNCTIONS_EMULATOR"] = "true"
+
+    runs = []
+    for _ in range(COLD_RUNS):
+        output = subprocess.run(
+            [sys.executable, "-c", RENDER, mode],
+            cwd=FUNCTIONS_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        runs.append(json.loads(output))
+    runs.sort()
+    first, cpu = runs[len(runs) // 2]
+    return first * 1000, cpu * 1000
+
+
+def main():
+    if not os.path.isdir(os.path.join(FUNCTIONS_DIR, "compiled_templates")):
+        sys.exit("Run precompile_templates.py in functions/ first")
+
+    print(f"Rendering {TEMPLATE} with {RULES} rules")
+    print(f"{'':<28} {'first render ms':>16} {'CPU ms/render':>14}")
+    # Fill the bytecode cache, as an earlier process on the machine would
+    measure("bytecode")
+    for name, mode in [
+        ("source, auto_reload (before)", "before"),
+        ("bytecode cache, auto_reload", "bytecode"),
+        ("precompiled, no auto_reload", "precompiled"),
+    ]:
+        first_ms, cpu_ms = measure(mode)
+        print(f"{name:<28} {first_ms:>16.2f} {cpu_ms:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
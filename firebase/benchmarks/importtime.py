@@ -0,0 +1,81 @@
+"""Profile the imports a Firebase function instance pays for on cold start.
+
+Runs `python -X importtime -c "import main"` in functions/ and reports the
+total import time and the modules that take longest, by cumulative time.
+Route modules and the Firebase Admin app are loaded on first use, so
+importing main should only load firebase_functions and the router.
+
+Run from firebase/ with the functions' dependencies installed:
+    python benchmarks/importtime.py --top 20
+
+With --budget-ms the script exits with status 1 when the total exceeds the
+budget, so it can guard against import-time regressions in CI:
+    python benchmarks/importtime.py --budget-ms 800
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+FUNCTIONS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "functions"
+)
+
+
+def import_times(module, python, functions_dir):
+    """Import a module in a fresh interpreter.
+
+    Returns:
+        list: (self_us, cumulative_us, name) for every module imported
+    """
+    # The emulator flag keeps anything that runs on import away from Secret
+    # Manager, as it would be in local development
+    env = dict(os.environ, FUNCTIONS_EMULATOR="true")
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        cwd=functions_dir,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        sys.exit(f"import {module} failed:\n{result.stderr}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if not fields[0].strip().isdigit():
+            continue  # Header line
+        rows.append((int(fields[0]), int(fields[1]), fields[2].rstrip()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--python", default=sys.executable)
+    parser.add_argument("--functions-dir", default=FUNCTIONS_DIR)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float)
+    args = parser.parse_args()
+
+    rows = import_times(args.module, args.python, args.functions_dir)
+    total_ms = sum(self_us for self_us, _, _ in rows) / 1000
+
+    print(f"import {args.module}: {total_ms:.0f} ms over {len(rows)} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda row: -row[1])[
+        : args.top
+    ]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}")
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"Over budget: {total_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,17 @@
 import json
 import logging
 
-import firebase_admin
-from firebase_admin import credentials
-from firebase_functions import https_fn, options
-from google.api_core.exceptions import GoogleAPICallError
-from google.cloud import secretmanager
-
-from src.auth.auth_routes import exchange_token, get_user, init_speckle_auth
-from src.projects.project_routes import (
-    get_new_ruleset_form,
-    get_project_with_rulesets,
-    get_user_projects_view,
-)
-from src.rules.rule_routes import (
-    create_rule_handler,
-    delete_rule_handler,
-    get_condition_row,
-    get_edit_rule_form,
-    get_new_rule_form,
-    get_rules,
-    update_rule_handler,
-)
-from src.rulesets.ruleset_export import export_ruleset_as_tsv
-from src.rulesets.ruleset_routes import (
-    create_new_ruleset,
-    delete_ruleset_handler,
-    get_ruleset_edit_form,
-    update_ruleset_info,
-)
-from src.rulesets.ruleset_sharing import (
-    get_shared_ruleset_view,
-    toggle_ruleset_sharing_handler,
-)
+from firebase_functions import https_fn, options, scheduler_fn
 
+from src.utils.router import Router, tag_instance
 
-def load_firebase_cred_with_fallback():
-    try:
-        client = secretmanager.SecretManagerServiceClient()
-        secret_name = "projects/speckle-model-checker/secrets/firebase-service-account-key/versions/latest"
-        response = client.access_secret_version(name=secret_name)
-        secret_payload = response.payload.data.decode("UTF-8")
-        cred_info = json.loads(secret_payload)
-        print("Loaded Firebase credentials from Secret Manager.")
-        return credentials.Certificate(cred_info)
-    except GoogleAPICallError as e:
-        print(f"Could not load secret (probably emulator or no permission): {e}")
-        print("Falling back to ADC / default credentials.")
-        return None  # Will trigger default ADC fallback
-
-
-# Initialize Firebase (only if not already initialized)
-if not firebase_admin._apps:
-    cred = load_firebase_cred_with_fallback()
-    if cred:
-        firebase_admin.initialize_app(cred)
-    else:
-        firebase_admin.initialize_app()  # Use ADC or environment creds
+# Firebase Admin and Firestore clients are created on first use (see
+# src/utils/firebase_app.py), and route modules are imported on their first
+# request, so a cold start only loads what its request needs
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-# Import all function modules
-
 
 # Define CORS options
 cors_config = options.CorsOptions(
@@ -71,46 +20,177 @@ cors_config = options.CorsOptions(
 )
 
 
-# Register Firebase Functions with CORS
+def condition_row(req: https_fn.Request, index=None, **params) -> https_fn.Response:
+    from src.rules.rule_routes import get_condition_row
+
+    if not index:
+        return https_fn.Response(
+            json.dumps({"error": "Index not found"}),
+            mimetype="application/json",
+            status=400,
+        )
+
+    return get_condition_row(index)
+
+
+def shared_ruleset(req: https_fn.Request, ruleset_id: str) -> https_fn.Response:
+    """Directly serve TSV for shared rulesets to support automation"""
+    from src.rulesets.ruleset_sharing import get_shared_ruleset_view
+
+    try:
+        print(f"Serving shared ruleset TSV for ID: {ruleset_id}")
+        return get_shared_ruleset_view(req, ruleset_id)
+    except Exception as e:
+        import traceback
+
+        error_details = traceback.format_exc()
+        print(f"Unhandled error in get_shared_ruleset_fn: {str(e)}")
+        print(f"Error details: {error_details}")
+        return https_fn.Response(
+            f"Server error: {str(e)}", mimetype="text/plain", status=500
+        )
+
+
+# Handlers are given as "module:function" and imported on a route's first
+# request
+PROJECTS = "src.projects.project_routes"
+RULES = "src.rules.rule_routes"
+RULESETS = "src.rulesets.ruleset_routes"
+SHARING = "src.rulesets.ruleset_sharing"
+
+# Routes in the same order as the Hosting rewrites in firebase.json, which
+# also picks the first match
+router = Router()
+router.add("/api/rule/condition", condition_row, query={"index": "index"})
+router.add("/api/auth/init", "src.auth.auth_routes:init_speckle_auth")
+router.add("/api/auth/users", "src.auth.auth_routes:get_user")
+router.add("/api/auth/token", "src.auth.auth_routes:exchange_token")
+router.add("/api/projects", f"{PROJECTS}:get_user_projects_view")
+router.add("/api/projects/<project_id>", f"{PROJECTS}:get_project_with_rulesets")
+router.add(
+    "/api/rulesets/new",
+    f"{PROJECTS}:get_new_ruleset_form",
+    query={"project_id": "projectId"},
+)
+router.add("/api/rulesets", f"{RULESETS}:create_new_ruleset")
+router.add("/api/rulesets/<ruleset_id>/rules/new", f"{RULES}:get_new_rule_form")
+router.add("/api/rulesets/<ruleset_id>/delete", f"{RULESETS}:delete_ruleset_handler")
+router.add("/api/rulesets/<ruleset_id>/edit", f"{RULESETS}:get_ruleset_edit_form")
+router.add(
+    "/api/rulesets/<ruleset_id>/share", f"{SHARING}:toggle_ruleset_sharing_handler"
+)
+router.add(
+    "/api/rulesets/<ruleset_id>/export",
+    "src.rulesets.ruleset_export:export_ruleset_as_tsv",
+)
+router.add("/api/rulesets/<ruleset_id>/rules", f"{RULES}:get_rules", methods=["GET"])
+router.add(
+    "/api/rulesets/<ruleset_id>/rules", f"{RULES}:create_rule_handler", methods=["POST"]
+)
+router.add(
+    "/api/rulesets/<ruleset_id>/rules/<rule_id>/condition-row/<index>", condition_row
+)
+router.add(
+    "/api/rulesets/<ruleset_id>/rules/<rule_id>/edit", f"{RULES}:get_edit_rule_form"
+)
+router.add(
+    "/api/rulesets/<ruleset_id>/rules/<rule_id>",
+    f"{RULES}:delete_rule_handler",
+    methods=["DELETE"],
+)
+router.add(
+    "/api/rulesets/<ruleset_id>/rules/<rule_id>",
+    f"{RULES}:update_rule_handler",
+    methods=["PUT"],
+)
+router.add(
+    "/api/rulesets/<ruleset_id>",
+    f"{RULESETS}:update_ruleset_info",
+    methods=["PUT", "POST"],
+)
+router.add("/api/rulesets/<ruleset_id>", f"{RULESETS}:get_ruleset_edit_form")
+router.add("/shared/<ruleset_id>", shared_ruleset)
+
+
+# Single entry point for every route. Pointing all /api/** and /shared/**
+# rewrites at it (see firebase.router.json) lets one warm instance serve a
+# whole session instead of each route paying its own cold start
+@https_fn.on_request(cors=cors_config)
+def api_fn(req: https_fn.Request) -> https_fn.Response:
+    return router.dispatch(req)
+
+
+# Register Firebase Functions with CORS. Each one keeps its own path parsing
+# and query fallbacks, so existing function URLs behave as before; only
+# api_fn goes through the router. Their responses carry X-Instance-Id too, so
+# benchmarks/bench_router_session.py can count their cold starts
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def init_auth_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.auth.auth_routes import init_speckle_auth
+
     return init_speckle_auth(req)
 
 
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def token_exchange_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.auth.auth_routes import exchange_token
+
     return exchange_token(req)
 
 
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def get_users_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.auth.auth_routes import get_user
+
     return get_user(req)
 
 
 # Project Functions
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def get_projects_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.projects.project_routes import get_user_projects_view
+
     return get_user_projects_view(req)
 
 
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def get_user_projects_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.projects.project_routes import get_user_projects_view
+
     return get_user_projects_view(req)
 
 
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def get_project_details_fn(req: https_fn.Request) -> https_fn.Response:
-    return get_project_with_rulesets(req)
+    from src.projects.project_routes import get_project_with_rulesets
+
+    if "/projects/" in req.path:
+        project_id = req.path.split("/projects/")[1].split("/")[0]
+    else:
+        project_id = req.args.get("projectId")
+    return get_project_with_rulesets(req, project_id)
 
 
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def get_new_ruleset_form_fn(req: https_fn.Request) -> https_fn.Response:
-    return get_new_ruleset_form(req)
+    from src.projects.project_routes import get_new_ruleset_form
+
+    return get_new_ruleset_form(req, req.args.get("projectId"))
 
 
 # Ruleset Functions
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def get_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.rulesets.ruleset_routes import get_ruleset_edit_form
+
     ruleset_id = (
         req.args.get("ruleset_id") or req.path.split("/rulesets/")[-1].split("/")[0]
     )
@@ -118,12 +198,18 @@ def get_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
 
 
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def create_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.rulesets.ruleset_routes import create_new_ruleset
+
     return create_new_ruleset(req)
 
 
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def update_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.rulesets.ruleset_routes import update_ruleset_info
+
     ruleset_id = (
         req.args.get("ruleset_id") or req.path.split("/rulesets/")[-1].split("/")[0]
     )
@@ -131,15 +217,30 @@ def update_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
 
 
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def delete_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.rulesets.ruleset_routes import delete_ruleset_handler
+
     ruleset_id = (
         req.args.get("ruleset_id") or req.path.split("/rulesets/")[-1].split("/")[0]
     )
     return delete_ruleset_handler(req, ruleset_id)
 
 
+@scheduler_fn.on_schedule(schedule="every day 03:00")
+def cleanup_orphaned_rules_fn(event: scheduler_fn.ScheduledEvent) -> None:
+    from src.utils.firestore_utils import delete_orphaned_rules
+
+    # Rules of rulesets deleted before rules were removed with them
+    deleted = delete_orphaned_rules()
+    print(f"Deleted {deleted} orphaned rules")
+
+
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def toggle_sharing_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.rulesets.ruleset_sharing import toggle_ruleset_sharing_handler
+
     ruleset_id = (
         req.args.get("ruleset_id") or req.path.split("/share")[0].split("/")[-1]
     )
@@ -147,61 +248,32 @@ def toggle_sharing_fn(req: https_fn.Request) -> https_fn.Response:
     return toggle_ruleset_sharing_handler(req, ruleset_id)
 
 
-# @https_fn.on_request(cors=cors_config)
-# def get_shared_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
-#     parts = req.path.split("/")
-#     print(f"Request path: {req.path}")
-#     print(f"Parts: {parts}")
-
-#     ruleset_id = (
-#         req.args.get("ruleset_id") or req.path.split("/shared/")[-1].split("/")[0]
-#     )
-
-
-#     print(f"Ruleset ID: {ruleset_id}")
-#     return get_shared_ruleset_view(req, ruleset_id)
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def get_shared_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
-    """Directly serve TSV for shared rulesets to support automation"""
-    try:
-        # Extract ruleset ID from path
-        path_parts = req.path.split("/")
-        print(f"Shared ruleset request path: {req.path}")
-
-        # Find 'shared' in the path and get the next part as the ruleset ID
-        try:
-            shared_index = path_parts.index("shared")
-            if shared_index + 1 < len(path_parts):
-                ruleset_id = path_parts[shared_index + 1]
-            else:
-                ruleset_id = req.args.get("ruleset_id")
-        except ValueError:
-            # If 'shared' not in path, try to get from query string
-            ruleset_id = req.args.get("ruleset_id")
-
-        if not ruleset_id:
-            return https_fn.Response(
-                "Missing ruleset ID", mimetype="text/plain", status=400
-            )
-
-        print(f"Serving shared ruleset TSV for ID: {ruleset_id}")
-
-        # Let the view function handle the rest
-        return get_shared_ruleset_view(req, ruleset_id)
-    except Exception as e:
-        import traceback
+    # Find 'shared' in the path and get the next part as the ruleset ID,
+    # falling back to the query string
+    path_parts = req.path.split("/")
+    print(f"Shared ruleset request path: {req.path}")
+    if "shared" in path_parts and path_parts.index("shared") + 1 < len(path_parts):
+        ruleset_id = path_parts[path_parts.index("shared") + 1]
+    else:
+        ruleset_id = req.args.get("ruleset_id")
 
-        error_details = traceback.format_exc()
-        print(f"Unhandled error in get_shared_ruleset_fn: {str(e)}")
-        print(f"Error details: {error_details}")
+    if not ruleset_id:
         return https_fn.Response(
-            f"Server error: {str(e)}", mimetype="text/plain", status=500
+            "Missing ruleset ID", mimetype="text/plain", status=400
         )
 
+    return shared_ruleset(req, ruleset_id)
+
 
 # Ruleset Export Function
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def export_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.rulesets.ruleset_export import export_ruleset_as_tsv
+
     ruleset_id = (
         req.args.get("ruleset_id") or req.path.split("/export")[-2].split("/")[-1]
     )
@@ -210,7 +282,10 @@ def export_ruleset_fn(req: https_fn.Request) -> https_fn.Response:
 
 # Rule Functions
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def get_rules_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.rules.rule_routes import create_rule_handler, get_rules
+
     # Extract ruleset_id from path like /api/rulesets/{ruleset_id}/rules
     ruleset_id = (
         req.path.split("/rulesets/")[1].split("/")[0]
@@ -231,7 +306,10 @@ def get_rules_fn(req: https_fn.Request) -> https_fn.Response:
 
 
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def update_rule_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.rules.rule_routes import delete_rule_handler, update_rule_handler
+
     parts = req.path.split("/")
     ruleset_id = req.args.get("ruleset_id") or parts[-3]
     rule_index = req.args.get("rule_index") or parts[-1]
@@ -250,7 +328,10 @@ def update_rule_fn(req: https_fn.Request) -> https_fn.Response:
 
 
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def get_new_rule_form_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.rules.rule_routes import get_new_rule_form
+
     ruleset_id = (
         req.args.get("ruleset_id") or req.path.split("/rules/new")[0].split("/")[-1]
     )
@@ -258,21 +339,16 @@ def get_new_rule_form_fn(req: https_fn.Request) -> https_fn.Response:
 
 
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def get_condition_row_fn(req: https_fn.Request) -> https_fn.Response:
-    index = req.args.get("index")
-
-    if not index:
-        return https_fn.Response(
-            json.dumps({"error": "Index not found"}),
-            mimetype="application/json",
-            status=400,
-        )
-
-    return get_condition_row(index)
+    return condition_row(req, req.args.get("index"))
 
 
 @https_fn.on_request(cors=cors_config)
+@tag_instance
 def get_edit_rule_form_fn(req: https_fn.Request) -> https_fn.Response:
+    from src.rules.rule_routes import get_edit_rule_form
+
     parts = req.path.split("/")
 
     print(f"Request path: {req.path}")
@@ -0,0 +1,11 @@
+"""Precompile the Jinja templates into Python modules before deploying.
+
+Runs as the functions predeploy step in firebase.json, or from functions/:
+    python precompile_templates.py
+"""
+
+from src.utils.jinja_env import compiled_template_dir, precompile_templates
+
+if __name__ == "__main__":
+    count = precompile_templates()
+    print(f"Compiled {count} templates into {compiled_template_dir}")
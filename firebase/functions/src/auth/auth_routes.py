@@ -9,8 +9,7 @@ from firebase_admin.exceptions import FirebaseError
 from firebase_functions import https_fn
 from google.cloud import firestore
 
-# Verify challenge exists and hasn't been used
-db = firestore.Client()
+from ..utils.firebase_app import ensure_firebase_app, get_db
 
 
 # Get Speckle configuration from environment
@@ -127,7 +126,7 @@ def get_user(request):
         firebase_user = create_or_update_firebase_user(user, password)
 
         # Store Speckle tokens in Firestore
-        db.collection("userTokens").document(firebase_user.uid).set(
+        get_db().collection("userTokens").document(firebase_user.uid).set(
             {
                 "speckleId": user["id"],
                 "speckleToken": token,
@@ -171,6 +170,7 @@ def get_user(request):
 
 def create_or_update_firebase_user(user, password):
     """Handle creation or update of Firebase user with proper error handling."""
+    ensure_firebase_app()
     try:
         # Try to get existing user
         firebase_user = auth.get_user_by_email(user["email"])
@@ -320,6 +320,7 @@ def exchange_token(request):
         )
 
         # Create or update Firebase user
+        ensure_firebase_app()
         try:
             firebase_user = auth.get_user_by_email(user_data["email"])
 
@@ -344,7 +345,7 @@ def exchange_token(request):
             )
 
         # Store Speckle tokens in Firestore
-        db.collection("userTokens").document(firebase_user.uid).set(
+        get_db().collection("userTokens").document(firebase_user.uid).set(
             {
                 "speckleId": user_data["id"],
                 "speckleToken": token_data["token"],
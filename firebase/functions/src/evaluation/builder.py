@@ -0,0 +1,203 @@
+"""
+Build a PropertyTable from a stream of Speckle objects, one object at a time.
+
+Each property path gets a column builder appending to a typed buffer, so
+the objects are never held as a list of dicts. A column starts with the type
+of its first value and is widened when a value of another type arrives, to
+the same column type PropertyTable.from_records would choose for the whole
+list.
+"""
+
+import math
+from array import array
+
+import numpy as np
+
+from ..utils.speckle_objects import flatten_object, is_property_object
+from .table import (
+    BoolColumn,
+    NumberColumn,
+    PropertyTable,
+    StringColumn,
+    object_ids,
+    value_text,
+)
+
+BOOL = "bool"
+NUMBER = "number"
+STRING = "string"
+
+
+# Kinds of the common types, found without isinstance checks
+_KINDS = {bool: BOOL, int: NUMBER, float: NUMBER, str: STRING}
+
+
+def _kind(value):
+    kind = _KINDS.get(type(value))
+    if kind is not None:
+        return kind
+    if isinstance(value, (bool, np.bool_)):
+        return BOOL
+    if isinstance(value, (int, float, np.number)):
+        return NUMBER
+    return STRING
+
+
+class ColumnBuilder:
+    """
+    Typed buffer of one property's values, with a missing value for each
+    object before the first that had the property.
+    """
+
+    def __init__(self, kind, size):
+        self.kind = kind
+        self.size = size
+        if kind == BOOL:
+            self.values = bytearray(size)
+            self.mask = bytearray(size)
+        elif kind == NUMBER:
+            self.values = array("d", [math.nan]) * size
+        else:
+            self.codes = array("i", [-1]) * size
+            self.categories = {}
+
+    def append(self, value, row):
+        """
+        Set the value of object number row, padding the objects in between
+        with missing values.
+        """
+        kind = _kind(value)
+        if kind is not self.kind:
+            self._widen()
+        if self.size != row:
+            self.pad(row)
+        if self.kind is STRING and type(value) is str:
+            categories = self.categories
+            self.codes.append(categories.setdefault(value, len(categories)))
+        elif self.kind is NUMBER:
+            self.values.append(value)
+        elif self.kind is BOOL:
+            self.values.append(bool(value))
+            self.mask.append(1)
+        else:
+            categories = self.categories
+            self.codes.append(categories.setdefault(value_text(value), len(categories)))
+        self.size = row + 1
+
+    def pad(self, size):
+        missing = size - self.size
+        if missing <= 0:
+            return
+        if self.kind == BOOL:
+            self.values.extend(bytes(missing))
+            self.mask.extend(bytes(missing))
+        elif self.kind == NUMBER:
+            self.values.extend(array("d", [math.nan]) * missing)
+        else:
+            self.codes.extend(array("i", [-1]) * missing)
+        self.size = size
+
+    def _widen(self):
+        # Only all-bool columns stay bool and all-number columns numeric;
+        # anything mixed becomes text, as in build_column
+        if self.kind == STRING:
+            return
+        if self.kind == BOOL:
+            old = [bool(v) if m else None for v, m in zip(self.values, self.mask)]
+            del self.mask
+        else:
+            old = [None if math.isnan(v) else v for v in self.values]
+        del self.values
+        self.kind = STRING
+        self.codes = array("i")
+        self.categories = {}
+        for value in old:
+            self.codes.append(
+                -1
+                if value is None
+                else self.categories.setdefault(value_text(value), len(self.categories))
+            )
+
+    def finish(self, size):
+        """
+        Returns:
+            The column, sized for size objects
+        """
+        self.pad(size)
+        if self.kind == BOOL:
+            return BoolColumn(
+                np.frombuffer(self.values, dtype=bool).copy(),
+                np.frombuffer(self.mask, dtype=bool).copy(),
+            )
+        if self.kind == NUMBER:
+            return NumberColumn(np.frombuffer(self.values, dtype=np.float64).copy())
+        return StringColumn(
+            np.frombuffer(self.codes, dtype=np.int32).copy(),
+            np.array(list(self.categories), dtype=object),
+        )
+
+
+class PropertyTableBuilder:
+    """
+    Append flat property records one at a time, then build the table.
+
+    Memory holds one typed value per object and property, however the
+    records arrive.
+    """
+
+    def __init__(self, id_key="id"):
+        self.id_key = id_key
+        self.size = 0
+        self._columns = {}
+
+    def append(self, record):
+        """
+        Add one object's properties. None and non-scalar values count as
+        missing.
+        """
+        row = self.size
+        columns = self._columns
+        for name, value in record.items():
+            if value is None or isinstance(value, (dict, list, tuple)):
+                continue
+            column = columns.get(name)
+            if column is None:
+                column = columns[name] = ColumnBuilder(_kind(value), row)
+            column.append(value, row)
+        self.size = row + 1
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+        return self
+
+    def build(self):
+        """
+        Returns:
+            PropertyTable: The table of the records appended so far
+        """
+        columns = {
+            name: column.finish(self.size) for name, column in self._columns.items()
+        }
+        return PropertyTable(self.size, columns, *object_ids(columns, self.id_key))
+
+
+def build_table(objects):
+    """
+    Build the property table of a version's objects, as they stream in.
+
+    Objects that cannot hold properties, such as geometry, are skipped and
+    the others flattened by property path (see speckle_objects).
+
+    Args:
+        objects (iterable): Decoded Speckle objects, for example from
+            SpeckleAPI.stream_version_objects
+
+    Returns:
+        PropertyTable: The table
+    """
+    builder = PropertyTableBuilder()
+    for obj in objects:
+        if is_property_object(obj):
+            builder.append(flatten_object(obj))
+    return builder.build()
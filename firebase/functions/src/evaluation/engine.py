@@ -0,0 +1,297 @@
+"""
+Evaluate rulesets against a PropertyTable to preview what each rule matches.
+
+Each condition is compiled once into a kernel: a function from a property
+column to a boolean mask over all objects. Text predicates are evaluated on
+a column's distinct values and spread to the objects through its codes, so
+their cost depends on the number of distinct values, not of objects.
+
+A rule's conditions other than its CHECK condition (the last condition if
+none is marked CHECK) select the objects the rule applies to. Objects that
+are selected but fail the CHECK condition are the rule's issues.
+"""
+
+import re
+
+import numpy as np
+
+from ..utils.mapping import get_canonical_predicate
+from .table import parse_number
+
+# Failing object IDs returned per rule
+MAX_FAILING_IDS = 100
+
+
+class RuleCompileError(ValueError):
+    """A condition's value cannot be used with its predicate."""
+
+
+def _number(value, predicate):
+    number = parse_number(value)
+    if np.isnan(number):
+        raise RuleCompileError(f"'{predicate}' needs a number, got '{value}'")
+    return number
+
+
+def _items(value):
+    return [item.strip() for item in str(value).split(",") if item.strip()]
+
+
+def _text_kernel(test):
+    """Kernel applying test(text) to each distinct value of a column."""
+
+    def kernel(column):
+        codes, categories = column.text()
+        hits = np.fromiter(
+            (test(v) for v in categories), dtype=bool, count=len(categories)
+        )
+        return np.append(hits, False)[codes]
+
+    return kernel
+
+
+def _exists(value):
+    return lambda column: column.present()
+
+
+def _greater_than(value):
+    threshold = _number(value, "greater than")
+    return lambda column: column.numbers() > threshold
+
+
+def _less_than(value):
+    threshold = _number(value, "less than")
+    return lambda column: column.numbers() < threshold
+
+
+def _in_range(value):
+    bounds = _items(value)
+    if len(bounds) != 2:
+        raise RuleCompileError(f"'in range' needs 'min,max', got '{value}'")
+    low, high = sorted(_number(bound, "in range") for bound in bounds)
+
+    def kernel(column):
+        numbers = column.numbers()
+        return (numbers >= low) & (numbers <= high)
+
+    return kernel
+
+
+def _in_list(value):
+    items = _items(value)
+    if not items:
+        raise RuleCompileError("'in list' needs comma-separated values")
+    lowered = {item.lower() for item in items}
+    numbers = np.array([parse_number(item) for item in items])
+    numbers = numbers[~np.isnan(numbers)]
+    text_kernel = _text_kernel(lambda v: v.lower() in lowered)
+
+    def kernel(column):
+        hits = text_kernel(column)
+        if len(numbers):
+            hits |= np.isin(column.numbers(), numbers)
+        return hits
+
+    return kernel
+
+
+def _equal_to(value):
+    number = parse_number(value)
+    if not np.isnan(number):
+        text = str(value).strip().lower()
+        text_kernel = _text_kernel(lambda v: v.lower() == text)
+        return lambda column: (column.numbers() == number) | text_kernel(column)
+    text = str(value).lower()
+    return _text_kernel(lambda v: v.lower() == text)
+
+
+def _not_equal_to(value):
+    equal = _equal_to(value)
+    return lambda column: column.present() & ~equal(column)
+
+
+def _is_true(value):
+    return lambda column: column.truth()[0]
+
+
+def _is_false(value):
+    return lambda column: column.truth()[1]
+
+
+def _is_like(value):
+    try:
+        pattern = re.compile(str(value), re.IGNORECASE)
+    except re.error as e:
+        raise RuleCompileError(f"'is like' needs a valid pattern: {e}")
+    return _text_kernel(lambda v: pattern.search(v) is not None)
+
+
+def _identical_to(value):
+    text = str(value)
+    return _text_kernel(lambda v: v == text)
+
+
+def _contains(value):
+    text = str(value).lower()
+    return _text_kernel(lambda v: text in v.lower())
+
+
+def _does_not_contain(value):
+    contains = _contains(value)
+    return lambda column: column.present() & ~contains(column)
+
+
+# Kernel builders by canonical predicate, see mapping.CANONICAL_PREDICATES
+KERNELS = {
+    "exists": _exists,
+    "greater than": _greater_than,
+    "less than": _less_than,
+    "in range": _in_range,
+    "in list": _in_list,
+    "equal to": _equal_to,
+    "not equal to": _not_equal_to,
+    "is true": _is_true,
+    "is false": _is_false,
+    "is like": _is_like,
+    "identical to": _identical_to,
+    "contains": _contains,
+    "does not contain": _does_not_contain,
+}
+
+
+class CompiledCondition:
+    def __init__(self, property_name, predicate, kernel):
+        self.property_name = property_name
+        self.predicate = predicate
+        self.kernel = kernel
+
+    def evaluate(self, table):
+        """
+        Returns:
+            np.ndarray: Mask of the objects meeting the condition. Objects
+            without the property never do
+        """
+        column = table.column(self.property_name)
+        if column is None:
+            return np.zeros(len(table), dtype=bool)
+        return self.kernel(column)
+
+
+def compile_condition(condition):
+    """
+    Compile a stored condition.
+
+    Args:
+        condition (dict): Condition with propertyName, predicate and value
+
+    Returns:
+        CompiledCondition: The compiled condition
+
+    Raises:
+        RuleCompileError: If the predicate is unknown or the value invalid
+    """
+    predicate = get_canonical_predicate(condition.get("predicate"))
+    build = KERNELS.get(predicate)
+    if build is None:
+        raise RuleCompileError(f"Unknown predicate '{predicate}'")
+    property_name = condition.get("propertyName") or ""
+    if not property_name:
+        raise RuleCompileError("Condition has no property name")
+    return CompiledCondition(property_name, predicate, build(condition.get("value")))
+
+
+class CompiledRule:
+    def __init__(self, rule, filters=(), check=None, error=None):
+        self.rule_id = rule.get("id")
+        self.message = rule.get("message", "")
+        self.severity = rule.get("severity", "")
+        self.filters = filters
+        self.check = check
+        self.error = error
+
+    def evaluate(self, table):
+        """
+        Returns:
+            tuple: (matched, failed) masks over the table's objects
+        """
+        matched = np.ones(len(table), dtype=bool)
+        for condition in self.filters:
+            matched &= condition.evaluate(table)
+        failed = matched & ~self.check.evaluate(table)
+        return matched, failed
+
+
+def compile_rule(rule):
+    """
+    Compile a rule as returned by get_rules_for_ruleset.
+
+    Returns:
+        CompiledRule: The compiled rule. A rule that cannot be compiled keeps
+        the reason in its error and is not evaluated
+    """
+    conditions = rule.get("conditions") or []
+    if not conditions:
+        return CompiledRule(rule, error="Rule has no conditions")
+
+    check_index = len(conditions) - 1
+    for index, condition in enumerate(conditions):
+        if (condition.get("logic") or "").upper() == "CHECK":
+            check_index = index
+
+    try:
+        compiled = [compile_condition(condition) for condition in conditions]
+    except RuleCompileError as e:
+        return CompiledRule(rule, error=str(e))
+
+    check = compiled.pop(check_index)
+    return CompiledRule(rule, filters=compiled, check=check)
+
+
+def compile_ruleset(rules):
+    """
+    Compile every rule of a ruleset.
+
+    Args:
+        rules (list): Rule documents, as returned by get_rules_for_ruleset
+
+    Returns:
+        list: CompiledRule for each rule
+    """
+    return [compile_rule(rule) for rule in rules]
+
+
+def evaluate_ruleset(rules, table, max_failing_ids=MAX_FAILING_IDS):
+    """
+    Preview a ruleset against a table of object properties.
+
+    Args:
+        rules (list): Rule documents, or rules from compile_ruleset
+        table (PropertyTable): Object properties
+        max_failing_ids (int): Failing object IDs to return per rule
+
+    Returns:
+        list: A dict per rule with its id, message, severity, error, the
+        number of objects it applies to (matched) and fails (failed), and the
+        IDs of the first failing objects
+    """
+    results = []
+    for rule in rules:
+        compiled = rule if isinstance(rule, CompiledRule) else compile_rule(rule)
+        result = {
+            "id": compiled.rule_id,
+            "message": compiled.message,
+            "severity": compiled.severity,
+            "error": compiled.error,
+            "matched": 0,
+            "failed": 0,
+            "failing_ids": [],
+        }
+        if compiled.error is None:
+            matched, failed = compiled.evaluate(table)
+            result["matched"] = int(np.count_nonzero(matched))
+            result["failed"] = int(np.count_nonzero(failed))
+            if table.ids is not None:
+                failing = np.flatnonzero(failed)[:max_failing_ids]
+                result["failing_ids"] = table.ids[failing].tolist()
+        results.append(result)
+    return results
@@ -0,0 +1,417 @@
+"""
+Columnar table of object properties for evaluating rules.
+
+Each property becomes one typed column over all objects, so a rule condition
+runs as a few NumPy operations over a column instead of a Python loop over
+objects.
+"""
+
+import json
+import math
+import mmap
+import struct
+
+import numpy as np
+
+TRUE_TEXT = {"true", "yes"}
+FALSE_TEXT = {"false", "no"}
+
+TABLE_MAGIC = b"PROPTAB1"
+_TABLE_HEADER = struct.Struct("<8sQ")
+# Arrays in a table file start at multiples of this many bytes
+TABLE_ALIGNMENT = 64
+
+
+def value_text(value):
+    """
+    Text form of a property value, used by the text predicates.
+
+    Whole numbers are written without a decimal point, so 300.0 and "300"
+    compare equal as text.
+
+    Args:
+        value: A scalar property value
+
+    Returns:
+        str: The text
+    """
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return str(value)
+
+
+def parse_number(value):
+    """
+    Parse a property or condition value as a number.
+
+    Returns:
+        float: The number, or NaN if the value is not numeric
+    """
+    if isinstance(value, bool):
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).strip())
+    except ValueError:
+        return math.nan
+
+
+class NumberColumn:
+    """Numeric property stored as float64, with NaN where it is missing."""
+
+    def __init__(self, values):
+        self.values = values
+        self._text = None
+
+    def __len__(self):
+        return len(self.values)
+
+    def present(self):
+        return ~np.isnan(self.values)
+
+    def numbers(self):
+        return self.values
+
+    def text(self):
+        """Dictionary encoding of the values as text: (codes, categories)."""
+        if self._text is None:
+            present = self.present()
+            unique, inverse = np.unique(self.values[present], return_inverse=True)
+            codes = np.full(len(self.values), -1, dtype=np.int32)
+            codes[present] = inverse
+            categories = np.array([value_text(float(v)) for v in unique], dtype=object)
+            self._text = (codes, categories)
+        return self._text
+
+    def truth(self):
+        empty = np.zeros(len(self.values), dtype=bool)
+        return empty, empty
+
+
+class StringColumn:
+    """
+    Text property stored dictionary-encoded: an int32 code per object into
+    the distinct values, with -1 where the property is missing.
+    """
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+        self._numbers = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    def present(self):
+        return self.codes >= 0
+
+    def numbers(self):
+        if self._numbers is None:
+            self._numbers = self.per_category(
+                np.array([parse_number(v) for v in self.categories], dtype=np.float64),
+                missing=np.nan,
+            )
+        return self._numbers
+
+    def text(self):
+        return self.codes, self.categories
+
+    def truth(self):
+        lowered = [v.strip().lower() for v in self.categories]
+        return (
+            self.per_category(np.array([v in TRUE_TEXT for v in lowered], dtype=bool)),
+            self.per_category(np.array([v in FALSE_TEXT for v in lowered], dtype=bool)),
+        )
+
+    def per_category(self, values, missing=False):
+        """
+        Spread one value per category to every object.
+
+        Args:
+            values (np.ndarray): A value for each category
+            missing: Value for objects without the property
+
+        Returns:
+            np.ndarray: A value for each object
+        """
+        # Code -1 indexes the appended value
+        return np.append(values, np.array([missing], dtype=values.dtype))[self.codes]
+
+
+class BoolColumn:
+    """Boolean property, with a mask of the objects that have it."""
+
+    def __init__(self, values, mask):
+        self.values = values
+        self.mask = mask
+
+    def __len__(self):
+        return len(self.values)
+
+    def present(self):
+        return self.mask
+
+    def numbers(self):
+        return np.full(len(self.values), np.nan)
+
+    def text(self):
+        codes = np.where(self.mask, self.values.astype(np.int32), -1)
+        return codes, np.array(["False", "True"], dtype=object)
+
+    def truth(self):
+        return self.mask & self.values, self.mask & ~self.values
+
+
+class PropertyTable:
+    """
+    Properties of a set of objects, one column per property name.
+
+    Columns are found by exact name, or failing that case-insensitively, in
+    constant time.
+    """
+
+    def __init__(self, size, columns, ids=None, id_key=None):
+        self.size = size
+        self.columns = columns
+        self.ids = ids
+        # Property the ids were read from, kept so load() can rebuild them
+        self.id_key = id_key
+        self._lowercase = {}
+        for name in columns:
+            self._lowercase.setdefault(name.lower(), name)
+
+    def __len__(self):
+        return self.size
+
+    def column(self, name):
+        """
+        Get the column of a property.
+
+        Args:
+            name (str): Property name, as written in a rule condition
+
+        Returns:
+            The column, or None if no object has the property
+        """
+        found = self.columns.get(name)
+        if found is None:
+            exact = self._lowercase.get(name.lower())
+            found = self.columns.get(exact) if exact is not None else None
+        return found
+
+    @classmethod
+    def from_records(cls, records, id_key="id"):
+        """
+        Build a table from flat property dicts, one per object.
+
+        A property whose values are all booleans becomes a BoolColumn, one
+        whose values are all numbers a NumberColumn, and any other a
+        StringColumn of the values' text. None and non-scalar values count
+        as missing.
+
+        Args:
+            records (iterable): Dicts of property name to value
+            id_key (str): Property holding the object ID
+
+        Returns:
+            PropertyTable: The table
+        """
+        if not isinstance(records, list):
+            records = list(records)
+
+        # Property names in the order they are first seen
+        names = {}
+        for record in records:
+            names.update(dict.fromkeys(record))
+
+        columns = {}
+        for name in names:
+            column = build_column([record.get(name) for record in records])
+            if column is not None:
+                columns[name] = column
+
+        return cls(len(records), columns, *object_ids(columns, id_key))
+
+    def save(self, path):
+        """
+        Write the table to a file that load() maps back into memory.
+
+        The file is a header, naming each column with the type, offset and
+        length of its arrays, followed by the arrays' raw bytes. Text
+        categories are stored as UTF-8 with their end offsets.
+
+        Args:
+            path (str): File to write
+        """
+        arrays = []
+
+        def add(values):
+            offset = sum(_aligned(a.nbytes) for a in arrays)
+            arrays.append(np.ascontiguousarray(values))
+            return {"dtype": values.dtype.str, "count": len(values), "offset": offset}
+
+        columns = []
+        for name, column in self.columns.items():
+            if isinstance(column, NumberColumn):
+                columns.append(
+                    {"name": name, "type": "number", "values": add(column.values)}
+                )
+            elif isinstance(column, BoolColumn):
+                columns.append(
+                    {
+                        "name": name,
+                        "type": "bool",
+                        "values": add(column.values),
+                        "mask": add(column.mask),
+                    }
+                )
+            else:
+                encoded = [
+                    v.encode("utf-8", "surrogatepass") for v in column.categories
+                ]
+                ends = np.cumsum([len(v) for v in encoded], dtype=np.int64)
+                columns.append(
+                    {
+                        "name": name,
+                        "type": "string",
+                        "codes": add(column.codes),
+                        "ends": add(ends),
+                        "text": add(np.frombuffer(b"".join(encoded), dtype=np.uint8)),
+                    }
+                )
+
+        header = json.dumps(
+            {"size": self.size, "id_key": self.id_key, "columns": columns}
+        ).encode()
+        start = _aligned(_TABLE_HEADER.size + len(header))
+        with open(path, "wb") as f:
+            f.write(_TABLE_HEADER.pack(TABLE_MAGIC, len(header)))
+            f.write(header)
+            f.write(bytes(start - f.tell()))
+            for values in arrays:
+                f.write(values.tobytes())
+                f.write(bytes(_aligned(values.nbytes) - values.nbytes))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Map a file written by save() into memory.
+
+        Numeric, bool and code arrays are read-only views of the file, so
+        they are only paged in as rules read them; text categories are
+        decoded on load.
+
+        Args:
+            path (str): File to read
+
+        Returns:
+            PropertyTable: The table
+        """
+        with open(path, "rb") as f:
+            # The mapping stays valid once the file is closed
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, header_length = _TABLE_HEADER.unpack_from(buffer)
+        if magic != TABLE_MAGIC:
+            raise ValueError(f"Not a property table: {path}")
+        header = json.loads(
+            buffer[_TABLE_HEADER.size : _TABLE_HEADER.size + header_length]
+        )
+        start = _aligned(_TABLE_HEADER.size + header_length)
+
+        def read(spec):
+            return np.frombuffer(
+                buffer,
+                dtype=np.dtype(spec["dtype"]),
+                count=spec["count"],
+                offset=start + spec["offset"],
+            )
+
+        columns = {}
+        for spec in header["columns"]:
+            if spec["type"] == "number":
+                column = NumberColumn(read(spec["values"]))
+            elif spec["type"] == "bool":
+                column = BoolColumn(read(spec["values"]), read(spec["mask"]))
+            else:
+                text = read(spec["text"]).tobytes()
+                ends = read(spec["ends"]).tolist()
+                categories = np.array(
+                    [
+                        text[begin:end].decode("utf-8", "surrogatepass")
+                        for begin, end in zip([0] + ends, ends)
+                    ],
+                    dtype=object,
+                )
+                column = StringColumn(read(spec["codes"]), categories)
+            columns[spec["name"]] = column
+        return cls(header["size"], columns, *object_ids(columns, header["id_key"]))
+
+
+def _aligned(size):
+    return -(-size // TABLE_ALIGNMENT) * TABLE_ALIGNMENT
+
+
+def object_ids(columns, id_key):
+    """
+    Read the object IDs from a table's columns.
+
+    Returns:
+        tuple: (ids, id_key), an array of the ID of each object (None where
+        it has none) and the property it came from, or (None, None) if
+        id_key is not a text property
+    """
+    if not isinstance(columns.get(id_key), StringColumn):
+        return None, None
+    codes, categories = columns[id_key].text()
+    return np.append(categories, None)[codes], id_key
+
+
+def build_column(values):
+    """
+    Build the column of one property.
+
+    Args:
+        values (list): The property's value for each object, None if missing
+
+    Returns:
+        The column, or None if no object has a scalar value
+    """
+    types = set(map(type, values))
+    types.discard(type(None))
+    if any(issubclass(t, (dict, list, tuple)) for t in types):
+        values = [None if isinstance(v, (dict, list, tuple)) else v for v in values]
+        types = {t for t in types if not issubclass(t, (dict, list, tuple))}
+    if not types:
+        return None
+
+    size = len(values)
+    if all(issubclass(t, (bool, np.bool_)) for t in types):
+        mask = np.fromiter((v is not None for v in values), dtype=bool, count=size)
+        data = np.fromiter((bool(v) for v in values), dtype=bool, count=size)
+        return BoolColumn(data, mask)
+
+    if all(
+        issubclass(t, (int, float, np.number)) and not issubclass(t, bool)
+        for t in types
+    ):
+        # None becomes NaN
+        return NumberColumn(np.array(values, dtype=np.float64))
+
+    # NaN is missing here too, as it is in number columns
+    categories = {}
+    codes = np.fromiter(
+        (
+            (
+                -1
+                if v is None or v != v
+                else categories.setdefault(
+                    v if type(v) is str else value_text(v), len(categories)
+                )
+            )
+            for v in values
+        ),
+        dtype=np.int32,
+        count=size,
+    )
+    return StringColumn(codes, np.array(list(categories), dtype=object))
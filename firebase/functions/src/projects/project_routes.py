@@ -1,8 +1,8 @@
 from firebase_functions import https_fn
-from google.cloud import firestore
 
+from ..utils.fanout import submit
 from ..utils.firestore_utils import (
-    get_rules_for_ruleset,
+    get_rules_for_rulesets,
     get_rulesets_for_project,
     get_speckle_token_for_user,
     safe_verify_id_token,
@@ -10,8 +10,6 @@ from ..utils.firestore_utils import (
 from ..utils.jinja_env import render_template
 from ..utils.speckle_api import get_project_details, get_user_projects
 
-db = firestore.Client()
-
 
 def get_user_projects_view(request):
     """Return HTML for the user's Speckle projects."""
@@ -85,7 +83,7 @@ def get_location(request):
     return f"https://{project_id}.web.app"
 
 
-def get_project_with_rulesets(request):
+def get_project_with_rulesets(request, project_id):
     """Return HTML for a project with its rulesets."""
 
     auth_header = request.headers.get("Authorization")
@@ -98,13 +96,6 @@ def get_project_with_rulesets(request):
 
     id_token = auth_header.split("Bearer ")[1]
 
-    # Extract project_id from path or query parameters
-    project_id = None
-    if "/projects/" in request.path:
-        project_id = request.path.split("/projects/")[1].split("/")[0]
-    else:
-        project_id = request.args.get("projectId")
-
     if not project_id:
         return https_fn.Response(
             render_template("error.html", message="Missing project ID"),
@@ -128,19 +119,15 @@ def get_project_with_rulesets(request):
                 mimetype="text/html",
             )
 
-        # Fetch rulesets for this project
-        rulesets = get_rulesets_for_project(user_id, project_id)
+        # Fetch minimal project details from Speckle while the rulesets and
+        # their rules load from Firestore
+        project_future = submit(get_project_details, speckle_token, project_id)
 
-        # Fetch minimal project details
-        project = get_project_details(speckle_token, project_id)
-
-        def custom_serializer(obj):
-            if hasattr(obj, "isoformat"):
-                return obj.isoformat()
-            return str(obj)  # fallback
+        rulesets = get_rulesets_for_project(user_id, project_id)
+        for ruleset, rules in zip(rulesets, get_rules_for_rulesets(rulesets)):
+            ruleset["rules"] = rules
 
-        for ruleset in rulesets:
-            ruleset["rules"] = get_rules_for_ruleset(ruleset["id"])
+        project = project_future.result()
 
         location_origin = get_location(request)
 
@@ -162,12 +149,10 @@ def get_project_with_rulesets(request):
         )
 
 
-def get_new_ruleset_form(request):
+def get_new_ruleset_form(request, project_id=None):
     """Return HTML for creating a new ruleset."""
     try:
-        # Get project ID from query string
-        project_id = request.args.get("projectId")
-
+        # The router passes project_id from the projectId query parameter
         if not project_id:
             return https_fn.Response(
                 render_template("error.html", message="Missing project ID"),
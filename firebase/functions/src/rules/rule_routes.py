@@ -9,6 +9,7 @@ from ..utils.firestore_utils import (
     get_rule,
     get_rules_for_ruleset,
     get_ruleset,
+    publish_ruleset_tsv,
     safe_verify_id_token,
     update_single_rule,
 )
@@ -16,6 +17,61 @@ from ..utils.jinja_env import render_template
 from ..utils.mapping import get_canonical_predicate
 
 
+def _canonicalize_predicates(rules):
+    """Convert any symbolic storage predicates to canonical forms for display."""
+    for rule in rules:
+        for condition in rule.get("conditions", []):
+            if "predicate" in condition:
+                stored_predicate = condition["predicate"]
+                canonical_predicate = get_canonical_predicate(stored_predicate)
+                condition["predicate"] = canonical_predicate
+
+
+def _wants_rule_fragments(request):
+    """Whether the client asked for out-of-band row updates with ?swap=oob."""
+    return request.args.get("swap") == "oob"
+
+
+def _rule_fragments_response(
+    ruleset, ruleset_id, rules, row_fragments=(), index_cells=(), replace_list=False
+):
+    """Render only the rows and "Rule #" cells changed by one rule mutation.
+
+    Each row fragment is a dict with the rule, its 1-based index and the
+    hx-swap-oob value to apply ("true", "delete" or "<position>:<selector>").
+    """
+    # Row fragments refer to entries of rules, so this converts them too
+    _canonicalize_predicates(rules)
+
+    return https_fn.Response(
+        render_template(
+            "rule_fragments.html",
+            ruleset=ruleset,
+            ruleset_id=ruleset_id,
+            rules=rules,
+            row_fragments=row_fragments,
+            index_cells=index_cells,
+            replace_list=replace_list,
+        ),
+        mimetype="text/html",
+    )
+
+
+def _rules_list_response(ruleset, ruleset_id, rules):
+    """Render the rules list for a ruleset the caller has already authorised."""
+    _canonicalize_predicates(rules)
+
+    return https_fn.Response(
+        render_template(
+            "rules_list.html",
+            ruleset=ruleset,
+            ruleset_id=ruleset_id,
+            rules=rules,
+        ),
+        mimetype="text/html",
+    )
+
+
 def get_rules(request, ruleset_id):
     """Return HTML for all rules in a ruleset."""
     try:
@@ -54,26 +110,10 @@ def get_rules(request, ruleset_id):
             )
 
         # Get rules from the subcollection
-        rules = get_rules_for_ruleset(ruleset_id)
-
-        # Convert any symbolic storage predicates to canonical forms for display
-        for rule in rules:
-            for condition in rule.get("conditions", []):
-                if "predicate" in condition:
-                    stored_predicate = condition["predicate"]
-                    canonical_predicate = get_canonical_predicate(stored_predicate)
-                    condition["predicate"] = canonical_predicate
+        rules = get_rules_for_ruleset(ruleset_id, version=ruleset.get("rulesVersion"))
 
         # Return the rules list
-        return https_fn.Response(
-            render_template(
-                "rules_list.html",
-                ruleset=ruleset,
-                ruleset_id=ruleset_id,
-                rules=rules,
-            ),
-            mimetype="text/html",
-        )
+        return _rules_list_response(ruleset, ruleset_id, rules)
 
     except Exception as e:
         import traceback
@@ -349,12 +389,30 @@ def create_rule_handler(request, ruleset_id):
         }
 
         # Create rule in Firestore
-        created_rule = create_rule(ruleset_id, user_id, rule_data)
+        created_rule, rules_version = create_rule(ruleset_id, user_id, rule_data)
 
         print(f"Created rule with data: {created_rule}")
 
-        # Return updated rules list
-        return get_rules(request, ruleset_id)
+        # Return updated rules list. The ruleset is already loaded and verified,
+        # and the list is usually still cached at the new version
+        rules = get_rules_for_ruleset(ruleset_id, version=rules_version)
+        publish_ruleset_tsv(ruleset, rules, rules_version)
+        if _wants_rule_fragments(request):
+            return _rule_fragments_response(
+                ruleset,
+                ruleset_id,
+                rules,
+                row_fragments=[
+                    {
+                        "rule": rules[-1],
+                        "index": len(rules),
+                        "swap": "beforeend:#rules-tbody",
+                    }
+                ],
+                # The first rule replaces the empty-list message
+                replace_list=len(rules) == 1,
+            )
+        return _rules_list_response(ruleset, ruleset_id, rules)
 
     except Exception as e:
         import traceback
@@ -454,9 +512,11 @@ def update_rule_handler(request, ruleset_id, rule_id):
                 status=403,
             )
 
-        # Verify rule exists
-        rule = get_rule(ruleset_id, rule_id)
-        if not rule:
+        # Verify rule exists. The list is loaded before the write, while a
+        # cached copy is still current, and the edit is applied to it after
+        rules = get_rules_for_ruleset(ruleset_id, version=ruleset.get("rulesVersion"))
+        index = next((i for i, rule in enumerate(rules) if rule["id"] == rule_id), None)
+        if index is None:
             return https_fn.Response(
                 render_template("error.html", message="Rule not found"),
                 mimetype="text/html",
@@ -473,9 +533,30 @@ def update_rule_handler(request, ruleset_id, rule_id):
 
         # Update rule in Firestore
         update_single_rule(ruleset_id, rule_id, rule_data)
+        rules[index].update(
+            {
+                key: value
+                for key, value in rule_data.items()
+                if value is not firestore.SERVER_TIMESTAMP
+            }
+        )
 
-        # Return updated rules list
-        return get_rules(request, ruleset_id)
+        # Refresh the TSV export from the edited list. The write bumped
+        # rulesVersion by one; if another write got in between, the version
+        # will not match and the export is regenerated when next fetched
+        publish_ruleset_tsv(ruleset, rules, ruleset.get("rulesVersion", 0) + 1)
+
+        # Return the updated row, or the updated rules list
+        if _wants_rule_fragments(request):
+            return _rule_fragments_response(
+                ruleset,
+                ruleset_id,
+                rules,
+                row_fragments=[
+                    {"rule": rules[index], "index": index + 1, "swap": "true"}
+                ],
+            )
+        return _rules_list_response(ruleset, ruleset_id, rules)
 
     except Exception as e:
         import traceback
@@ -527,9 +608,10 @@ def delete_rule_handler(request, ruleset_id, rule_id):
                 status=403,
             )
 
-        # Verify rule exists
-        rule = get_rule(ruleset_id, rule_id)
-        if not rule:
+        # Verify rule exists, using the cached list while it is current
+        rules = get_rules_for_ruleset(ruleset_id, version=ruleset.get("rulesVersion"))
+        index = next((i for i, rule in enumerate(rules) if rule["id"] == rule_id), None)
+        if index is None:
             return https_fn.Response(
                 render_template("error.html", message="Rule not found"),
                 mimetype="text/html",
@@ -538,9 +620,24 @@ def delete_rule_handler(request, ruleset_id, rule_id):
 
         # Delete rule from Firestore
         delete_single_rule(ruleset_id, rule_id)
-
-        # Return updated rules list
-        return get_rules(request, ruleset_id)
+        rules.pop(index)
+        publish_ruleset_tsv(ruleset, rules, ruleset.get("rulesVersion", 0) + 1)
+
+        # Remove the row and renumber the rules after it, or return the
+        # updated rules list
+        if _wants_rule_fragments(request):
+            return _rule_fragments_response(
+                ruleset,
+                ruleset_id,
+                rules,
+                row_fragments=[{"rule": {"id": rule_id}, "swap": "delete"}],
+                index_cells=[
+                    {"rule": rule, "index": i + 1}
+                    for i, rule in enumerate(rules[index:], index)
+                ],
+                replace_list=not rules,
+            )
+        return _rules_list_response(ruleset, ruleset_id, rules)
 
     except Exception as e:
         return https_fn.Response(
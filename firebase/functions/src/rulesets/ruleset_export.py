@@ -1,11 +1,43 @@
+import os
+
 from firebase_functions import https_fn
 
 from ..utils.firestore_utils import (
+    current_tsv_etag,
     get_ruleset,
-    get_rules_for_ruleset,
+    get_ruleset_tsv,
     safe_verify_id_token,
 )
-from ..utils.tsv_utils import generate_ruleset_tsv
+from ..utils.tsv_utils import tsv_filename
+
+# Seconds automation clients may reuse a fetched TSV before revalidating it
+TSV_CACHE_MAX_AGE = int(os.environ.get("TSV_CACHE_MAX_AGE", "60"))
+
+
+def ruleset_tsv_response(request, ruleset):
+    """
+    Serve a ruleset's materialized TSV with ETag and Cache-Control headers.
+
+    A request whose If-None-Match still matches gets an empty 304 without the
+    rules or the stored TSV being read.
+    """
+    etag = current_tsv_etag(ruleset)
+    if etag and request.if_none_match.contains_weak(etag):
+        response = https_fn.Response(status=304)
+    else:
+        tsv_content, etag = get_ruleset_tsv(ruleset)
+        response = https_fn.Response(
+            tsv_content,
+            mimetype="text/tab-separated-values",
+            headers={
+                "Content-Disposition": f'attachment; filename="{tsv_filename(ruleset)}"'
+            },
+        )
+
+    response.set_etag(etag)
+    visibility = "public" if ruleset.get("isShared", False) else "private"
+    response.headers["Cache-Control"] = f"{visibility}, max-age={TSV_CACHE_MAX_AGE}"
+    return response
 
 
 def export_ruleset_as_tsv(request, ruleset_id):
@@ -46,18 +78,8 @@ def export_ruleset_as_tsv(request, ruleset_id):
                 status=403,
             )
 
-        # Get rules
-        rules = get_rules_for_ruleset(ruleset_id)
-
-        # Generate TSV content using the shared utility
-        tsv_content, filename = generate_ruleset_tsv(ruleset, rules)
-
-        # Set headers for file download
-        return https_fn.Response(
-            tsv_content,
-            mimetype="text/tab-separated-values",
-            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
-        )
+        # Serve the stored TSV, or 304 if the client already has it
+        return ruleset_tsv_response(request, ruleset)
 
     except Exception as e:
         import traceback
@@ -117,6 +117,13 @@ def create_new_ruleset(request):
 def update_ruleset_info(request, ruleset_id):
     """Update a ruleset's basic information."""
     try:
+        if not ruleset_id:
+            return https_fn.Response(
+                render_template("error.html", message="Missing ruleset ID"),
+                mimetype="text/html",
+                status=400,
+            )
+
         # Get form data
         form_data = request.form
         name = form_data.get("name")
@@ -189,7 +196,8 @@ def delete_ruleset_handler(request, ruleset_id):
             )
 
         id_token = auth_header.split("Bearer ")[1]
-        decoded_token = safe_verify_id_token(id_token)
+        # Deleting cannot be undone, so do not accept a revoked token
+        decoded_token = safe_verify_id_token(id_token, check_revoked=True)
         user_id = decoded_token["uid"]
 
         # Get current ruleset to verify ownership and get project ID
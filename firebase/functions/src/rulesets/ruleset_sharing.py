@@ -2,7 +2,6 @@ from firebase_functions import https_fn
 import csv
 from io import StringIO
 
-from ..projects.project_routes import get_location
 from ..utils.firestore_utils import (
     get_rules_for_ruleset,
     get_ruleset,
@@ -10,7 +9,7 @@ from ..utils.firestore_utils import (
     toggle_ruleset_sharing,
 )
 from ..utils.jinja_env import render_template
-from ..utils.tsv_utils import generate_ruleset_tsv
+from .ruleset_export import ruleset_tsv_response
 
 
 def get_share_dialog(request, ruleset_id):
@@ -50,6 +49,10 @@ def get_share_dialog(request, ruleset_id):
                 status=403,
             )
 
+        # Deferred: project_routes pulls in the Speckle API client, which the
+        # shared TSV route in this module does not need
+        from ..projects.project_routes import get_location
+
         location_origin = get_location(request)
 
         # Return the dialog
@@ -159,18 +162,15 @@ def get_shared_ruleset_view(request, ruleset_id):
                 status=403,
             )
 
-        # Get the rules
-        rules = get_rules_for_ruleset(ruleset_id)
-
-        # Try using the shared utility first
+        # Serve the stored TSV first, or 304 if the client already has it
         try:
-            # Generate TSV content using the shared utility
-            tsv_content, filename = generate_ruleset_tsv(ruleset, rules)
+            return ruleset_tsv_response(request, ruleset)
         except Exception as util_error:
             print(
                 f"Shared utility error: {util_error}. Falling back to inline generation."
             )
             # Fall back to inline generation if the utility fails
+            rules = get_rules_for_ruleset(ruleset_id)
             tsv_content, filename = _generate_tsv_inline(ruleset, rules)
 
         # Return TSV file directly - this is important for automation
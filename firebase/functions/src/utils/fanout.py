@@ -0,0 +1,76 @@
+"""
+Shared thread pool for running independent Firestore and Speckle calls at once.
+
+Both clients block on network round trips, so a page that needs several of
+them waits for the slowest one instead of their sum.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Firestore requests share one gRPC channel and Speckle requests a pooled
+# session, so the limit only bounds in-flight round trips per instance
+MAX_WORKERS = 32
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Get the process-wide thread pool, creating it on first use.
+
+    Returns:
+        ThreadPoolExecutor: The pool
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=MAX_WORKERS, thread_name_prefix="fanout"
+                )
+    return _executor
+
+
+def submit(func, *args, **kwargs):
+    """
+    Start a call in the pool.
+
+    Returns:
+        concurrent.futures.Future: Its result() returns the call's result or
+        raises its exception
+    """
+    return get_executor().submit(func, *args, **kwargs)
+
+
+def map_concurrently(func, items):
+    """
+    Call func on every item concurrently.
+
+    Calls must not wait on other calls in the pool, or a full pool could
+    deadlock.
+
+    Args:
+        func (callable): Called with each item
+        items (iterable): Arguments
+
+    Returns:
+        list: Results in the order of items. The first exception raised by a
+        call is raised once every call has finished
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [func(item) for item in items]
+
+    futures = [submit(func, item) for item in items]
+    results = []
+    error = None
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            error = error or e
+    if error is not None:
+        raise error
+    return results
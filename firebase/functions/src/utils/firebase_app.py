@@ -0,0 +1,89 @@
+"""
+Shared Firebase Admin app and Firestore client, created on first use.
+
+Nothing here runs at import time, so a cold start only pays for the clients
+its request actually needs, and every module shares one Firestore client.
+"""
+
+import json
+import os
+import threading
+
+import firebase_admin
+
+SECRET_NAME = "projects/speckle-model-checker/secrets/firebase-service-account-key/versions/latest"
+
+_lock = threading.Lock()
+_db = None
+
+
+def _has_local_credentials():
+    """True in the emulator, or when a service account key file is configured."""
+    return os.environ.get("FUNCTIONS_EMULATOR") == "true" or bool(
+        os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
+    )
+
+
+def load_firebase_cred_with_fallback():
+    """
+    Load the Firebase service account from Secret Manager.
+
+    Returns:
+        credentials.Certificate: The service account credentials, or None to
+        fall back to Application Default Credentials
+    """
+    from firebase_admin import credentials
+    from google.api_core.exceptions import GoogleAPICallError
+    from google.cloud import secretmanager
+
+    try:
+        client = secretmanager.SecretManagerServiceClient()
+        response = client.access_secret_version(name=SECRET_NAME)
+        secret_payload = response.payload.data.decode("UTF-8")
+        cred_info = json.loads(secret_payload)
+        print("Loaded Firebase credentials from Secret Manager.")
+        return credentials.Certificate(cred_info)
+    except GoogleAPICallError as e:
+        print(f"Could not load secret (probably emulator or no permission): {e}")
+        print("Falling back to ADC / default credentials.")
+        return None  # Will trigger default ADC fallback
+
+
+def ensure_firebase_app():
+    """
+    Initialize the default Firebase Admin app if it is not yet initialized.
+
+    The emulator and configured key files use Application Default Credentials
+    directly. Otherwise the service account is read from Secret Manager, since
+    signing custom tokens with ADC alone needs extra IAM permissions.
+    """
+    if firebase_admin._apps:
+        return
+
+    with _lock:
+        if firebase_admin._apps:
+            return
+        cred = None
+        if not _has_local_credentials():
+            cred = load_firebase_cred_with_fallback()
+        if cred:
+            firebase_admin.initialize_app(cred)
+        else:
+            firebase_admin.initialize_app()  # Use ADC or environment creds
+
+
+def get_db():
+    """
+    Get the shared Firestore client, creating it on first use.
+
+    Returns:
+        firestore.Client: The client
+    """
+    global _db
+    if _db is None:
+        with _lock:
+            if _db is None:
+                from google.cloud import firestore
+
+                _db = firestore.Client()
+    return _db
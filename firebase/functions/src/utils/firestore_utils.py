@@ -1,14 +1,51 @@
-import datetime
+import copy
+import hashlib
 import json
+import threading
+import time
 import traceback
 from functools import wraps
 
+from cachetools import LRUCache, TLRUCache
 from firebase_admin import auth
 from firebase_functions import https_fn
 from google.cloud import firestore
 
-# Verify challenge exists and hasn't been used
-db = firestore.Client()
+from .fanout import map_concurrently
+from .firebase_app import ensure_firebase_app, get_db
+from .tsv_utils import generate_ruleset_tsv, tsv_etag
+
+# Rules lists keyed by ruleset ID, stored with the ruleset's rulesVersion so a
+# warm instance can serve them without a query while the version still matches
+_rules_cache = LRUCache(maxsize=256)
+# Rules of several rulesets are loaded from worker threads at once
+_rules_cache_lock = threading.Lock()
+
+# Materialized TSV exports keyed by ETag. The content behind an ETag never
+# changes, so entries never go stale; the cache is bounded by total characters
+_tsv_cache = LRUCache(maxsize=32 * 1024 * 1024, getsizeof=len)
+
+# Decoded ID tokens are reused until the token expires, but for at most this
+# many seconds, which bounds how long a revoked token is still accepted
+ID_TOKEN_CACHE_SECONDS = 300
+
+# Seconds of difference tolerated between this instance's clock and the
+# clock that issued a token, e.g. for a token used the moment it was minted
+CLOCK_SKEW_SECONDS = 10
+
+
+def _id_token_expiry(token_digest, claims, now):
+    return min(claims["exp"], now + ID_TOKEN_CACHE_SECONDS)
+
+
+# Decoded ID token claims keyed by a digest of the token, so the HTMX requests
+# of a session skip signature verification after the first one. Expiry uses
+# wall-clock time to compare with the token's exp claim
+_id_token_cache = TLRUCache(maxsize=1024, ttu=_id_token_expiry, timer=time.time)
+_id_token_lock = threading.Lock()
+
+# Firestore rejects batches with more than 500 writes
+MAX_BATCH_SIZE = 500
 
 
 def get_rulesets_for_project(user_id, project_id):
@@ -23,7 +60,7 @@ def get_rulesets_for_project(user_id, project_id):
         list: List of ruleset documents
     """
 
-    rulesets = fetch_rulesets(db, user_id, project_id)
+    rulesets = fetch_rulesets(get_db(), user_id, project_id)
 
     return rulesets
 
@@ -91,13 +128,15 @@ def create_ruleset(user_id, project_id, name, description=""):
         "userId": user_id,
         "projectId": project_id,
         "rules": [],
+        "maxOrder": -1,
+        "rulesVersion": 0,
         "isShared": False,
         "createdAt": firestore.SERVER_TIMESTAMP,
         "updatedAt": firestore.SERVER_TIMESTAMP,
     }
 
     # Add to Firestore
-    timestamp, ruleset_ref = db.collection("ruleSets").add(ruleset)
+    timestamp, ruleset_ref = get_db().collection("ruleSets").add(ruleset)
 
     # Get the created document
     ruleset_doc = ruleset_ref.get()
@@ -113,15 +152,33 @@ def create_ruleset(user_id, project_id, name, description=""):
     return result
 
 
-def safe_verify_id_token(id_token):
-    try:
-        return auth.verify_id_token(id_token)
-    except Exception as e:
-        if "Token used too early" in str(e):
-            datetime.sleep(1)  # wait 1 second and retry
-            return auth.verify_id_token(id_token)
-        else:
-            raise e
+def safe_verify_id_token(id_token, check_revoked=False):
+    """
+    Verify a Firebase ID token, reusing the claims of recently verified tokens.
+
+    Args:
+        id_token (str): Firebase ID token
+        check_revoked (bool): Also check that the token has not been revoked.
+            This always verifies the token and queries Firebase Auth, so use it
+            for sensitive operations only
+
+    Returns:
+        dict: Decoded token claims
+    """
+    token_digest = hashlib.sha256(id_token.encode("utf-8")).hexdigest()
+    if not check_revoked:
+        with _id_token_lock:
+            claims = _id_token_cache.get(token_digest)
+        if claims is not None:
+            return claims
+
+    ensure_firebase_app()
+    claims = auth.verify_id_token(
+        id_token, check_revoked=check_revoked, clock_skew_seconds=CLOCK_SKEW_SECONDS
+    )
+    with _id_token_lock:
+        _id_token_cache[token_digest] = claims
+    return claims
 
 
 def get_ruleset(ruleset_id):
@@ -136,7 +193,7 @@ def get_ruleset(ruleset_id):
     """
 
     # Get the document
-    ruleset_doc = db.collection("ruleSets").document(ruleset_id).get()
+    ruleset_doc = get_db().collection("ruleSets").document(ruleset_id).get()
 
     if not ruleset_doc.exists:
         return None
@@ -169,14 +226,53 @@ def update_ruleset(ruleset_id, data):
     update_data["updatedAt"] = firestore.SERVER_TIMESTAMP
 
     # Update document
-    db.collection("ruleSets").document(ruleset_id).update(update_data)
+    get_db().collection("ruleSets").document(ruleset_id).update(update_data)
 
     return True
 
 
+def delete_collection(collection_ref, batch_size=MAX_BATCH_SIZE):
+    """
+    Delete every document in a collection with batched writes.
+
+    Documents are listed a page at a time by reference only, without reading
+    their data, and each page is deleted in one batch.
+
+    Args:
+        collection_ref: Collection to empty
+        batch_size (int, optional): Documents per page and per batch
+
+    Returns:
+        int: Number of documents deleted
+    """
+
+    deleted = 0
+    batch = get_db().batch()
+    pending = 0
+
+    for doc_ref in collection_ref.list_documents(page_size=batch_size):
+        batch.delete(doc_ref)
+        pending += 1
+        deleted += 1
+
+        if pending == batch_size:
+            batch.commit()
+            batch = get_db().batch()
+            pending = 0
+
+    if pending:
+        batch.commit()
+
+    return deleted
+
+
 def delete_ruleset(ruleset_id):
     """
-    Delete a ruleset.
+    Delete a ruleset and its rules subcollection.
+
+    The ruleset document goes first so it disappears from listings at once.
+    Rules left behind if the function stops part way are removed by
+    delete_orphaned_rules.
 
     Args:
         ruleset_id (str): Ruleset ID
@@ -185,12 +281,41 @@ def delete_ruleset(ruleset_id):
         bool: Success status
     """
 
-    # Delete document
-    db.collection("ruleSets").document(ruleset_id).delete()
+    ruleset_ref = get_db().collection("ruleSets").document(ruleset_id)
+
+    # Delete document and its TSV export, then its rules
+    batch = get_db().batch()
+    batch.delete(ruleset_ref)
+    batch.delete(_tsv_export_ref(ruleset_id))
+    batch.commit()
+    with _rules_cache_lock:
+        _rules_cache.pop(ruleset_id, None)
+    delete_collection(ruleset_ref.collection("rules"))
 
     return True
 
 
+def delete_orphaned_rules():
+    """
+    Delete rules whose ruleset no longer exists.
+
+    Rulesets deleted before their rules were removed along with them still
+    appear in list_documents, as missing documents with a rules subcollection.
+
+    Returns:
+        int: Number of rules deleted
+    """
+
+    ruleset_refs = list(get_db().collection("ruleSets").list_documents())
+
+    deleted = 0
+    for snapshot in get_db().get_all(ruleset_refs):
+        if not snapshot.exists:
+            deleted += delete_collection(snapshot.reference.collection("rules"))
+
+    return deleted
+
+
 def toggle_ruleset_sharing(ruleset_id):
     """
     Toggle sharing status for a ruleset.
@@ -203,7 +328,7 @@ def toggle_ruleset_sharing(ruleset_id):
     """
 
     # Get current status
-    ruleset_doc = db.collection("ruleSets").document(ruleset_id).get()
+    ruleset_doc = get_db().collection("ruleSets").document(ruleset_id).get()
     if not ruleset_doc.exists:
         return False
 
@@ -221,7 +346,7 @@ def toggle_ruleset_sharing(ruleset_id):
         update_data["sharedAt"] = firestore.SERVER_TIMESTAMP
 
     # Update document
-    db.collection("ruleSets").document(ruleset_id).update(update_data)
+    get_db().collection("ruleSets").document(ruleset_id).update(update_data)
 
     return is_shared
 
@@ -242,19 +367,28 @@ def get_shared_ruleset(ruleset_id):
     return rules
 
 
-def get_rules_for_ruleset(ruleset_id):
+def get_rules_for_ruleset(ruleset_id, version=None):
     """
     Get all rules for a ruleset from the subcollection.
 
     Args:
         ruleset_id (str): Ruleset ID
+        version (int, optional): The ruleset's current rulesVersion. When given,
+            a cached list for that version is returned instead of querying
 
     Returns:
         list: List of rule documents with IDs
     """
 
+    if version is not None:
+        with _rules_cache_lock:
+            cached = _rules_cache.get(ruleset_id)
+        if cached is not None and cached[0] == version:
+            return copy.deepcopy(cached[1])
+
     rules_ref = (
-        db.collection("ruleSets")
+        get_db()
+        .collection("ruleSets")
         .document(ruleset_id)
         .collection("rules")
         .order_by("order")
@@ -267,9 +401,134 @@ def get_rules_for_ruleset(ruleset_id):
         rule["id"] = doc.id  # Add the document ID
         rules.append(rule)
 
+    if version is not None:
+        with _rules_cache_lock:
+            _rules_cache[ruleset_id] = (version, copy.deepcopy(rules))
+
     return rules
 
 
+def get_rules_for_rulesets(rulesets):
+    """
+    Get the rules of several rulesets, querying them concurrently.
+
+    Args:
+        rulesets (list): Ruleset documents with IDs and rulesVersion
+
+    Returns:
+        list: The rules of each ruleset, in the order of rulesets
+    """
+    return map_concurrently(
+        lambda ruleset: get_rules_for_ruleset(
+            ruleset["id"], version=ruleset.get("rulesVersion")
+        ),
+        rulesets,
+    )
+
+
+def _rules_changed(ruleset_id, batch):
+    """Bump the ruleset's rulesVersion in a batch and drop its cached rules."""
+    batch.update(
+        get_db().collection("ruleSets").document(ruleset_id),
+        {
+            "rulesVersion": firestore.Increment(1),
+            "updatedAt": firestore.SERVER_TIMESTAMP,
+        },
+    )
+    with _rules_cache_lock:
+        _rules_cache.pop(ruleset_id, None)
+
+
+def _tsv_export_ref(ruleset_id):
+    return (
+        get_db()
+        .collection("ruleSets")
+        .document(ruleset_id)
+        .collection("exports")
+        .document("tsv")
+    )
+
+
+def current_tsv_etag(ruleset):
+    """
+    ETag of a ruleset's materialized TSV, if it is still current.
+
+    Args:
+        ruleset (dict): Ruleset document
+
+    Returns:
+        str: The ETag, or None if the rules changed since the TSV was made
+    """
+
+    if ruleset.get("tsvVersion") != ruleset.get("rulesVersion", 0):
+        return None
+    return ruleset.get("tsvEtag")
+
+
+def publish_ruleset_tsv(ruleset, rules, version):
+    """
+    Materialize a ruleset's TSV and record its ETag on the ruleset.
+
+    The content is stored with its ETag in the ruleset's exports/tsv document.
+    The ruleset's tsvEtag and tsvVersion fields are written in the same batch
+    and record the rulesVersion the TSV was generated from, so a TSV made from
+    an outdated rules list is never served as current.
+
+    Args:
+        ruleset (dict): Ruleset document with ID
+        rules (list): The ruleset's rules in order
+        version (int): The rulesVersion the rules were read at
+
+    Returns:
+        tuple: (tsv_content, etag)
+    """
+
+    tsv_content, _ = generate_ruleset_tsv(ruleset, rules)
+    etag = tsv_etag(tsv_content)
+    _tsv_cache[etag] = tsv_content
+
+    batch = get_db().batch()
+    batch.set(_tsv_export_ref(ruleset["id"]), {"etag": etag, "content": tsv_content})
+    batch.update(
+        get_db().collection("ruleSets").document(ruleset["id"]),
+        {"tsvEtag": etag, "tsvVersion": version},
+    )
+    try:
+        batch.commit()
+    except Exception as e:
+        # e.g. a TSV over the 1 MiB document limit; it is regenerated per fetch
+        print(f"Could not store TSV for ruleset {ruleset['id']}: {e}")
+
+    return tsv_content, etag
+
+
+def get_ruleset_tsv(ruleset):
+    """
+    Get a ruleset's TSV, materializing it if the rules changed since.
+
+    Args:
+        ruleset (dict): Ruleset document with ID
+
+    Returns:
+        tuple: (tsv_content, etag)
+    """
+
+    etag = current_tsv_etag(ruleset)
+    if etag:
+        tsv_content = _tsv_cache.get(etag)
+        if tsv_content is None:
+            export_doc = _tsv_export_ref(ruleset["id"]).get()
+            if export_doc.exists and export_doc.get("etag") == etag:
+                tsv_content = export_doc.get("content")
+                _tsv_cache[etag] = tsv_content
+        if tsv_content is not None:
+            return tsv_content, etag
+
+    version = ruleset.get("rulesVersion", 0)
+    rules = get_rules_for_ruleset(ruleset["id"], version=version)
+    return publish_ruleset_tsv(ruleset, rules, version)
+
+
 def create_rule(ruleset_id, user_id, rule_data):
     """
     Create a new rule in a ruleset.
@@ -280,38 +539,77 @@ def create_rule(ruleset_id, user_id, rule_data):
         rule_data (dict): Rule data including message, severity, and conditions
 
     Returns:
-        dict: Created rule with ID
+        tuple: (created rule with ID, the ruleset's new rulesVersion)
     """
 
-    # Get current rule count for ordering
-    existing_rules = get_rules_for_ruleset(ruleset_id)
-
-    # Prepare rule document
-    new_rule = {
-        "message": rule_data.get("message"),
-        "severity": rule_data.get("severity"),
-        "conditions": rule_data.get("conditions", []),
-        "rulesetId": ruleset_id,
-        "userId": user_id,
-        "createdAt": firestore.SERVER_TIMESTAMP,
-        "updatedAt": firestore.SERVER_TIMESTAMP,
-        "order": len(existing_rules),  # Set order for sorting
-    }
+    ruleset_ref = get_db().collection("ruleSets").document(ruleset_id)
+    rule_ref = ruleset_ref.collection("rules").document()
+
+    @firestore.transactional
+    def _append(transaction):
+        ruleset = ruleset_ref.get(transaction=transaction).to_dict() or {}
+
+        # Append after the current last rule. Rulesets created before maxOrder
+        # was tracked look up their last rule once; deletes leave gaps in the
+        # order values, so the rule count could collide with an existing one
+        max_order = ruleset.get("maxOrder")
+        if max_order is None:
+            last = (
+                ruleset_ref.collection("rules")
+                .order_by("order", direction=firestore.Query.DESCENDING)
+                .limit(1)
+                .get(transaction=transaction)
+            )
+            max_order = last[0].to_dict()["order"] if last else -1
+        next_order = max_order + 1
+
+        # Prepare rule document
+        new_rule = {
+            "message": rule_data.get("message"),
+            "severity": rule_data.get("severity"),
+            "conditions": rule_data.get("conditions", []),
+            "rulesetId": ruleset_id,
+            "userId": user_id,
+            "createdAt": firestore.SERVER_TIMESTAMP,
+            "updatedAt": firestore.SERVER_TIMESTAMP,
+            "order": next_order,  # Set order for sorting
+        }
+
+        transaction.set(rule_ref, new_rule)
+        transaction.update(
+            ruleset_ref,
+            {
+                "maxOrder": next_order,
+                "rulesVersion": firestore.Increment(1),
+                "updatedAt": firestore.SERVER_TIMESTAMP,
+            },
+        )
+        return new_rule, ruleset.get("rulesVersion", 0)
 
-    # Add to rules subcollection
-    timestamp, rule_ref = (
-        db.collection("ruleSets").document(ruleset_id).collection("rules").add(new_rule)
-    )
+    new_rule, old_version = _append(get_db().transaction())
+    new_version = old_version + 1
 
-    # Get the created document
-    try:
-        rule_doc = rule_ref.get()
-        result = rule_doc.to_dict()
-        result["id"] = rule_doc.id
-    except Exception as e:
-        print("Error creating rule:", e)
+    # Build the result from what was written instead of reading the rule back.
+    # Server timestamps are only known after the write, so leave them out
+    result = {
+        key: value
+        for key, value in new_rule.items()
+        if value is not firestore.SERVER_TIMESTAMP
+    }
+    result["id"] = rule_ref.id
+
+    # Extend a cached list that was current before this write
+    with _rules_cache_lock:
+        cached = _rules_cache.get(ruleset_id)
+        if cached is not None and cached[0] == old_version:
+            _rules_cache[ruleset_id] = (
+                new_version,
+                cached[1] + [copy.deepcopy(result)],
+            )
+        else:
+            _rules_cache.pop(ruleset_id, None)
 
-    return result
+    return result, new_version
 
 
 def get_rule(ruleset_id, rule_id):
@@ -327,7 +625,8 @@ def get_rule(ruleset_id, rule_id):
     """
 
     rule_doc = (
-        db.collection("ruleSets")
+        get_db()
+        .collection("ruleSets")
         .document(ruleset_id)
         .collection("rules")
         .document(rule_id)
@@ -360,10 +659,18 @@ def update_single_rule(ruleset_id, rule_id, data):
     update_data = data.copy()
     update_data["updatedAt"] = firestore.SERVER_TIMESTAMP
 
-    # Update document
-    db.collection("ruleSets").document(ruleset_id).collection("rules").document(
-        rule_id
-    ).update(update_data)
+    # Update the rule and bump the ruleset's rulesVersion together
+    batch = get_db().batch()
+    batch.update(
+        get_db()
+        .collection("ruleSets")
+        .document(ruleset_id)
+        .collection("rules")
+        .document(rule_id),
+        update_data,
+    )
+    _rules_changed(ruleset_id, batch)
+    batch.commit()
 
     return True
 
@@ -380,20 +687,30 @@ def delete_single_rule(ruleset_id, rule_id):
         bool: Success status
     """
 
-    # Delete document
-    db.collection("ruleSets").document(ruleset_id).collection("rules").document(
-        rule_id
-    ).delete()
+    # Delete the rule and bump the ruleset's rulesVersion together
+    batch = get_db().batch()
+    batch.delete(
+        get_db()
+        .collection("ruleSets")
+        .document(ruleset_id)
+        .collection("rules")
+        .document(rule_id)
+    )
+    _rules_changed(ruleset_id, batch)
+    batch.commit()
 
-    # Optionally, reorder remaining rules
-    reorder_rules(ruleset_id)
+    # Remaining rules keep their order values; the gap does not affect sorting,
+    # so a delete is a single write instead of rewriting every rule
 
     return True
 
 
 def reorder_rules(ruleset_id):
     """
-    Reorder rules after deletion to maintain sequential order.
+    Renumber rules 0..n-1 in their current order.
+
+    Not needed after deletes, which leave harmless gaps in the order values.
+    Run occasionally to compact them.
 
     Args:
         ruleset_id (str): Ruleset ID
@@ -401,26 +718,27 @@ def reorder_rules(ruleset_id):
 
     # Get all rules sorted by current order
     rules_ref = (
-        db.collection("ruleSets")
+        get_db()
+        .collection("ruleSets")
         .document(ruleset_id)
         .collection("rules")
         .order_by("order")
     )
     rules_docs = rules_ref.get()
 
-    # Update order for each rule
-    batch = db.batch()
-    for i, doc in enumerate(rules_docs):
-        rule_ref = (
-            db.collection("ruleSets")
-            .document(ruleset_id)
-            .collection("rules")
-            .document(doc.id)
-        )
-        batch.update(rule_ref, {"order": i})
+    # Update order for each rule, at most 500 writes per batch counting the
+    # rulesVersion bump, which goes in the last batch so other instances'
+    # cached lists go stale once every order is written
+    chunk_size = 499
+    for start in range(0, max(len(rules_docs), 1), chunk_size):
+        batch = get_db().batch()
+        for i, doc in enumerate(rules_docs[start : start + chunk_size], start):
+            batch.update(doc.reference, {"order": i})
+        if start + chunk_size >= len(rules_docs):
+            _rules_changed(ruleset_id, batch)
 
-    # Commit batch update
-    batch.commit()
+        # Commit batch update
+        batch.commit()
 
 
 # Function to get Speckle token for a user from Firestore
@@ -428,7 +746,7 @@ def get_speckle_token_for_user(user_id):
     """Get the Speckle token for a user from Firestore."""
 
     try:
-        user_token_doc = db.collection("userTokens").document(user_id).get()
+        user_token_doc = get_db().collection("userTokens").document(user_id).get()
         if user_token_doc.exists:
             return user_token_doc.to_dict().get("speckleToken")
         return None
@@ -456,7 +774,7 @@ def verify_firebase_token(func):
         token = auth_header.split("Bearer ")[1]
 
         try:
-            decoded_token = auth.verify_id_token(token)
+            decoded_token = safe_verify_id_token(token)
             request.user_id = decoded_token["uid"]
             request.user_email = decoded_token.get("email")
             return func(request, *args, **kwargs)
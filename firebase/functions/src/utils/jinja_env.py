@@ -1,7 +1,14 @@
 import datetime
 import os
+import shutil
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import (
+    ChoiceLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    ModuleLoader,
+)
 
 # Determine the template directories
 current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -17,8 +24,31 @@ for module in modules:
     if os.path.exists(module_template_dir):
         template_dirs.append(module_template_dir)
 
-# Create Jinja environment with file system loader
-env = Environment(loader=FileSystemLoader(template_dirs), autoescape=True)
+# Templates compiled into modules by precompile_templates.py before deploying
+compiled_template_dir = os.path.join(os.path.dirname(current_dir), "compiled_templates")
+
+# Options that change the generated code, so precompiled templates must be
+# built with the same ones
+compile_options = {"autoescape": True}
+
+# In the emulator, pick up template edits; deployed templates never change, so
+# skip the compiled modules and the file checks on every render
+development = os.environ.get("FUNCTIONS_EMULATOR") == "true"
+
+source_loader = FileSystemLoader(template_dirs)
+loader = source_loader
+if not development and os.path.isdir(compiled_template_dir):
+    # Precompiled templates skip reading and parsing sources on cold start
+    loader = ChoiceLoader([ModuleLoader(compiled_template_dir), source_loader])
+
+# Create Jinja environment. Templates loaded from source share their compiled
+# bytecode through a cache under the system temp directory
+env = Environment(
+    loader=loader,
+    auto_reload=development,
+    bytecode_cache=FileSystemBytecodeCache(),
+    **compile_options,
+)
 
 
 # Add custom filters
@@ -54,3 +84,21 @@ def render_template(template_name, **context):
     except Exception as e:
         # Return error message if template fails to load
         return f"Error rendering template {template_name}: {str(e)}"
+
+
+def precompile_templates(target=compiled_template_dir):
+    """
+    Compile every template into Python modules that the environment loads.
+
+    Args:
+        target: Directory for the modules. It is replaced, so templates that
+            were removed do not linger
+
+    Returns:
+        int: Number of templates compiled
+    """
+    source_env = Environment(loader=source_loader, **compile_options)
+    names = source_env.list_templates()
+    shutil.rmtree(target, ignore_errors=True)
+    source_env.compile_templates(target, zip=None, ignore_errors=False)
+    return len(names)
@@ -0,0 +1,379 @@
+"""
+On-disk cache of Speckle version objects.
+
+Speckle objects never change once written: an object ID is the hash of its
+content. A version's objects, its root and every child, are kept in one
+segment file named after the root object, so previewing rules against the
+same version again reads them from local disk instead of the network.
+
+A segment is a magic header followed by frames, each a little-endian uint32
+length and a zlib-compressed msgpack list of objects. Its index file maps
+every object ID in the segment to its frame and position, sorted by ID, and
+is read through mmap, so a single object is found by binary search without
+loading the index.
+
+Segments are written to a temporary file and renamed into place, so readers
+never see a partial one, and the least recently read segments are deleted
+once the cache is over its byte budget.
+"""
+
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import zlib
+
+import msgpack
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Functions can only write to /tmp, which is memory-backed, so the budget
+# counts against the instance's memory. The default leaves most of a default
+# 256 MiB instance for serving requests
+OBJECT_CACHE_DIR = os.getenv(
+    "SPECKLE_OBJECT_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "speckle-object-cache"),
+)
+# Bytes of segments and indexes kept on disk; 0 disables the cache
+OBJECT_CACHE_MAX_BYTES = int(
+    os.getenv("SPECKLE_OBJECT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+# Uncompressed bytes of objects per frame. Reading one object decompresses
+# its whole frame
+FRAME_BYTES = 1024 * 1024
+# zlib level: favours write speed, the objects compress well regardless
+COMPRESSION_LEVEL = 1
+
+SEGMENT_MAGIC = b"SPKSEG1\0"
+INDEX_MAGIC = b"SPKIDX1\0"
+_LENGTH = struct.Struct("<I")
+_INDEX_HEADER = struct.Struct("<8sQQ")
+# Speckle object IDs are 32 hex characters; longer IDs are not indexed
+INDEX_ENTRY = np.dtype([("id", "S32"), ("frame", "<u4"), ("item", "<u4")])
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_object_cache():
+    """
+    Get the process-wide object cache, creating it on first use.
+
+    Returns:
+        ObjectCache: The cache, or None if it is disabled
+    """
+    global _cache
+    if _cache is None and OBJECT_CACHE_MAX_BYTES > 0:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = ObjectCache(OBJECT_CACHE_DIR, OBJECT_CACHE_MAX_BYTES)
+                except OSError as e:
+                    logger.warning(f"Speckle object cache disabled: {e}")
+    return _cache
+
+
+class ObjectCache:
+    """
+    Segments of version objects on local disk, evicted least recently read
+    first once they use more than max_bytes.
+
+    Entries are keyed by server, project and root object, so a cached
+    version is only served for the project it was downloaded from. Callers
+    still check that the user can read the project.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _base(self, host, stream_id, root_id):
+        if not (_SAFE_ID.match(stream_id) and _SAFE_ID.match(root_id)):
+            return None
+        scope = hashlib.sha256(f"{host}/{stream_id}".encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{scope}-{root_id}")
+
+    def iter_objects(self, host, stream_id, root_id):
+        """
+        Read a cached version's objects in the order they were downloaded.
+
+        Returns:
+            An iterator of objects, or None if the version is not cached
+        """
+        base = self._base(host, stream_id, root_id)
+        if base is None:
+            return None
+        try:
+            segment = open(base + ".seg", "rb")
+        except FileNotFoundError:
+            return None
+        self._touch(base)
+        return self._read_frames(segment)
+
+    def _read_frames(self, segment):
+        with segment:
+            if segment.read(len(SEGMENT_MAGIC)) != SEGMENT_MAGIC:
+                raise ValueError(f"Not an object segment: {segment.name}")
+            while True:
+                frame = _read_frame(segment)
+                if frame is None:
+                    return
+                yield from frame
+
+    def get_object(self, host, stream_id, root_id, object_id):
+        """
+        Read one object of a cached version.
+
+        Returns:
+            dict: The object, or None if the version is not cached or does
+            not contain it
+        """
+        base = self._base(host, stream_id, root_id)
+        if base is None or len(object_id) > INDEX_ENTRY["id"].itemsize:
+            return None
+        try:
+            with open(base + ".idx", "rb") as f, open(base + ".seg", "rb") as segment:
+                index = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    location = _find(index, object_id.encode())
+                finally:
+                    index.close()
+                if location is None:
+                    return None
+                offset, item = location
+                segment.seek(offset)
+                frame = _read_frame(segment)
+        except FileNotFoundError:
+            return None
+        if frame is None or item >= len(frame):
+            raise ValueError(f"Truncated object segment: {base}.seg")
+        self._touch(base)
+        return frame[item]
+
+    def writer(self, host, stream_id, root_id):
+        """
+        Start caching a version's objects.
+
+        Returns:
+            SegmentWriter: Writer to add the objects to and commit once all
+            were added, or None if the version cannot be cached
+        """
+        base = self._base(host, stream_id, root_id)
+        if base is None:
+            return None
+        try:
+            return SegmentWriter(self, base)
+        except OSError as e:
+            logger.warning(f"Not caching objects of {root_id}: {e}")
+            return None
+
+    def size_bytes(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _entries(self):
+        """(base path, bytes, last read time) of every cached segment."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".seg"):
+                continue
+            base = os.path.join(self.directory, name[: -len(".seg")])
+            try:
+                stat = os.stat(base + ".seg")
+                size = stat.st_size + os.path.getsize(base + ".idx")
+            except FileNotFoundError:
+                continue
+            entries.append((base, size, stat.st_mtime))
+        return entries
+
+    def _touch(self, base):
+        # The segment's mtime records when it was last read, for eviction
+        try:
+            os.utime(base + ".seg")
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep=None):
+        """
+        Delete the least recently read segments until the cache fits its
+        budget.
+
+        Args:
+            keep (str): Base path of a segment never to delete, such as the
+                one just written
+        """
+        with self._lock, open(os.path.join(self.directory, ".lock"), "w") as lock:
+            # Other processes sharing the directory evict under the same lock
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            for base, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                if base == keep:
+                    continue
+                for suffix in (".seg", ".idx"):
+                    try:
+                        os.remove(base + suffix)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+
+
+class SegmentWriter:
+    """
+    Writes a version's objects to a temporary segment and index, which
+    commit() moves into place. Closing without committing discards them, so
+    a download that stops early is never cached. A full disk only stops the
+    caching, never the download.
+    """
+
+    def __init__(self, cache, base):
+        self.cache = cache
+        self.base = base
+        self._file = tempfile.NamedTemporaryFile(
+            dir=cache.directory, suffix=".seg.tmp", delete=False
+        )
+        self._file.write(SEGMENT_MAGIC)
+        self._frame = []
+        self._frame_bytes = 0
+        self._frame_offsets = []
+        self._ids = []
+        self._items = []
+
+    def add(self, obj):
+        if self._file is None:
+            return
+        packed = msgpack.packb(obj)
+        object_id = obj.get("id") if isinstance(obj, dict) else None
+        if isinstance(object_id, str) and len(object_id) <= INDEX_ENTRY["id"].itemsize:
+            self._ids.append(object_id.encode())
+            self._items.append((len(self._frame_offsets), len(self._frame)))
+        self._frame.append(packed)
+        self._frame_bytes += len(packed)
+        if self._frame_bytes >= FRAME_BYTES:
+            try:
+                self._flush_frame()
+            except OSError as e:
+                logger.warning(f"Not caching objects of {self.base}: {e}")
+                self.close()
+
+    def _flush_frame(self):
+        if not self._frame:
+            return
+        # The packed objects concatenated after an array header form a
+        # msgpack list without packing them again
+        header = msgpack.Packer().pack_array_header(len(self._frame))
+        data = zlib.compress(header + b"".join(self._frame), COMPRESSION_LEVEL)
+        self._frame_offsets.append(self._file.tell())
+        self._file.write(_LENGTH.pack(len(data)))
+        self._file.write(data)
+        self._frame = []
+        self._frame_bytes = 0
+
+    def commit(self):
+        """Move the segment and its index into the cache, then evict."""
+        if self._file is None:
+            return
+        try:
+            self._write_index()
+        except OSError as e:
+            logger.warning(f"Not caching objects of {self.base}: {e}")
+            self.close()
+            return
+        self._file = None
+        self.cache.evict(keep=self.base)
+
+    def _write_index(self):
+        self._flush_frame()
+        self._file.close()
+
+        entries = np.empty(len(self._ids), dtype=INDEX_ENTRY)
+        entries["id"] = self._ids
+        entries["frame"] = [frame for frame, _ in self._items]
+        entries["item"] = [item for _, item in self._items]
+        entries.sort(order="id")
+        offsets = np.array(self._frame_offsets, dtype="<u8")
+
+        with tempfile.NamedTemporaryFile(
+            dir=self.cache.directory, suffix=".idx.tmp", delete=False
+        ) as index:
+            try:
+                index.write(_INDEX_HEADER.pack(INDEX_MAGIC, len(offsets), len(entries)))
+                index.write(offsets.tobytes())
+                index.write(entries.tobytes())
+            except OSError:
+                index.close()
+                os.remove(index.name)
+                raise
+
+        # The index goes first: a segment is only read once it exists, and
+        # its index is then already in place
+        os.replace(index.name, self.base + ".idx")
+        os.replace(self._file.name, self.base + ".seg")
+
+    def close(self):
+        """Discard the segment unless it was committed."""
+        if self._file is not None:
+            self._file.close()
+            try:
+                os.remove(self._file.name)
+            except FileNotFoundError:
+                pass
+            self._file = None
+
+
+def _read_frame(segment):
+    """
+    Read the frame at the segment's position.
+
+    Returns:
+        list: The frame's objects, or None at the end of the segment
+
+    Raises:
+        ValueError: If the segment ends inside the frame or it does not
+            decompress
+    """
+    header = segment.read(_LENGTH.size)
+    if not header:
+        return None
+    if len(header) < _LENGTH.size:
+        raise ValueError(f"Truncated object segment: {segment.name}")
+    (length,) = _LENGTH.unpack(header)
+    data = segment.read(length)
+    if len(data) < length:
+        raise ValueError(f"Truncated object segment: {segment.name}")
+    try:
+        return msgpack.unpackb(zlib.decompress(data))
+    except zlib.error as e:
+        raise ValueError(f"Corrupt object segment {segment.name}: {e}") from e
+
+
+def _find(index, object_id):
+    """
+    Binary search an index for an object.
+
+    Returns:
+        tuple: (frame offset, position in frame), or None if not indexed
+    """
+    magic, frame_count, entry_count = _INDEX_HEADER.unpack_from(index)
+    if magic != INDEX_MAGIC:
+        raise ValueError("Not an object index")
+    offsets = np.frombuffer(index, "<u8", frame_count, _INDEX_HEADER.size)
+    entries = np.frombuffer(
+        index, INDEX_ENTRY, entry_count, _INDEX_HEADER.size + offsets.nbytes
+    )
+    position = int(np.searchsorted(entries["id"], object_id))
+    if position == entry_count or entries[position]["id"] != object_id:
+        return None
+    entry = entries[position]
+    return int(offsets[entry["frame"]]), int(entry["item"])
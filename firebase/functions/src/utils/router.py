@@ -0,0 +1,148 @@
+"""
+Path router for serving every route from a single function.
+"""
+
+import functools
+import importlib
+import json
+import re
+import uuid
+
+from firebase_functions import https_fn
+
+# Sent with every routed response, so a scripted session can count how many
+# instances (cold starts) served it
+INSTANCE_ID = uuid.uuid4().hex[:12]
+
+_PARAM = re.compile(r"<(\w+)>")
+
+
+def tag_instance(function):
+    """
+    Add the X-Instance-Id header to the responses of a function that serves
+    its requests without the router.
+    """
+
+    @functools.wraps(function)
+    def wrapper(request):
+        response = function(request)
+        response.headers["X-Instance-Id"] = INSTANCE_ID
+        return response
+
+    return wrapper
+
+
+def compile_path(pattern):
+    """
+    Compile a path pattern into a regular expression.
+
+    Args:
+        pattern (str): Path with <name> placeholders, each matching one segment,
+            e.g. "/api/rulesets/<ruleset_id>/rules"
+
+    Returns:
+        re.Pattern: Expression whose named groups are the placeholders. A
+        trailing slash on the path is allowed
+    """
+    parts = []
+    position = 0
+    for param in _PARAM.finditer(pattern):
+        parts.append(re.escape(pattern[position : param.start()]))
+        parts.append(f"(?P<{param.group(1)}>[^/]+)")
+        position = param.end()
+    parts.append(re.escape(pattern[position:].rstrip("/")))
+    return re.compile("".join(parts) + "/?")
+
+
+class Router:
+    """
+    Dispatch requests to handlers by path and method.
+
+    Routes are tried in the order they were added, like Hosting rewrites, and
+    path parameters, or the query parameters standing in for them, are passed
+    to the handler as keyword arguments.
+    """
+
+    def __init__(self):
+        self._routes = []
+
+    def add(self, pattern, handler, methods=None, query=None):
+        """
+        Add a route.
+
+        Args:
+            pattern (str): Path pattern, see compile_path
+            handler (callable or str): Called as handler(request, **path_params).
+                A "package.module:function" string is imported on the route's
+                first request instead, so a cold start only imports the
+                modules of the routes it serves
+            methods (iterable, optional): HTTP methods to accept. All methods
+                are accepted if not given
+            query (dict, optional): Handler keyword argument to the query
+                parameter that supplies it when the path does not, e.g.
+                {"project_id": "projectId"}. It is None if neither has it
+        """
+        allowed = {method.upper() for method in methods} if methods else None
+        self._routes.append([compile_path(pattern), allowed, handler, query or {}])
+
+    def match(self, method, path, args=None):
+        """
+        Find the handler for a request.
+
+        Args:
+            method (str): HTTP method
+            path (str): Request path
+            args (Mapping, optional): Query parameters of the request
+
+        Returns:
+            tuple: (handler, path_params), (None, None) if no route has the
+            path, or (None, {}) if routes have the path but not the method
+        """
+        path_matched = False
+        for route in self._routes:
+            regex, allowed, handler, query = route
+            found = regex.fullmatch(path)
+            if not found:
+                continue
+            if allowed is not None and method.upper() not in allowed:
+                path_matched = True
+                continue
+            if isinstance(handler, str):
+                module_name, function_name = handler.split(":")
+                handler = getattr(importlib.import_module(module_name), function_name)
+                route[2] = handler
+            params = found.groupdict()
+            for name, arg in query.items():
+                if params.get(name) is None:
+                    params[name] = args.get(arg) if args else None
+            return handler, params
+        return None, ({} if path_matched else None)
+
+    def dispatch(self, request):
+        """
+        Serve a request with the handler of its route.
+
+        Args:
+            request: Incoming https_fn.Request
+
+        Returns:
+            https_fn.Response: The handler's response, or a JSON 404/405 error
+        """
+        handler, params = self.match(request.method, request.path, request.args)
+        if handler is not None:
+            response = handler(request, **params)
+        elif params is None:
+            response = https_fn.Response(
+                json.dumps({"error": f"No route for {request.path}"}),
+                mimetype="application/json",
+                status=404,
+            )
+        else:
+            response = https_fn.Response(
+                json.dumps({"error": f"Method {request.method} not allowed"}),
+                mimetype="application/json",
+                status=405,
+            )
+
+        response.headers["X-Instance-Id"] = INSTANCE_ID
+        return response
@@ -1,29 +1,116 @@
 import requests
 import logging
-from typing import Dict, List, Optional
+import threading
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Union
+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .speckle_objects import decode_object_line, flatten_object, is_property_object
+
+if TYPE_CHECKING:
+    from .object_cache import ObjectCache
 
 logger = logging.getLogger(__name__)
 
+# (connect, read) timeouts in seconds for every Speckle request
+SPECKLE_TIMEOUT = (3.05, 30)
+# Connections kept alive per Speckle host, shared by all SpeckleAPI instances
+SPECKLE_POOL_SIZE = 10
+# Statuses worth another attempt: rate limiting and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Bytes read from the object stream at a time
+OBJECT_STREAM_CHUNK_SIZE = 64 * 1024
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _retry_policy(idempotent: bool) -> Retry:
+    """
+    Build the retry policy for a pooled session.
+
+    Backoff is exponential (0.5s, 1s, 2s) plus up to 0.5s of jitter, and a
+    Retry-After header from a 429 or 503 is honored. Mutations are only
+    retried when the connection could not be made, since the server never
+    saw the request, so a transient error cannot apply them twice.
+    """
+    if idempotent:
+        return Retry(
+            total=3,
+            backoff_factor=0.5,
+            backoff_jitter=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+    return Retry(total=2, connect=2, read=0, status=0, other=0, backoff_factor=0.5)
+
+
+def get_session(idempotent: bool = True) -> requests.Session:
+    """
+    Get the process-wide session for Speckle requests.
+
+    Sessions are created on first use and reused across warm invocations, so
+    requests share kept-alive connections instead of a new TLS handshake each.
+
+    Args:
+        idempotent (bool): False for requests that must not be retried once
+            sent, such as GraphQL mutations
+
+    Returns:
+        requests.Session: The pooled session
+    """
+    session = _sessions.get(idempotent)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(idempotent)
+            if session is None:
+                adapter = HTTPAdapter(
+                    pool_connections=SPECKLE_POOL_SIZE,
+                    pool_maxsize=SPECKLE_POOL_SIZE,
+                    max_retries=_retry_policy(idempotent),
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _sessions[idempotent] = session
+    return session
+
 
 class SpeckleAPI:
     """
     Synchronous wrapper for interacting with the Speckle API using HTTP requests.
     """
 
-    def __init__(self, token: str, host: str = "https://app.speckle.systems"):
+    def __init__(
+        self,
+        token: str,
+        host: str = "https://app.speckle.systems",
+        object_cache: Optional["ObjectCache"] = None,
+    ):
         self.token = token
         self.host = host
+        # Version objects are cached on disk (see object_cache). The cache
+        # module, which loads numpy and msgpack, is only imported once a
+        # version's objects are read, so GraphQL-only callers start faster
+        self.object_cache = object_cache
         self.headers = {
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json",
         }
 
-    def run_graphql_query(self, query: str, variables: Optional[Dict] = None) -> Dict:
+    def run_graphql_query(
+        self, query: str, variables: Optional[Dict] = None, idempotent: bool = True
+    ) -> Dict:
         url = f"{self.host}/graphql"
         payload = {"query": query, "variables": variables or {}}
 
         try:
-            response = requests.post(url, headers=self.headers, json=payload)
+            response = get_session(idempotent).post(
+                url, headers=self.headers, json=payload, timeout=SPECKLE_TIMEOUT
+            )
             if not response.ok:
                 print(f"Status: {response.status_code}")
                 print(f"Response text: {response.text}")
@@ -154,7 +241,7 @@ class SpeckleAPI:
                 "message": message,
             }
         }
-        data = self.run_graphql_query(mutation, variables)
+        data = self.run_graphql_query(mutation, variables, idempotent=False)
         return data["commentCreate"]
 
     def search_objects(self, stream_id: str, query_string: str) -> List[Dict]:
@@ -172,13 +259,32 @@ class SpeckleAPI:
         data = self.run_graphql_query(search_query, variables)
         return data["stream"]["objectSearch"]
 
-    def get_version_objects(self, stream_id: str, object_id: str) -> Dict:
+    def get_version_objects(
+        self, stream_id: str, object_id: str, stream: bool = False
+    ) -> Union[Dict, Iterator[Dict]]:
         """
         This replaces the operations.receive() call by doing a GET to the `/objects/{streamId}/{objectId}` endpoint.
+
+        Args:
+            stream_id (str): The project (stream) ID
+            object_id (str): The version's root object ID
+            stream (bool): Return an iterator of flattened property records
+                that downloads the objects as it is consumed, instead of
+                loading the whole object graph at once
+
+        Returns:
+            The endpoint's JSON, always fetched from the server, or with
+            stream=True the records from stream_version_records, which may
+            come from the object cache
         """
+        if stream:
+            return self.stream_version_records(stream_id, object_id)
+
         url = f"{self.host}/api/streams/{stream_id}/objects/{object_id}"
         try:
-            response = requests.get(url, headers=self.headers)
+            response = get_session().get(
+                url, headers=self.headers, timeout=SPECKLE_TIMEOUT
+            )
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -187,6 +293,73 @@ class SpeckleAPI:
             )
             raise
 
+    def get_object_cache(self) -> Optional["ObjectCache"]:
+        """
+        Returns:
+            ObjectCache: The cache passed in, or else the process-wide one,
+            or None if it is disabled
+        """
+        if self.object_cache is None:
+            from .object_cache import get_object_cache
+
+            self.object_cache = get_object_cache()
+        return self.object_cache
+
+    def stream_version_objects(self, stream_id: str, object_id: str) -> Iterator[Dict]:
+        """
+        Yield a version's objects, its root and every child, as they download.
+
+        The objects endpoint sends them newline-delimited; each line is decoded
+        as it arrives, so memory holds one line at a time however large the
+        model is. A version read to the end is cached, and read again from
+        disk without any request.
+        """
+        cache = self.get_object_cache()
+        if cache is not None:
+            cached = cache.iter_objects(self.host, stream_id, object_id)
+            if cached is not None:
+                yield from cached
+                return
+
+        url = f"{self.host}/objects/{stream_id}/{object_id}"
+        headers = {"Authorization": f"Bearer {self.token}", "Accept": "text/plain"}
+        try:
+            response = get_session().get(
+                url, headers=headers, stream=True, timeout=SPECKLE_TIMEOUT
+            )
+            response.raise_for_status()
+        except Exception as e:
+            logger.error(
+                f"Error streaming version objects for stream {stream_id} object {object_id}: {str(e)}"
+            )
+            raise
+
+        writer = cache.writer(self.host, stream_id, object_id) if cache else None
+        try:
+            with response:
+                for line in response.iter_lines(chunk_size=OBJECT_STREAM_CHUNK_SIZE):
+                    obj = decode_object_line(line)
+                    if obj is not None:
+                        if writer is not None:
+                            writer.add(obj)
+                        yield obj
+            if writer is not None:
+                writer.commit()
+        finally:
+            # Discards a partial download
+            if writer is not None:
+                writer.close()
+
+    def stream_version_records(self, stream_id: str, object_id: str) -> Iterator[Dict]:
+        """
+        Yield a flattened property record (see speckle_objects.flatten_object)
+        for each object of a version that can hold properties, as the objects
+        download.
+        """
+        for obj in self.stream_version_objects(stream_id, object_id):
+            if is_property_object(obj):
+                yield flatten_object(obj)
+
 
 # Helper functions to instantiate and use easily:
 def get_user_projects(token: str, host: str = "https://app.speckle.systems"):
@@ -0,0 +1,101 @@
+"""
+Decode Speckle objects from the object stream and flatten them into property
+records that rules can address by propertyName.
+"""
+
+import json
+
+# Objects with these speckle_type prefixes carry geometry or raw data, not
+# properties a rule can check
+SKIPPED_TYPE_PREFIXES = (
+    "Objects.Geometry.",
+    "Speckle.Core.Models.DataChunk",
+    "Objects.Other.RenderMaterial",
+    "Objects.Other.DisplayStyle",
+)
+
+# Keys that hold the object graph itself rather than properties
+STRUCTURAL_KEYS = {"id", "__closure", "totalChildrenCount", "applicationId"}
+
+SEPARATOR = "."
+
+
+def decode_object_line(line):
+    """
+    Decode one line of the object stream.
+
+    The objects endpoint sends one object per line as "<id>\\t<json>"; lines
+    that are bare JSON are accepted too.
+
+    Args:
+        line (bytes | str): The line, without its newline
+
+    Returns:
+        dict: The object, or None for a blank line
+    """
+    line = line.strip()
+    if not line:
+        return None
+    if isinstance(line, str):
+        line = line.encode()
+    if not line.startswith(b"{"):
+        line = line[line.index(b"\t") + 1 :]
+    return json.loads(line)
+
+
+def _is_parameter(value):
+    # Revit and other connectors store parameters as {name, value, units, ...}
+    return (
+        "value" in value
+        and "name" in value
+        and not isinstance(value["value"], (dict, list))
+    )
+
+
+def _flatten(value, prefix, record):
+    for key, item in value.items():
+        if key.startswith("__") or key in STRUCTURAL_KEYS:
+            continue
+        path = f"{prefix}{SEPARATOR}{key}" if prefix else key
+        if isinstance(item, dict):
+            if item.get("speckle_type") == "reference":
+                continue
+            if _is_parameter(item):
+                record[path] = item["value"]
+                # Rules name parameters by their display name
+                record.setdefault(item["name"], item["value"])
+            else:
+                _flatten(item, path, record)
+        elif not isinstance(item, list):
+            record[path] = item
+
+
+def flatten_object(obj):
+    """
+    Flatten a Speckle object into a property record.
+
+    Nested properties are keyed by their dotted path, such as
+    "properties.Parameters.Width". Parameter objects contribute their value
+    under their path and, unless a property already has it, under their
+    name. Lists, references to other objects and the object's closure are
+    left out.
+
+    Args:
+        obj (dict): A decoded Speckle object
+
+    Returns:
+        dict: Property path to scalar value, with the object's id under "id"
+    """
+    record = {"id": obj.get("id")}
+    _flatten(obj, "", record)
+    return record
+
+
+def is_property_object(obj):
+    """
+    Returns:
+        bool: Whether the object can hold properties rules check, as opposed
+        to geometry, data chunks and display settings
+    """
+    speckle_type = obj.get("speckle_type") or ""
+    return not speckle_type.startswith(SKIPPED_TYPE_PREFIXES)
@@ -3,6 +3,7 @@ Utility functions for TSV generation used across multiple modules.
 """
 
 import csv
+import hashlib
 from io import StringIO
 
 
@@ -91,7 +92,30 @@ def generate_ruleset_tsv(ruleset, rules=None):
 
         rule_number += 1
 
-    # Create filename based on ruleset name
-    filename = f"{ruleset.get('name', 'ruleset').replace(' ', '_').lower()}.tsv"
+    return output.getvalue(), tsv_filename(ruleset)
 
-    return output.getvalue(), filename
+
+def tsv_filename(ruleset):
+    """
+    Download filename for a ruleset's TSV, based on the ruleset name.
+
+    Args:
+        ruleset (dict): Ruleset document
+
+    Returns:
+        str: Filename ending in .tsv
+    """
+    return f"{ruleset.get('name', 'ruleset').replace(' ', '_').lower()}.tsv"
+
+
+def tsv_etag(tsv_content):
+    """
+    Content hash of a TSV, used as its ETag.
+
+    Args:
+        tsv_content (str): TSV content
+
+    Returns:
+        str: SHA-256 hex digest of the UTF-8 encoded content
+    """
+    return hashlib.sha256(tsv_content.encode("utf-8")).hexdigest()
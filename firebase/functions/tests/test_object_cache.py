@@ -0,0 +1,164 @@
+import os
+
+import pytest
+
+from src.utils import object_cache
+from src.utils.object_cache import ObjectCache
+
+HOST = "https://app.speckle.systems"
+STREAM = "stream1"
+
+
+def objects(root, count=3):
+    children = [
+        {"id": f"{root}child{i:02d}", "speckle_type": "Base", "name": f"Wand {i}"}
+        for i in range(count)
+    ]
+    return [{"id": root, "speckle_type": "Base", "elements": len(children)}] + children
+
+
+def cache_version(cache, root, count=3):
+    writer = cache.writer(HOST, STREAM, root)
+    for obj in objects(root, count):
+        writer.add(obj)
+    writer.commit()
+    return cache._base(HOST, STREAM, root)
+
+
+def set_last_read(base, seconds_ago):
+    stat = os.stat(base + ".seg")
+    os.utime(base + ".seg", (stat.st_atime, stat.st_mtime - seconds_ago))
+
+
+def test_miss_then_hit_in_download_order(tmp_path):
+    """Test that a committed version is read back in the order it was added"""
+    cache = ObjectCache(str(tmp_path), 1024 * 1024)
+
+    assert cache.iter_objects(HOST, STREAM, "root0001") is None
+    cache_version(cache, "root0001")
+
+    assert list(cache.iter_objects(HOST, STREAM, "root0001")) == objects("root0001")
+    # Cached per project: the same root of another stream is a miss
+    assert cache.iter_objects(HOST, "stream2", "root0001") is None
+
+
+def test_objects_are_split_across_frames(tmp_path, monkeypatch):
+    """Test that versions larger than a frame are read back whole"""
+    monkeypatch.setattr(object_cache, "FRAME_BYTES", 64)
+    cache = ObjectCache(str(tmp_path), 1024 * 1024)
+
+    cache_version(cache, "root0001", count=20)
+
+    assert list(cache.iter_objects(HOST, STREAM, "root0001")) == objects("root0001", 20)
+    assert cache.get_object(HOST, STREAM, "root0001", "root0001child17") == {
+        "id": "root0001child17",
+        "speckle_type": "Base",
+        "name": "Wand 17",
+    }
+
+
+def test_get_object_by_id(tmp_path):
+    """Test that single objects are found through the index"""
+    cache = ObjectCache(str(tmp_path), 1024 * 1024)
+    cache_version(cache, "root0001")
+
+    assert cache.get_object(HOST, STREAM, "root0001", "root0001child01")["name"] == (
+        "Wand 1"
+    )
+    assert cache.get_object(HOST, STREAM, "root0001", "root0001child99") is None
+    assert cache.get_object(HOST, STREAM, "root0002", "root0001child01") is None
+
+
+def test_uncommitted_writes_are_discarded(tmp_path):
+    """Test that a download that stops early leaves nothing behind"""
+    cache = ObjectCache(str(tmp_path), 1024 * 1024)
+    writer = cache.writer(HOST, STREAM, "root0001")
+    writer.add(objects("root0001")[0])
+    writer.close()
+
+    assert cache.iter_objects(HOST, STREAM, "root0001") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_unsafe_ids_are_not_cached(tmp_path):
+    """Test that IDs that could escape the cache directory are refused"""
+    cache = ObjectCache(str(tmp_path), 1024 * 1024)
+
+    assert cache.writer(HOST, STREAM, "../root") is None
+    assert cache.iter_objects(HOST, "../stream", "root0001") is None
+
+
+def test_least_recently_read_segment_is_evicted(tmp_path):
+    """Test that going over budget deletes the segment read longest ago"""
+    cache = ObjectCache(str(tmp_path), 1024 * 1024)
+    first = cache_version(cache, "root0001")
+    second = cache_version(cache, "root0002")
+    set_last_read(first, 200)
+    set_last_read(second, 100)
+    # Reading the older one makes the other the least recently read
+    list(cache.iter_objects(HOST, STREAM, "root0001"))
+    cache.max_bytes = cache.size_bytes()
+
+    cache_version(cache, "root0003")
+
+    assert cache.iter_objects(HOST, STREAM, "root0002") is None
+    assert cache.iter_objects(HOST, STREAM, "root0001") is not None
+    assert cache.iter_objects(HOST, STREAM, "root0003") is not None
+    assert cache.size_bytes() <= cache.max_bytes
+
+
+def test_segment_just_written_is_kept_over_budget(tmp_path):
+    """Test that a version larger than the budget is still served once"""
+    cache = ObjectCache(str(tmp_path), 1)
+
+    cache_version(cache, "root0001")
+
+    assert list(cache.iter_objects(HOST, STREAM, "root0001")) == objects("root0001")
+
+
+def test_corrupt_segment_raises_value_error(tmp_path):
+    """Test that a file that is not a segment is reported, not parsed"""
+    cache = ObjectCache(str(tmp_path), 1024 * 1024)
+    base = cache_version(cache, "root0001")
+    with open(base + ".seg", "r+b") as segment:
+        segment.write(b"NOTASEG!")
+
+    with pytest.raises(ValueError, match="Not an object segment"):
+        list(cache.iter_objects(HOST, STREAM, "root0001"))
+
+
+@pytest.mark.parametrize("keep", [-1, -10, len(object_cache.SEGMENT_MAGIC) + 2])
+def test_truncated_segment_raises_value_error(tmp_path, keep):
+    """Test that a segment cut short inside a frame raises ValueError"""
+    cache = ObjectCache(str(tmp_path), 1024 * 1024)
+    base = cache_version(cache, "root0001")
+    with open(base + ".seg", "r+b") as segment:
+        segment.truncate(keep if keep > 0 else os.path.getsize(base + ".seg") + keep)
+
+    with pytest.raises(ValueError, match="Truncated object segment"):
+        list(cache.iter_objects(HOST, STREAM, "root0001"))
+    with pytest.raises(ValueError, match="Truncated object segment"):
+        cache.get_object(HOST, STREAM, "root0001", "root0001child01")
+
+
+def test_corrupt_frame_raises_value_error(tmp_path):
+    """Test that a frame that does not decompress raises ValueError"""
+    cache = ObjectCache(str(tmp_path), 1024 * 1024)
+    base = cache_version(cache, "root0001")
+    with open(base + ".seg", "r+b") as segment:
+        segment.seek(len(object_cache.SEGMENT_MAGIC) + 4)
+        segment.write(b"\xff" * 4)
+
+    with pytest.raises(ValueError, match="Corrupt object segment"):
+        list(cache.iter_objects(HOST, STREAM, "root0001"))
+
+
+def test_corrupt_index_raises_value_error(tmp_path):
+    """Test that a file that is not an index is reported, not searched"""
+    cache = ObjectCache(str(tmp_path), 1024 * 1024)
+    base = cache_version(cache, "root0001")
+    with open(base + ".idx", "r+b") as index:
+        index.write(b"NOTANIDX")
+
+    with pytest.raises(ValueError, match="Not an object index"):
+        cache.get_object(HOST, STREAM, "root0001", "root0001child01")
@@ -0,0 +1,154 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.evaluation.builder import PropertyTableBuilder, build_table
+from src.evaluation.engine import evaluate_ruleset
+from src.evaluation.table import (
+    BoolColumn,
+    NumberColumn,
+    PropertyTable,
+    StringColumn,
+)
+
+RECORDS = [
+    {"id": "a", "Width": 250.0, "category": "Walls", "is_structural": True},
+    {"id": "b", "Width": math.nan, "category": "Wände", "is_structural": False},
+    {"id": "c", "Width": None, "mark": 12},
+    {"Width": 75, "category": "Doors", "mark": "D-12", "is_structural": None},
+    {"id": "e", "category": "", "params": {"nested": 1}, "list": [1, 2]},
+]
+
+
+def assert_tables_equal(loaded, table):
+    assert len(loaded) == len(table)
+    assert list(loaded.columns) == list(table.columns)
+    for name, column in table.columns.items():
+        other = loaded.columns[name]
+        assert type(other) is type(column), name
+        if isinstance(column, NumberColumn):
+            np.testing.assert_array_equal(other.values, column.values)
+        elif isinstance(column, BoolColumn):
+            np.testing.assert_array_equal(other.values, column.values)
+            np.testing.assert_array_equal(other.mask, column.mask)
+        else:
+            np.testing.assert_array_equal(other.codes, column.codes)
+            assert other.categories.tolist() == column.categories.tolist()
+    assert loaded.id_key == table.id_key
+    assert loaded.ids.tolist() == table.ids.tolist()
+
+
+def test_from_records_types_columns_and_marks_missing_values():
+    """Test that each property gets its column type and null markers"""
+    table = PropertyTable.from_records(RECORDS)
+
+    width = table.columns["Width"]
+    assert isinstance(width, NumberColumn)
+    assert width.present().tolist() == [True, False, False, True, False]
+
+    structural = table.columns["is_structural"]
+    assert isinstance(structural, BoolColumn)
+    assert structural.mask.tolist() == [True, True, False, False, False]
+
+    mark = table.columns["mark"]
+    assert isinstance(mark, StringColumn)
+    assert mark.codes.tolist() == [-1, -1, 0, 1, -1]
+    assert mark.categories.tolist() == ["12", "D-12"]
+
+    assert "params" not in table.columns and "list" not in table.columns
+    assert table.ids.tolist() == ["a", "b", "c", None, "e"]
+
+
+def test_save_load_round_trip_keeps_nan_and_nulls(tmp_path):
+    """Test that a saved table maps back with the same values and gaps"""
+    table = PropertyTable.from_records(RECORDS)
+    path = str(tmp_path / "properties.ptab")
+
+    table.save(path)
+    loaded = PropertyTable.load(path)
+
+    assert_tables_equal(loaded, table)
+    assert np.isnan(loaded.columns["Width"].values[[1, 2, 4]]).all()
+    assert loaded.columns["category"].categories.tolist()[1] == "Wände"
+    # Arrays are read-only views of the file
+    assert not loaded.columns["Width"].values.flags.writeable
+
+
+def test_save_load_round_trip_of_empty_table(tmp_path):
+    """Test that a table without objects or columns round-trips"""
+    path = str(tmp_path / "empty.ptab")
+
+    PropertyTable.from_records([]).save(path)
+    loaded = PropertyTable.load(path)
+
+    assert len(loaded) == 0
+    assert loaded.columns == {}
+    assert loaded.ids is None
+
+
+def test_load_rejects_other_files(tmp_path):
+    """Test that a file without the table header is not read as a table"""
+    path = tmp_path / "other.ptab"
+    path.write_bytes(b"NOTATABL" + bytes(64))
+
+    with pytest.raises(ValueError, match="Not a property table"):
+        PropertyTable.load(str(path))
+
+
+def test_loaded_table_previews_like_the_original(tmp_path):
+    """Test that rules evaluate the same on a loaded table"""
+    table = PropertyTable.from_records(RECORDS)
+    path = str(tmp_path / "properties.ptab")
+    table.save(path)
+    rules = [
+        {
+            "id": "wide-walls",
+            "conditions": [
+                {"logic": "WHERE", "propertyName": "category", "predicate": "exists"},
+                {
+                    "logic": "CHECK",
+                    "propertyName": "Width",
+                    "predicate": "greater than",
+                    "value": "100",
+                },
+            ],
+        }
+    ]
+
+    assert evaluate_ruleset(rules, PropertyTable.load(path)) == evaluate_ruleset(
+        rules, table
+    )
+
+
+def test_builder_matches_from_records_and_widens_mixed_columns():
+    """Test that streaming records builds the table from_records would"""
+    records = RECORDS + [
+        {"id": "f", "Width": "wide", "is_structural": 1, "mark": 3.0},
+        {"id": "g", "is_structural": True},
+    ]
+
+    built = PropertyTableBuilder().extend(records).build()
+    expected = PropertyTable.from_records(records)
+
+    assert_tables_equal(built, expected)
+    assert isinstance(built.columns["Width"], StringColumn)
+    assert isinstance(built.columns["is_structural"], StringColumn)
+
+
+def test_build_table_skips_geometry_and_flattens_parameters():
+    """Test that objects are filtered and flattened as they stream in"""
+    objects = [
+        {
+            "id": "w1",
+            "speckle_type": "Objects.BuiltElements.Wall",
+            "parameters": {"WIDTH": {"name": "Width", "value": 200, "units": "mm"}},
+        },
+        {"id": "m1", "speckle_type": "Objects.Geometry.Mesh", "vertices": [0, 1]},
+    ]
+
+    table = build_table(iter(objects))
+
+    assert len(table) == 1
+    assert table.ids.tolist() == ["w1"]
+    assert table.column("width").values.tolist() == [200.0]
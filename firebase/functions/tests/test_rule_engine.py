@@ -0,0 +1,170 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+from src.evaluation.engine import (
+    KERNELS,
+    RuleCompileError,
+    compile_condition,
+    compile_rule,
+    evaluate_ruleset,
+)
+from src.evaluation.table import PropertyTable
+
+# The naive per-object evaluator the benchmark checks the engine against
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "benchmarks"),
+)
+from bench_rule_evaluation import naive_condition, naive_evaluate  # noqa: E402
+
+RECORDS = [
+    {"id": "a", "category": "Walls", "Width": 250.0, "mixed": "300", "flag": True},
+    {"id": "b", "category": "walls", "Width": 200, "mixed": 300.0, "flag": False},
+    {"id": "c", "category": "Doors", "Width": None, "mixed": "abc", "text": "Yes"},
+    {"id": "d", "category": "Temp Wall", "mixed": True, "text": "no"},
+    {"id": "e", "Width": 75.5, "mixed": "EI60", "flag": True, "text": "TRUE"},
+    {"id": "f", "category": "Windows", "Width": 0, "text": "maybe"},
+]
+
+PROPERTIES = ["category", "Width", "mixed", "flag", "text", "missing"]
+
+CONDITIONS = [
+    ("exists", ""),
+    ("greater than", "100"),
+    ("less than", "200"),
+    ("in range", "300,100"),
+    ("in list", "walls,300,EI60"),
+    ("equal to", "Walls"),
+    ("equal to", "300"),
+    ("not equal to", "walls"),
+    ("not equal to", "200"),
+    ("is true", ""),
+    ("is false", ""),
+    ("is like", "^wall|^ei"),
+    ("identical to", "Walls"),
+    ("contains", "all"),
+    ("does not contain", "wall"),
+    ("==", "300"),
+    ("!contains", "e"),
+]
+
+
+def condition(predicate, value="", logic="CHECK", name="Width"):
+    return {
+        "logic": logic,
+        "propertyName": name,
+        "predicate": predicate,
+        "value": value,
+    }
+
+
+def test_every_predicate_has_a_tested_kernel():
+    """Test that the kernel comparisons below cover every predicate"""
+    tested = {compile_condition(condition(p, v)).predicate for p, v in CONDITIONS}
+    assert tested == set(KERNELS)
+
+
+@pytest.mark.parametrize("name", PROPERTIES)
+@pytest.mark.parametrize("predicate, value", CONDITIONS)
+def test_kernel_matches_naive_evaluator(predicate, value, name):
+    """Test that each kernel selects the objects the per-object check does"""
+    table = PropertyTable.from_records(RECORDS)
+    stored = condition(predicate, value, name=name)
+
+    mask = compile_condition(stored).evaluate(table)
+    test = naive_condition(stored)
+
+    assert mask.dtype == bool
+    assert mask.tolist() == [test(record) for record in RECORDS]
+
+
+@pytest.mark.parametrize(
+    "predicate, value",
+    [
+        ("greater than", "tall"),
+        ("in range", "1"),
+        ("in range", "1,b"),
+        ("in list", " , "),
+        ("is like", "(unclosed"),
+        ("is bigger", "1"),
+    ],
+)
+def test_compile_condition_rejects_malformed_values(predicate, value):
+    """Test that values that do not parse for their predicate are rejected"""
+    with pytest.raises(RuleCompileError):
+        compile_condition(condition(predicate, value))
+
+
+def test_uncompilable_rule_keeps_reason_and_is_not_evaluated():
+    """Test that a broken rule reports its error instead of results"""
+    table = PropertyTable.from_records(RECORDS)
+    rules = [
+        {"id": "broken", "conditions": [condition("in range", "1-5")]},
+        {"id": "empty", "conditions": []},
+    ]
+
+    results = evaluate_ruleset(rules, table)
+
+    assert "min,max" in results[0]["error"]
+    assert results[1]["error"] == "Rule has no conditions"
+    assert [r["matched"] for r in results] == [0, 0]
+
+
+def test_evaluate_ruleset_matches_naive_counts_and_failing_ids():
+    """Test that rule previews agree with the naive evaluator"""
+    table = PropertyTable.from_records(RECORDS)
+    rules = [
+        {
+            "id": "wall-width",
+            "conditions": [
+                condition("equal to", "walls", "WHERE", "category"),
+                condition("greater than", "220"),
+            ],
+        },
+        {
+            "id": "flagged-text",
+            "conditions": [
+                condition("exists", logic="WHERE", name="text"),
+                condition("is true", name="text"),
+            ],
+        },
+    ]
+
+    results = evaluate_ruleset(rules, table, max_failing_ids=1)
+
+    assert [(r["id"], r["matched"], r["failed"]) for r in results] == naive_evaluate(
+        rules, RECORDS
+    )
+    assert results[0]["failing_ids"] == ["b"]
+    assert results[1]["failing_ids"] == ["d"]
+
+
+def test_check_condition_need_not_be_last():
+    """Test that a condition marked CHECK is the check wherever it is"""
+    compiled = compile_rule(
+        {
+            "conditions": [
+                condition("greater than", "100", "CHECK"),
+                condition("exists", logic="WHERE", name="category"),
+            ]
+        }
+    )
+    table = PropertyTable.from_records(RECORDS)
+
+    matched, failed = compiled.evaluate(table)
+
+    assert compiled.check.property_name == "Width"
+    assert np.flatnonzero(matched).tolist() == [0, 1, 2, 3, 5]
+    assert np.flatnonzero(failed).tolist() == [2, 3, 5]
+
+
+def test_columns_are_found_case_insensitively():
+    """Test that a condition finds its property regardless of case"""
+    table = PropertyTable.from_records(RECORDS)
+
+    mask = compile_condition(condition("exists", name="CATEGORY")).evaluate(table)
+
+    assert mask.tolist() == [True, True, True, True, False, True]
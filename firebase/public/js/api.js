@@ -41,6 +41,29 @@ const API = {
     }
   },
 
+  // Send a request with authentication and resolve with its status and body,
+  // leaving error responses to the caller instead of throwing
+  sendWithAuth: async function (url, options = {}) {
+    const token = await Auth.getIdToken();
+    if (!token) {
+      throw new Error('No authentication token available');
+    }
+
+    options.headers = {
+      ...(options.headers || {}),
+      Authorization: `Bearer ${token}`,
+    };
+
+    await new Promise((resolve) => setTimeout(resolve, this.TIMEOUT));
+
+    const response = await fetch(url, options);
+    return {
+      ok: response.ok,
+      status: response.status,
+      html: await response.text(),
+    };
+  },
+
   // Post form data with authentication
   postFormWithAuth: async function (
     url,
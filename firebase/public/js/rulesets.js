@@ -4,6 +4,24 @@
  */
 
 const Rulesets = {
+  // Send a ?swap=oob rule request and apply the out-of-band row updates it
+  // returns. An error response has no OOB elements, so its HTML is shown in
+  // the rule form container instead; resolves with whether the rule changed
+  sendRuleFragments: function (url, options) {
+    return API.sendWithAuth(`${url}?swap=oob`, options).then((response) => {
+      if (!response.ok) {
+        const target = document.getElementById('rule-form-container');
+        if (target) {
+          target.innerHTML = response.html;
+        }
+        UI.showToast(`Error: ${response.status}`, true);
+        return false;
+      }
+      htmx.swap('#rules-container', response.html, { swapStyle: 'none' });
+      return true;
+    });
+  },
+
   // Edit ruleset
   editRuleset: function (url, targetSelector, event) {
     if (event) {
@@ -74,10 +92,12 @@ const Rulesets = {
     const form = event.target;
     const formData = new FormData(form);
 
-    API.postFormWithAuth(url, formData)
-      .then((html) => {
-        // Receive rule list and swap into rules container
-        document.querySelector(targetSelector).innerHTML = html;
+    // Receive only the changed rows and swap them into the rules table
+    this.sendRuleFragments(url, { method: 'POST', body: formData })
+      .then((changed) => {
+        if (!changed) {
+          return;
+        }
         // Clear new rule form container
         document.getElementById('rule-form-container').innerHTML = '';
         UI.showToast('Rule added successfully');
@@ -180,9 +200,11 @@ const Rulesets = {
       return;
     }
 
-    API.deleteWithAuth(url, targetSelector)
-      .then((response) => {
-        UI.showToast('Rule deleted successfully');
+    this.sendRuleFragments(url, { method: 'DELETE' })
+      .then((changed) => {
+        if (changed) {
+          UI.showToast('Rule deleted successfully');
+        }
       })
       .catch((error) => console.error('Delete error:', error));
   },
@@ -196,10 +218,12 @@ const Rulesets = {
     const form = event.target;
     const formData = new FormData(form);
 
-    API.postFormWithAuth(url, formData, 'PUT')
-      .then((html) => {
-        // Receive rule list and swap into rules container
-        document.querySelector(targetSelector).innerHTML = html;
+    // Receive only the changed rows and swap them into the rules table
+    this.sendRuleFragments(url, { method: 'PUT', body: formData })
+      .then((changed) => {
+        if (!changed) {
+          return;
+        }
         // Clear new rule form container
         document.getElementById('rule-form-container').innerHTML = '';
 